@@ -0,0 +1,145 @@
+"""
+Decode throughput benchmark for NxtradStream.
+
+Builds synthetic zlib frames of L1 packets (a full snapshot followed by
+incremental updates, the way the feed sends them) and measures packets/sec
+with the per-field walker and with the compiled PacketDecoder, both for the
+packet decode alone and end to end through NxtradStream.process_frame, plus
+the raw wire-units mode, the NumPy batch mode, a narrow field projection
+and lazy ticks.
+
+    python benchmarks/bench_decode.py --tokens 200 --frames 200
+    python benchmarks/bench_decode.py --capture captures/nxtrad-20261016.cap.gz
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Add project root to path
+
+from streaming.encoder import encode_frame, encode_packet
+from streaming.nxtradstream import NxtradStream, PacketDecoder, DEFAULT_PKT_INFO
+from streaming.recorder import FrameReplayer, capture_files
+
+PKT_SPEC = DEFAULT_PKT_INFO["PKT_SPEC"]
+
+FULL_KEYS = [26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45,
+             46, 49, 50, 51, 52, 53, 54, 58, 59, 60, 71, 74]
+UPDATE_KEYS = [26, 27, 29, 34, 35, 36, 39, 40, 41, 44, 45, 46, 49, 50, 51, 52, 53, 54]
+
+
+def l1_packet(token, keys, rnd, ltt):
+    fields = []
+    for key in keys:
+        if key == 26:
+            fields.append((key, 4))
+        elif key == 27:
+            fields.append((key, token))
+        elif key == 28:
+            fields.append((key, 2))
+        elif key == 41:
+            fields.append((key, rnd.random() * 1e9))
+        elif key == 46:
+            fields.append((key, ltt))
+        else:
+            fields.append((key, rnd.randint(1, 1000000)))
+    return encode_packet(10, fields)
+
+
+def build_frames(tokens, frames, seed=7):
+    # Roughly four frames per second of exchange time
+    rnd = random.Random(seed)
+    token_ids = [800000 + i for i in range(tokens)]
+    ltt = 1760000000
+    out = [encode_frame([l1_packet(t, FULL_KEYS, rnd, ltt) for t in token_ids])]
+    for n in range(1, frames):
+        out.append(encode_frame([l1_packet(t, UPDATE_KEYS, rnd, ltt + n // 4) for t in token_ids]))
+    return out
+
+
+# Narrow projection most consumers need
+NARROW_FIELDS = {"L1": ["ltp", "vol", "OI", "bidPrice", "askPrice", "qty"]}
+
+
+def run(frames, compiled_decode, batch=False, raw=False, fields=None, lazy=False):
+    count = [0]
+
+    def stream_cb(_stream, data):
+        # the usual consumer: filter by symbol first
+        if data["symbol"]:
+            count[0] += 1
+
+    def batch_cb(_stream, _msg_type, arr):
+        count[0] += len(arr)
+
+    stream = NxtradStream("localhost", stream_cb=stream_cb, compiled_decode=compiled_decode,
+                          batch_cb=batch_cb if batch else None, raw=raw, fields=fields, lazy=lazy)
+    start = time.perf_counter()
+    for frame in frames:
+        stream.process_frame(frame)
+    elapsed = time.perf_counter() - start
+    return count[0], elapsed
+
+
+def run_decode_only(frames, compiled_decode):
+    # L1 packet decode alone, without framing, L1 merging or callbacks
+    packets = []
+    for frame in frames:
+        data = zlib.decompress(frame[6:]) if frame[5] == 100 else frame[6:]
+        idx = 0
+        while idx < len(data):
+            pkt_len, pkt_type = struct.unpack_from("<hb", data, idx)
+            if pkt_len <= 0:
+                break
+            if pkt_type == 10:
+                packets.append(data[idx: idx + pkt_len])
+            idx += pkt_len
+
+    spec = PKT_SPEC[10]
+    if compiled_decode:
+        decode = PacketDecoder().decode
+        start = time.perf_counter()
+        for pkt in packets:
+            decode(10, pkt, 0, len(pkt))
+    else:
+        decode = NxtradStream("localhost")._NxtradStream__decodeL1PKT
+        start = time.perf_counter()
+        for pkt in packets:
+            decode(spec, pkt, 0, len(pkt))
+    return len(packets), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=200, help="L1 packets per frame")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--capture", help="replay recorded frames (file, directory or glob) instead")
+    args = parser.parse_args()
+
+    if args.capture:
+        frames = [frame for _, frame in FrameReplayer(capture_files(args.capture))]
+        print(f"{len(frames)} recorded frames")
+    else:
+        frames = build_frames(args.tokens, args.frames)
+    for title, runner in (("decode only", run_decode_only), ("process_frame", run)):
+        print(title)
+        results = {}
+        for label, compiled in (("walker", False), ("compiled", True)):
+            packets, elapsed = runner(frames, compiled)
+            results[label] = packets / elapsed
+            print(f"  {label:>9}: {packets} packets in {elapsed:.3f}s -> {results[label]:,.0f} packets/sec")
+        print(f"    speedup: {results['compiled'] / results['walker']:.2f}x")
+
+    for label, kwargs in (("raw", {"raw": True}), ("batch_cb", {"batch": True}),
+                          ("projected", {"fields": NARROW_FIELDS}), ("lazy", {"lazy": True})):
+        packets, elapsed = run(frames, True, **kwargs)
+        print(f"{label}: {packets} packets in {elapsed:.3f}s -> {packets / elapsed:,.0f} packets/sec")
+
+
+if __name__ == "__main__":
+    main()
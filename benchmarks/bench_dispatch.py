@@ -0,0 +1,260 @@
+"""
+Dispatch cost of typed event routing at full-chain subscription.
+
+Simulates an option chain subscribed to L1, L5 and greeks, with one
+subscriber per data type (a quote/strategy consumer for L1, a depth
+consumer for L5 and a greeks consumer).  Compares the old routing, where
+every packet is published as EVENT_TICK and each subscriber filters on
+msgType, with the Streamer's routing by msgType (core/routing.py), where
+each subscriber only receives what it asked for.
+
+With --strategies N it also compares N per-symbol strategy callbacks on
+EVENT_TICK that check tick["symbol"] themselves with the same callbacks
+subscribed with keys={symbol}.
+
+Finally it compares publishing each tick of a frame with publish() to one
+publish_batch() per frame, for a MarketData-style quote cache subscribed
+per tick and with batch=True.
+
+It also reports the publish rate while --churners threads subscribe and
+unsubscribe, the delay of a fill published behind a tick backlog with
+priority lanes, and the journal replay rate (--journal events).
+
+    python benchmarks/bench_dispatch.py --strikes 200 --rounds 50
+    python benchmarks/bench_dispatch.py --strategies 50
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Add project root to path
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS
+from mono_engine.core.journal import EventJournal
+from mono_engine.core.routing import stream_event
+
+
+def build_packets(strikes):
+    packets = []
+    for i in range(strikes * 2):  # a CE and a PE per strike
+        symbol = f"{850000 + i}_BFO"
+        packets.append({"msgType": "L1", "symbol": symbol, "ltp": 100.0 + i, "vol": 10 * i})
+        packets.append({"msgType": "L5", "symbol": symbol, "bidPrice": [99.95] * 5, "askPrice": [100.05] * 5})
+        packets.append({"msgType": "greeks", "symbol": symbol, "iv": 14.2, "delta": 0.5})
+    return packets
+
+
+def run(packets, rounds, typed):
+    events = EventDispatcher()
+    calls = [0]
+
+    def counted(msg_type=None):
+        def callback(data):
+            calls[0] += 1
+            if msg_type is not None and data["msgType"] != msg_type:
+                return
+            data["symbol"]
+        return callback
+
+    if typed:
+        for event_type in (EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS):
+            events.subscribe(event_type, counted())
+        deliver = lambda data: events.publish(stream_event(data), data)
+    else:
+        for msg_type in ("L1", "L5", "greeks"):
+            events.subscribe(EVENT_TICK, counted(msg_type))
+        deliver = lambda data: events.publish(EVENT_TICK, data)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in packets:
+            deliver(data)
+    return calls[0], time.perf_counter() - start
+
+
+def run_strategies(packets, rounds, strategies, keyed):
+    events = EventDispatcher()
+    ticks = [data for data in packets if data["msgType"] == "L1"]
+    calls = [0]
+
+    def strategy(symbol):
+        def on_tick(tick):
+            calls[0] += 1
+            if tick["symbol"] != symbol:
+                return
+            tick["ltp"]
+        return on_tick
+
+    for data in ticks[:strategies]:
+        symbol = data["symbol"]
+        events.subscribe(EVENT_TICK, strategy(symbol), keys={symbol} if keyed else None)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in ticks:
+            events.publish(EVENT_TICK, data)
+    return calls[0], len(ticks) * rounds, time.perf_counter() - start
+
+
+def run_batches(packets, rounds, batched):
+    events = EventDispatcher()
+    ticks = [data for data in packets if data["msgType"] == "L1"]
+    quotes = defaultdict(dict)
+
+    def on_tick(tick):
+        quotes[tick["symbol"]].update(tick)
+
+    def on_ticks(batch):
+        for tick in batch:
+            quotes[tick["symbol"]].update(tick)
+
+    if batched:
+        events.subscribe(EVENT_TICK, on_ticks, batch=True)
+    else:
+        events.subscribe(EVENT_TICK, on_tick)
+    publish, publish_batch = events.publish, events.publish_batch
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if batched:
+            publish_batch(EVENT_TICK, ticks)
+        else:
+            for data in ticks:
+                publish(EVENT_TICK, data)
+    return len(ticks) * rounds, time.perf_counter() - start
+
+
+def run_churn(packets, rounds, churners):
+    events = EventDispatcher()
+    ticks = [data for data in packets if data["msgType"] == "L1"]
+    events.subscribe(EVENT_TICK, lambda tick: tick["ltp"])
+    stop = threading.Event()
+    churned = [0]
+
+    class Owner:
+        def on_tick(self, tick):
+            pass
+
+    def churn():
+        while not stop.is_set():
+            owner = Owner()
+            events.subscribe(EVENT_TICK, owner.on_tick, keys={"A"})
+            events.unsubscribe_all(owner)
+            churned[0] += 1
+
+    threads = [threading.Thread(target=churn, daemon=True) for _ in range(churners)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in ticks:
+            events.publish(EVENT_TICK, data)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return len(ticks) * rounds, churned[0], elapsed
+
+
+def run_lanes(packets, tick_cost):
+    events = EventDispatcher(lane_options={})
+    ticks = [data for data in packets if data["msgType"] == "L1"]
+    filled = threading.Event()
+    events.subscribe(EVENT_TICK, lambda _tick: time.sleep(tick_cost))
+    events.subscribe("order_filled", lambda _data: filled.set())
+    for data in ticks:
+        events.publish(EVENT_TICK, data)
+    start = time.perf_counter()
+    events.publish("order_filled", {"order_id": "ORD1"})
+    filled.wait(60)
+    latency = time.perf_counter() - start
+    backlog = len(ticks) * tick_cost
+    events.close()
+    return latency, backlog
+
+
+def run_replay(events_count):
+    directory = tempfile.mkdtemp()
+    try:
+        journal = EventJournal(directory, snapshot_every=None, snapshot_interval=None)
+        for i in range(events_count):
+            journal.record("order_placed", {"order_id": f"ORD{i}", "side": "buy", "quantity": 50, "filled": 0})
+            journal.delivered()
+        journal.close(snapshot=False)
+
+        class Orders:
+            def __init__(self):
+                self.pending = {}
+
+            def restore_state(self, state):
+                pass
+
+            def replay_event(self, event_type, data):
+                self.pending[data["order_id"]] = data
+
+        journal = EventJournal(directory)
+        recovery = journal.recover({"orders": Orders()})
+        journal.close(snapshot=False)
+        return recovery["replayed"], recovery["seconds"]
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--strikes", type=int, default=200, help="strikes in the chain (2 options each)")
+    parser.add_argument("--rounds", type=int, default=50, help="times every packet is delivered")
+    parser.add_argument("--strategies", type=int, default=50, help="per-symbol strategy callbacks")
+    parser.add_argument("--churners", type=int, default=4, help="threads subscribing and unsubscribing")
+    parser.add_argument("--tick-cost", type=float, default=0.0002, help="seconds per tick callback for lanes")
+    parser.add_argument("--journal", type=int, default=8000, help="journaled events to replay")
+    args = parser.parse_args()
+
+    packets = build_packets(args.strikes)
+    total = len(packets) * args.rounds
+    print(f"{len(packets)} packets per round (L1 + L5 + greeks), {args.rounds} rounds")
+    results = {}
+    for label, typed in (("EVENT_TICK", False), ("typed", True)):
+        calls, elapsed = run(packets, args.rounds, typed)
+        results[label] = total / elapsed
+        print(f"  {label:>10}: {calls} callbacks, {total} packets in {elapsed:.3f}s "
+              f"-> {results[label]:,.0f} packets/sec")
+    print(f"    speedup: {results['typed'] / results['EVENT_TICK']:.2f}x")
+
+    if args.strategies:
+        print(f"{args.strategies} per-symbol strategies on EVENT_TICK")
+        for label, keyed in (("filtered", False), ("keyed", True)):
+            calls, ticks, elapsed = run_strategies(packets, args.rounds, args.strategies, keyed)
+            results[label] = ticks / elapsed
+            print(f"  {label:>10}: {calls} callbacks, {ticks} ticks in {elapsed:.3f}s "
+                  f"-> {results[label]:,.0f} ticks/sec")
+        print(f"    speedup: {results['keyed'] / results['filtered']:.2f}x")
+
+    print(f"{len(packets) // 3} ticks per frame into a quote cache")
+    for label, batched in (("publish", False), ("batch", True)):
+        ticks, elapsed = run_batches(packets, args.rounds, batched)
+        results[label] = ticks / elapsed
+        print(f"  {label:>10}: {ticks} ticks in {elapsed:.3f}s -> {results[label]:,.0f} ticks/sec")
+    print(f"    speedup: {results['batch'] / results['publish']:.2f}x")
+
+    if args.churners:
+        ticks, churned, elapsed = run_churn(packets, args.rounds, args.churners)
+        print(f"{args.churners} threads churning subscriptions: {ticks} ticks in {elapsed:.3f}s "
+              f"-> {ticks / elapsed:,.0f} ticks/sec, {churned} subscribe/unsubscribe cycles")
+
+    latency, backlog = run_lanes(packets, args.tick_cost)
+    print(f"Lanes: fill delivered {latency * 1e3:.2f}ms after publish behind a {backlog * 1e3:.0f}ms tick backlog")
+
+    if args.journal:
+        replayed, elapsed = run_replay(args.journal)
+        print(f"Journal: {replayed} events replayed in {elapsed * 1e3:.1f}ms -> {replayed / elapsed:,.0f} events/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+End-to-end feed throughput benchmark against the local synthetic server.
+
+Runs streaming.feed_server in a child process at increasing tick rates,
+connects an NxtradStream to it and compares the ticks/sec delivered to
+stream_cb with the rate offered, to find the highest sustainable rate on
+this machine.
+
+    python benchmarks/bench_feed.py --tokens 500 --rates 5000 20000 50000 100000
+    python benchmarks/bench_feed.py --pipeline --workers 2
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Add project root to path
+
+from streaming.feed_server import FeedServer
+from streaming.nxtradstream import NxtradStream
+
+
+def serve(port, rate, tokens, interval, ready):
+    import asyncio
+    server = FeedServer(port=port, rate=rate, tokens=tokens, frame_interval=interval)
+    ready.set()
+    asyncio.run(server.serve_forever())
+
+
+def run(port, rate, args):
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    proc = ctx.Process(target=serve, args=(port, rate, args.tokens, args.interval, ready), daemon=True)
+    proc.start()
+    ready.wait(10)
+    time.sleep(0.5)  # let the server bind
+
+    lock = threading.Lock()
+    counts = {"packets": 0}
+    connected = threading.Event()
+
+    def on_packet(_stream, data):
+        with lock:
+            counts["packets"] += 1
+
+    def on_connect(_stream, ev):
+        if ev.get("s") == "connected":
+            connected.set()
+
+    stream = NxtradStream("ws://127.0.0.1:%d" % port, stream_cb=on_packet, connect_cb=on_connect,
+                          raw=args.raw, pipeline=args.pipeline, workers=args.workers)
+    stream.connect("bench:token")
+    try:
+        connected.wait(10)
+        time.sleep(args.warmup)
+        with lock:
+            start_count = counts["packets"]
+        start = time.perf_counter()
+        time.sleep(args.duration)
+        with lock:
+            received = counts["packets"] - start_count
+        elapsed = time.perf_counter() - start
+    finally:
+        stream.disconnect()
+        proc.terminate()
+        proc.join(5)
+    return received / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic feed end-to-end throughput")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--rates", type=float, nargs="+", default=[5000, 20000, 50000, 100000])
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between server frames")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--raw", action="store_true", help="deliver wire units (skip formatting)")
+    parser.add_argument("--pipeline", action="store_true", help="decode on worker threads")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.tokens} tokens, {args.duration:.0f}s per rate")
+    print(f"{'offered/s':>12} {'received/s':>12} {'ratio':>7}")
+    for rate in args.rates:
+        got = run(args.port, rate, args)
+        print(f"{rate:>12,.0f} {got:>12,.0f} {got / rate:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
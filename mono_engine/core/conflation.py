@@ -0,0 +1,120 @@
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK
+
+
+def tick_key(data: Dict[str, Any]) -> Optional[Hashable]:
+    """Conflation key of a stream packet: (msgType, symbol), or None if it has no symbol."""
+    symbol = data.get("symbol")
+    if symbol is None:
+        return None
+    return data.get("msgType"), symbol
+
+
+class Conflator:
+    """
+    Coalesces stream updates per symbol before they reach the EventDispatcher.
+
+    push() merges each update into the pending update for its key (newer
+    fields win) and a delivery thread publishes the pending updates, at most
+    one per key per cycle.  With interval=0 a cycle starts as soon as the
+    previous one has been published, so a slow subscriber gets the latest
+    state instead of a backlog; with interval > 0 cycles run at most once
+    per interval seconds.  Updates without a key (events, auth, market
+    status) are published immediately, uncoalesced.
+
+    Without start() nothing is delivered until drain() is called.  With a
+    route callable each update is published as route(data) instead of
+    event_type.
+    """
+
+    def __init__(self, events: EventDispatcher, event_type: str = EVENT_TICK,
+                 interval: float = 0.0, key=tick_key, route=None):
+        self.events = events
+        self.event_type = event_type
+        self.interval = interval
+        self.key = key
+        self.route = route
+
+        self.received = 0
+        self.conflated = 0
+        self.emitted = 0
+        self.cycles = 0
+
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._stopped = True
+        self._thread: Optional[threading.Thread] = None
+
+    def push(self, data: Dict[str, Any]) -> None:
+        key = self.key(data)
+        if key is None:
+            self.events.publish(self.route(data) if self.route else self.event_type, data)
+            return
+        with self._cond:
+            self.received += 1
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = dict(data)
+                self._cond.notify()
+            else:
+                current.update(data)
+                self.conflated += 1
+
+    def drain(self) -> int:
+        """Publish every pending update now; returns how many were published."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        route = self.route
+        for data in pending.values():
+            self.events.publish(route(data) if route else self.event_type, data)
+        if pending:
+            with self._cond:
+                self.emitted += len(pending)
+                self.cycles += 1
+        return len(pending)
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="conflator", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the delivery thread after publishing what is still pending."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.drain()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            try:
+                self.drain()
+            except Exception as e:
+                logging.error(f"Conflator drain failed: {e}")
+            if self.interval:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopped, self.interval)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "received": self.received,
+                "conflated": self.conflated,
+                "emitted": self.emitted,
+                "cycles": self.cycles,
+                "pending": len(self._pending),
+            }
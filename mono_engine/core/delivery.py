@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+DELIVERY_SYNC = "sync"
+DELIVERY_THREADED = "threaded"
+DELIVERY_CONFLATED = "conflated"
+DELIVERY_MODES = (DELIVERY_SYNC, DELIVERY_THREADED, DELIVERY_CONFLATED)
+
+
+def callback_name(callback: Callable) -> str:
+    owner = getattr(callback, "__self__", None)
+    name = getattr(callback, "__qualname__", None) or repr(callback)
+    if owner is not None and "." not in name:
+        name = f"{owner.__class__.__name__}.{name}"
+    return name
+
+
+class QueuedSubscriber:
+    """
+    Runs one subscriber's callback on its own worker thread.
+
+    The dispatcher calls the subscriber with each event; it is appended to a
+    bounded queue and returns at once, so a slow callback only delays
+    itself.  When the queue is full the oldest event is dropped (counted in
+    dropped) rather than blocking the publisher.  lag is the time the last
+    delivered event spent queued, max_lag the worst since start.
+
+    With batch=True the worker hands the callback everything queued so far
+    as one list instead of calling it once per event.
+    """
+
+    mode = DELIVERY_THREADED
+
+    def __init__(self, callback: Callable[[Any], None], event_type: str = "", queue_size: int = 1024,
+                 batch: bool = False):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.callback = callback
+        self.event_type = event_type
+        self.queue_size = queue_size
+        self.batch = batch
+        self.name = callback_name(callback)
+
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._init_queue()
+        self._thread = threading.Thread(target=self._run, name=f"events-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _init_queue(self) -> None:
+        self._queue = deque()
+
+    def __call__(self, data: Any) -> None:
+        with self._cond:
+            if self._stopped:
+                return
+            self.received += 1
+            self._enqueue(data, time.perf_counter())
+            self._cond.notify()
+
+    def put_many(self, items: List[Any]) -> None:
+        with self._cond:
+            if self._stopped:
+                return
+            self.received += len(items)
+            now = time.perf_counter()
+            for data in items:
+                self._enqueue(data, now)
+            self._cond.notify()
+
+    def _enqueue(self, data: Any, now: float) -> None:
+        if len(self._queue) >= self.queue_size:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append((now, data))
+
+    def _dequeue(self):
+        return self._queue.popleft()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not len(self) and not self._stopped:
+                    self._cond.wait()
+                if not len(self):
+                    return
+                if self.batch:
+                    entries = [self._dequeue() for _ in range(len(self))]
+                    queued_at, data = entries[0][0], [data for _, data in entries]
+                    count = len(entries)
+                else:
+                    queued_at, data = self._dequeue()
+                    count = 1
+            lag = time.perf_counter() - queued_at
+            try:
+                self.callback(data)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Error in {self.mode} callback {self.name} for event '{self.event_type}': {e}")
+            with self._cond:
+                self.delivered += count
+                self.lag = lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                if not len(self):
+                    self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued event has been delivered; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not len(self) and self.delivered + self.dropped >= self.received,
+                                       timeout)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Deliver what is queued, then stop the worker."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "callback": self.name,
+                "mode": self.mode,
+                "received": self.received,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queued": len(self),
+                "lag": self.lag,
+                "max_lag": self.max_lag,
+            }
+
+
+class ConflatedSubscriber(QueuedSubscriber):
+    """
+    QueuedSubscriber that keeps only the latest state per key.
+
+    Events with the same key (data[key_field], e.g. the symbol) are merged
+    while they wait, newer fields winning, so the callback sees at most one
+    update per key per pass and never falls behind; merged events are
+    counted in dropped.  Events without a key are queued as they are.
+    """
+
+    mode = DELIVERY_CONFLATED
+
+    def __init__(self, callback: Callable[[Any], None], event_type: str = "", queue_size: int = 1024,
+                 key_field: str = "symbol", batch: bool = False):
+        self.key_field = key_field
+        super().__init__(callback, event_type, queue_size, batch)
+
+    def _init_queue(self) -> None:
+        # key -> [first queued at, merged data]; insertion order is delivery order
+        self._pending: Dict[Hashable, list] = {}
+
+    def _enqueue(self, data: Any, now: float) -> None:
+        try:
+            key = data.get(self.key_field)
+        except AttributeError:
+            key = None
+        if key is None:
+            key = object()
+        current = self._pending.get(key)
+        if current is not None:
+            if isinstance(current[1], dict):
+                current[1].update(data)
+            else:
+                current[1] = data
+            self.dropped += 1
+            return
+        if len(self._pending) >= self.queue_size:
+            del self._pending[next(iter(self._pending))]
+            self.dropped += 1
+        self._pending[key] = [now, dict(data) if hasattr(data, "keys") else data]
+
+    def _dequeue(self):
+        key = next(iter(self._pending))
+        return self._pending.pop(key)
+
+    def __len__(self) -> int:
+        return len(self._pending)
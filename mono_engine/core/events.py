@@ -1,55 +1,440 @@
+import logging
+import threading
+import time
 from collections import defaultdict
-from typing import Callable, Any, Dict, List
+from functools import partial
+from typing import Callable, Any, Dict, FrozenSet, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from mono_engine.core.delivery import (DELIVERY_SYNC, DELIVERY_THREADED, DELIVERY_CONFLATED, DELIVERY_MODES,
+                                       QueuedSubscriber, ConflatedSubscriber, callback_name)
+from mono_engine.core.profiling import DispatchProfiler
+from mono_engine.core.journal import EventJournal
+from mono_engine.core.lanes import LaneScheduler
+
+
+class _Subscription(NamedTuple):
+    callback: Callable
+    keys: Optional[FrozenSet[Hashable]]
+    # target takes one event: the callback itself, a one-item adapter for
+    # batch callbacks, or a QueuedSubscriber; batch_target takes a list, or is
+    # None when batch items are passed to target one by one
+    target: Callable
+    batch_target: Optional[Callable]
+    owner: Any
+
+
+class _Route(NamedTuple):
+    """Immutable delivery plan of one event type."""
+    subscriptions: Tuple[_Subscription, ...]
+    # targets of the wildcard (keys=None) subscriptions
+    callbacks: Tuple[Callable, ...]
+    # key -> wildcard and keyed targets for that key, in subscription order (None: no keyed subscriptions)
+    keyed: Optional[Dict[Hashable, Tuple[Callable, ...]]]
 
 
 class EventDispatcher:
     """
     Simple, lightweight event dispatcher (pub/sub pattern).
     Used throughout MonoEngine for decoupled communication between modules.
-    Thread-safe for basic use (callbacks called synchronously).
+
+    Thread safe: subscribe/unsubscribe build a new immutable route per event
+    type and swap it in under a lock, while publish() reads the current
+    routes without locking, so a publish running during a subscribe sees
+    either the old or the new subscribers, never a half-updated list.
+
+    A callback subscribed with keys only receives events whose data[key_field]
+    ("symbol" by default) is one of them, e.g.
+
+        events.subscribe(EVENT_TICK, strategy.on_tick, keys={"12345_BFO"})
+
+    Keyed callbacks are looked up in a key -> callbacks index, so publishing a
+    tick only touches the callbacks interested in its symbol plus the
+    wildcard (keys=None) subscribers.
+
+    By default callbacks run synchronously on the publishing thread (the
+    websocket thread for ticks).  A subscriber can opt into its own bounded
+    queue and worker thread instead, so it cannot delay the others:
+
+        events.subscribe(EVENT_TICK, display.on_tick, delivery=DELIVERY_CONFLATED)
+
+    threaded delivers every event in order (dropping the oldest when its
+    queue is full); conflated delivers the latest merged state per key.
+    subscriber_stats() reports their lag and drop counters.
+
+    With lane_options (LaneScheduler arguments, {} for the defaults)
+    publish() queues events in priority lanes (execution, state, market
+    data) and a delivery thread runs the callbacks, so order updates and
+    fills are delivered ahead of a tick backlog; the market data lane is
+    bounded and conflated per key when full; see lane_stats().
+
+    publish_batch() delivers a list of events (e.g. one websocket frame of
+    ticks) at once.  A callback subscribed with batch=True is called with
+    the list, once per batch (and with a one-item list from publish());
+    other callbacks are called once per item as before.
+
+    Every subscription has an owner (the object a bound method belongs to,
+    or the owner argument); unsubscribe_all(owner) removes all of them.
+
+    Exceptions raised by callbacks are logged and counted per (event type,
+    callback), see error_stats().  enable_profiling() additionally times
+    every callback (DispatchProfiler: calls, total/max duration, errors),
+    reported by profile_stats() and optionally a periodic log line; while it
+    is off publish() pays a single attribute check for it.
+
+    With journal set to an EventJournal, events of its event_types are
+    appended to the journal as they are delivered (in delivery order, so
+    after lane reordering), for crash recovery of module state.
     """
 
-    def __init__(self):
-        self._callbacks: Dict[str, List[Callable]] = defaultdict(list)
+    def __init__(self, key_field: str = "symbol", lane_options: Optional[dict] = None):
+        self.key_field = key_field
+        self.lanes = (LaneScheduler(self._deliver, deliver_batch=self._deliver_batch,
+                                    **dict({"key_field": key_field}, **lane_options))
+                      if lane_options is not None else None)
+        if self.lanes is not None:
+            self.lanes.start()
+        # event type -> _Route; never mutated, replaced as a whole under _lock
+        self._routes: Dict[str, _Route] = {}
+        self._lock = threading.Lock()
+        # DispatchProfiler while profiling is on; the last one is kept for its report
+        self.profiler: Optional[DispatchProfiler] = None
+        self._last_profiler: Optional[DispatchProfiler] = None
+        # (event type, callback name) -> [exceptions raised, last exception]
+        self._errors: Dict[Tuple[str, str], list] = {}
+        self.journal: Optional[EventJournal] = None
 
-    def subscribe(self, event_type: str, callback: Callable[[Any], None]) -> None:
+    def subscribe(self, event_type: str, callback: Callable[[Any], None],
+                  keys: Optional[Iterable[Hashable]] = None, delivery: str = DELIVERY_SYNC,
+                  queue_size: int = 1024, batch: bool = False, owner: Any = None) -> None:
         """
-        Subscribe a callback function to an event type.
+        Subscribe a callback function to an event type, optionally only for
+        events whose data[key_field] is in keys, delivered sync, threaded or
+        conflated (see the class docstring).  With batch=True the callback
+        takes a list of events.
         """
         if not callable(callback):
             raise ValueError("Callback must be callable")
-        self._callbacks[event_type].append(callback)
+        if delivery not in DELIVERY_MODES:
+            raise ValueError("delivery must be one of " + ", ".join(DELIVERY_MODES))
+        keys = None if keys is None else frozenset(keys)
+        if delivery == DELIVERY_THREADED:
+            target = QueuedSubscriber(callback, event_type, queue_size, batch=batch)
+            batch_target = target.put_many
+        elif delivery == DELIVERY_CONFLATED:
+            target = ConflatedSubscriber(callback, event_type, queue_size, self.key_field, batch=batch)
+            batch_target = target.put_many
+        elif batch:
+            target = partial(_call_with_list, callback)
+            batch_target = callback
+        else:
+            target = callback
+            batch_target = None
+        if owner is None:
+            owner = getattr(callback, "__self__", None)
+        subscription = _Subscription(callback, keys, target, batch_target, owner)
+        with self._lock:
+            route = self._routes.get(event_type)
+            self._set_route(event_type, (route.subscriptions if route else ()) + (subscription,))
 
-    def unsubscribe(self, event_type: str, callback: Callable[[Any], None]) -> None:
+    def unsubscribe(self, event_type: str, callback: Callable[[Any], None],
+                    keys: Optional[Iterable[Hashable]] = None) -> None:
         """
-        Remove a specific callback from an event type.
+        Remove a specific callback from an event type, or with keys only its
+        subscription to those keys.
         """
-        if event_type in self._callbacks:
-            self._callbacks[event_type] = [
-                cb for cb in self._callbacks[event_type] if cb != callback
-            ]
+        keys = None if keys is None else frozenset(keys)
+        removed = []
+        with self._lock:
+            route = self._routes.get(event_type)
+            if route is None:
+                return
+            subscriptions = []
+            for sub in route.subscriptions:
+                if sub.callback == callback:
+                    if keys is None:
+                        removed.append(sub)
+                        continue
+                    if sub.keys is not None:
+                        remaining = sub.keys - keys
+                        if not remaining:
+                            removed.append(sub)
+                            continue
+                        sub = sub._replace(keys=remaining)
+                subscriptions.append(sub)
+            self._set_route(event_type, tuple(subscriptions))
+        self._stop(removed)
+
+    def unsubscribe_all(self, owner: Any) -> int:
+        """Remove every subscription of owner, on every event type; returns how many."""
+        if owner is None:
+            raise ValueError("owner is required")
+        removed = []
+        with self._lock:
+            for event_type, route in list(self._routes.items()):
+                kept = tuple(sub for sub in route.subscriptions if sub.owner is not owner)
+                if len(kept) != len(route.subscriptions):
+                    removed += [sub for sub in route.subscriptions if sub.owner is owner]
+                    self._set_route(event_type, kept)
+        self._stop(removed)
+        return len(removed)
+
+    @staticmethod
+    def _stop(subscriptions) -> None:
+        # Outside the lock: a worker finishing its queue may still publish
+        for sub in subscriptions:
+            if isinstance(sub.target, QueuedSubscriber):
+                sub.target.stop()
+
+    def _set_route(self, event_type: str, subscriptions: Tuple[_Subscription, ...]) -> None:
+        """Build the route of event_type and swap in a new routes dict (called with _lock held)."""
+        routes = dict(self._routes)
+        if not subscriptions:
+            routes.pop(event_type, None)
+            self._routes = routes
+            return
+        all_keys = set()
+        for sub in subscriptions:
+            if sub.keys is not None:
+                all_keys |= sub.keys
+        keyed = {
+            key: tuple(sub.target for sub in subscriptions if sub.keys is None or key in sub.keys)
+            for key in all_keys
+        } if all_keys else None
+        routes[event_type] = _Route(subscriptions, tuple(sub.target for sub in subscriptions if sub.keys is None),
+                                    keyed)
+        self._routes = routes
 
     def publish(self, event_type: str, data: Any = None) -> None:
         """
-        Publish data to all callbacks subscribed to the event type.
-        Callbacks are executed synchronously in subscription order.
+        Publish data to all callbacks subscribed to the event type (and, for
+        keyed callbacks, to its key).
+        Callbacks are executed synchronously in subscription order (on the
+        lane thread, in priority order, when lanes are enabled).
         """
-        callbacks = self._callbacks.get(event_type, [])
+        if self.lanes is not None:
+            self.lanes.put(event_type, data)
+        else:
+            self._deliver(event_type, data)
+
+    def _deliver(self, event_type: str, data: Any) -> None:
+        journal = self.journal
+        if journal is None or event_type not in journal.event_types:
+            self._dispatch(event_type, data)
+            return
+        # journaled even without subscribers: recovery replays it into the modules
+        journal.record(event_type, data)
+        try:
+            self._dispatch(event_type, data)
+        finally:
+            journal.delivered()
+
+    def _dispatch(self, event_type: str, data: Any) -> None:
+        route = self._routes.get(event_type)
+        if route is None:
+            return
+        if self.profiler is not None:
+            self._deliver_profiled(event_type, data, route, self.profiler)
+            return
+        callbacks = route.callbacks
+        if route.keyed is not None:
+            try:
+                key = data.get(self.key_field)
+            except AttributeError:
+                key = None
+            callbacks = route.keyed.get(key, callbacks)
         for callback in callbacks:
             try:
                 callback(data)
             except Exception as e:
                 # Log errors but don't break the chain
-                print(f"Error in callback for event '{event_type}': {e}")
+                self._failed(event_type, callback, e)
+
+    def _deliver_profiled(self, event_type: str, data: Any, route: _Route, profiler: DispatchProfiler) -> None:
+        if route.keyed is not None:
+            try:
+                key = data.get(self.key_field)
+            except AttributeError:
+                key = None
+        perf_counter_ns = time.perf_counter_ns
+        for sub in route.subscriptions:
+            if sub.keys is not None and key not in sub.keys:
+                continue
+            failed = False
+            t0 = perf_counter_ns()
+            try:
+                sub.target(data)
+            except Exception as e:
+                failed = True
+                self._failed(event_type, sub.callback, e)
+            profiler.record(event_type, sub.callback, perf_counter_ns() - t0, failed=failed)
+
+    def _failed(self, event_type: str, callback: Callable, error: Exception) -> None:
+        name = callback_name(_subscriber_of(callback))
+        with self._lock:
+            entry = self._errors.setdefault((event_type, name), [0, None])
+            entry[0] += 1
+            entry[1] = repr(error)
+        logging.error(f"Error in callback {name} for event '{event_type}': {error}")
+
+    def publish_batch(self, event_type: str, items: List[Any]) -> None:
+        """
+        Publish a list of events of one type.  Batch callbacks get the list
+        (keyed ones only their keys' items, in order per key) in one call;
+        the others are called once per item.
+        """
+        if not items:
+            return
+        if self.lanes is not None:
+            self.lanes.put(event_type, items, batch=True)
+        else:
+            self._deliver_batch(event_type, items)
+
+    def _deliver_batch(self, event_type: str, items: List[Any]) -> None:
+        journal = self.journal
+        if journal is None or event_type not in journal.event_types:
+            self._dispatch_batch(event_type, items)
+            return
+        journal.record_many(event_type, items)
+        try:
+            self._dispatch_batch(event_type, items)
+        finally:
+            journal.delivered()
+
+    def _dispatch_batch(self, event_type: str, items: List[Any]) -> None:
+        route = self._routes.get(event_type)
+        if route is None:
+            return
+        by_key = None
+        if route.keyed is not None:
+            key_field = self.key_field
+            by_key = defaultdict(list)
+            for item in items:
+                try:
+                    key = item.get(key_field)
+                except AttributeError:
+                    key = None
+                by_key[key].append(item)
+        profiler = self.profiler
+        perf_counter_ns = time.perf_counter_ns
+        for callback, keys, target, batch_target, _ in route.subscriptions:
+            if keys is None:
+                selected = items
+            elif len(keys) < len(by_key):
+                selected = [item for key in keys if key in by_key for item in by_key[key]]
+            else:
+                selected = [item for key, group in by_key.items() if key in keys for item in group]
+            if not selected:
+                continue
+            if batch_target is not None:
+                failed = False
+                t0 = perf_counter_ns() if profiler is not None else 0
+                try:
+                    batch_target(selected)
+                except Exception as e:
+                    failed = True
+                    self._failed(event_type, callback, e)
+                if profiler is not None:
+                    profiler.record(event_type, callback, perf_counter_ns() - t0, len(selected), failed)
+                continue
+            for item in selected:
+                failed = False
+                t0 = perf_counter_ns() if profiler is not None else 0
+                try:
+                    target(item)
+                except Exception as e:
+                    # Log errors but don't break the chain
+                    failed = True
+                    self._failed(event_type, callback, e)
+                if profiler is not None:
+                    profiler.record(event_type, callback, perf_counter_ns() - t0, failed=failed)
+
+    def subscribers(self, event_type: str) -> Tuple[Callable, ...]:
+        """Callbacks currently subscribed to event_type, in subscription order."""
+        route = self._routes.get(event_type)
+        return tuple(sub.callback for sub in route.subscriptions) if route else ()
+
+    def subscriber_stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Queue, lag and drop counters of every threaded/conflated subscriber, per event type."""
+        stats = {}
+        for event_type, route in self._routes.items():
+            queued = [sub.target.stats() for sub in route.subscriptions if isinstance(sub.target, QueuedSubscriber)]
+            if queued:
+                stats[event_type] = queued
+        return stats
+
+    def enable_profiling(self, log_interval: Optional[float] = None, top: int = 10) -> DispatchProfiler:
+        """Start timing every callback (fresh counters); with log_interval log the slowest each interval."""
+        self.disable_profiling()
+        profiler = DispatchProfiler(log_interval, top)
+        profiler.start()
+        self.profiler = self._last_profiler = profiler
+        return profiler
+
+    def disable_profiling(self) -> None:
+        """Stop timing callbacks; profile_stats() keeps reporting the last counters."""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.stop()
+
+    def profile_stats(self) -> Optional[List[Dict[str, Any]]]:
+        """Per (event type, callback) calls, items, total/mean/max ns and errors, slowest first; None if never enabled."""
+        return self._last_profiler.stats() if self._last_profiler is not None else None
+
+    def profile_summary(self, top: Optional[int] = None) -> Optional[str]:
+        return self._last_profiler.summary(top) if self._last_profiler is not None else None
+
+    def error_stats(self) -> List[Dict[str, Any]]:
+        """Exceptions raised per (event type, callback), with the last one, most frequent first."""
+        with self._lock:
+            stats = [{"event": event_type, "callback": name, "errors": count, "last_error": last}
+                     for (event_type, name), (count, last) in self._errors.items()]
+        return sorted(stats, key=lambda entry: entry["errors"], reverse=True)
+
+    def lane_stats(self) -> Optional[Dict[str, Any]]:
+        """Per-lane queue depth and wait latency, or None without lanes."""
+        return self.lanes.stats() if self.lanes is not None else None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the lanes and every queued subscriber have caught up; False on timeout."""
+        if self.lanes is not None and not self.lanes.flush(timeout):
+            return False
+        return all(sub.target.flush(timeout) for route in self._routes.values()
+                   for sub in route.subscriptions if isinstance(sub.target, QueuedSubscriber))
+
+    def close(self) -> None:
+        """Deliver what the lanes hold, stop the lane thread and clear every subscription."""
+        if self.lanes is not None:
+            self.lanes.stop()
+        self.disable_profiling()
+        self.clear()
 
     def clear(self, event_type: str = None) -> None:
         """
         Clear all callbacks for a specific event or everything.
+        Queued subscribers deliver what they hold and stop.
         """
-        if event_type:
-            self._callbacks[event_type].clear()
-        else:
-            self._callbacks.clear()
+        with self._lock:
+            if event_type:
+                route = self._routes.get(event_type)
+                removed = route.subscriptions if route else ()
+                self._set_route(event_type, ())
+            else:
+                removed = [sub for route in self._routes.values() for sub in route.subscriptions]
+                self._routes = {}
+        self._stop(removed)
+
+
+def _subscriber_of(target: Callable) -> Callable:
+    """The subscribed callback behind a route target."""
+    if isinstance(target, partial) and target.func is _call_with_list:
+        return target.args[0]
+    if isinstance(target, QueuedSubscriber):
+        return target.callback
+    return target
+
+
+def _call_with_list(callback: Callable[[List[Any]], None], data: Any) -> None:
+    callback([data])
 
 
 # Common event types (expand as needed)
@@ -58,6 +443,9 @@ EVENT_DEPTH = "on_depth"
 EVENT_ORDER_UPDATE = "on_order_update"
 EVENT_TRADE = "on_trade"
 EVENT_GREEKS = "on_greeks"
+EVENT_OHLC = "on_ohlc"
+EVENT_MARKET_STATUS = "on_market_status"
+EVENT_POSITION_UPDATE = "on_position_update"
 EVENT_CONNECT = "on_connect"
 EVENT_DISCONNECT = "on_disconnect"
 EVENT_ERROR = "on_error" 
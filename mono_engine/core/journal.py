@@ -0,0 +1,313 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Journal entries: 4 byte payload length, 4 byte crc32 of the payload,
+# 8 byte sequence number, 8 byte wall clock time in ns, then the payload, a
+# pickled (event type, data).  The log is read up to the first entry that is
+# empty, torn (bad crc) or out of sequence, so a crash mid-write loses at
+# most the entry being written.
+ENTRY_HEADER = struct.Struct("<IIQq")
+LOG_NAME = "events.journal"
+SNAPSHOT_NAME = "snapshot.pkl"
+
+# Events that change module state (Order.pending_orders, TradeState,
+# Portfolio) and are journaled by default
+JOURNAL_EVENTS = frozenset((
+    "buy_signal",
+    "sell_signal",
+    "order_placed",
+    "order_filled",
+    "order_rejected",
+    "order_canceled",
+    "state_updated",
+    "on_order_update",
+    "on_trade",
+))
+
+
+class EventJournal:
+    """
+    Append-only journal of state-changing events with periodic snapshots,
+    for rebuilding module state after a crash without a REST resync.
+
+    Set as EventDispatcher.journal, every delivered event whose type is in
+    event_types is appended to <directory>/events.journal, a memory-mapped
+    file (grown by doubling), before its callbacks run.  Writes to the map
+    survive a crash of the process; sync=True also flushes each entry to
+    disk, for power loss.
+
+    Every snapshot_every entries or snapshot_interval seconds, once no
+    journaled event is being delivered, the snapshot_state() of every module
+    passed to recover() is pickled to <directory>/snapshot.pkl (written to a
+    temporary file and renamed) together with the last sequence number, and
+    the log is rewound to its start.
+
+    recover(modules) restores the modules from the last snapshot and feeds
+    the entries after it to their replay_event(), which applies them without
+    publishing or calling the broker.  Module state must be updated by the
+    time its callbacks return (sync delivery, the default) for snapshots to
+    match the journal.
+    """
+
+    def __init__(self, directory: str, event_types: Iterable[str] = JOURNAL_EVENTS, snapshot_every: int = 1000,
+                 snapshot_interval: Optional[float] = 60.0, initial_size: int = 1 << 20, sync: bool = False):
+        self.directory = directory
+        self.event_types = frozenset(event_types)
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.modules: Dict[str, Any] = {}
+
+        self.seq = 0              # last sequence number written
+        self.snapshot_seq = 0     # sequence number the last snapshot covers
+        self.written = 0
+        self.snapshots = 0
+        self.errors = 0
+        self.last_recovery: Optional[Dict[str, Any]] = None
+
+        self._lock = threading.RLock()
+        self._open = 0            # journaled events being delivered
+        self._since_snapshot = 0
+        self._snapshot_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < max(initial_size, ENTRY_HEADER.size):
+            size = max(initial_size, ENTRY_HEADER.size)
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._offset = 0
+
+        snapshot = self._load_snapshot()
+        self.snapshot_seq = snapshot["seq"] if snapshot else 0
+        last_seq, end = self._scan()
+        if last_seq > self.snapshot_seq:
+            self.seq, self._offset = last_seq, end
+        else:
+            # nothing after the snapshot: start over at the beginning of the log
+            self.seq, self._offset = self.snapshot_seq, 0
+
+    # Writing, called by EventDispatcher
+
+    def record(self, event_type: str, data: Any) -> None:
+        """Append one event; the caller delivers it and then calls delivered()."""
+        payload = self._encode(event_type, data)
+        with self._lock:
+            self._open += 1
+            if payload is not None:
+                self._append(payload)
+
+    def record_many(self, event_type: str, items: List[Any]) -> None:
+        """Append a batch of events delivered together; delivered() is called once for it."""
+        payloads = [self._encode(event_type, data) for data in items]
+        with self._lock:
+            self._open += 1
+            for payload in payloads:
+                if payload is not None:
+                    self._append(payload)
+
+    def _encode(self, event_type: str, data: Any) -> Optional[bytes]:
+        try:
+            return pickle.dumps((event_type, data), pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logging.error(f"Cannot journal '{event_type}': {e}")
+            return None
+
+    def delivered(self) -> None:
+        """A recorded event (or batch) has been delivered; takes a snapshot when one is due."""
+        with self._lock:
+            self._open -= 1
+            if self._open or not self._since_snapshot or not self.modules:
+                return
+            if (self.snapshot_every and self._since_snapshot >= self.snapshot_every) or (
+                    self.snapshot_interval is not None
+                    and time.monotonic() - self._snapshot_at >= self.snapshot_interval):
+                self.snapshot()
+
+    def _append(self, payload: bytes) -> None:
+        """Write one entry at the end of the log (called with _lock held)."""
+        end = self._offset + ENTRY_HEADER.size + len(payload)
+        if end + ENTRY_HEADER.size > len(self._map):
+            self._grow(end + ENTRY_HEADER.size)
+        seq = self.seq + 1
+        self._map[self._offset + ENTRY_HEADER.size:end] = payload
+        ENTRY_HEADER.pack_into(self._map, self._offset, len(payload), zlib.crc32(payload), seq, time.time_ns())
+        if self.sync:
+            self._map.flush()
+        self._offset = end
+        self.seq = seq
+        self.written += 1
+        self._since_snapshot += 1
+
+    def _grow(self, needed: int) -> None:
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.flush()
+        self._map.close()
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    # Snapshots
+
+    def snapshot(self) -> int:
+        """Snapshot the modules now and rewind the log; returns the sequence number covered."""
+        with self._lock:
+            states = {}
+            for name, module in self.modules.items():
+                try:
+                    state = module.snapshot_state()
+                except Exception as e:
+                    # keep the log: it is all there is for this module's state
+                    self.errors += 1
+                    logging.error(f"Snapshot of module {name} failed: {e}")
+                    return self.snapshot_seq
+                if state is not None:
+                    states[name] = (module.__class__.__name__, state)
+            snapshot = {"seq": self.seq, "time": time.time(), "modules": states}
+            tmp = self.snapshot_path + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.snapshot_path)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Writing journal snapshot failed: {e}")
+                return self.snapshot_seq
+            self._map.flush()
+            # Entries up to seq are covered by the snapshot; new ones overwrite them
+            self.snapshot_seq = self.seq
+            self._offset = 0
+            self._since_snapshot = 0
+            self._snapshot_at = time.monotonic()
+            self.snapshots += 1
+            return self.snapshot_seq
+
+    def _load_snapshot(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Unreadable journal snapshot {self.snapshot_path}: {e}")
+            return None
+
+    # Reading and recovery
+
+    def _scan(self) -> Tuple[int, int]:
+        """Last sequence number and end offset of the valid entries of the log."""
+        last_seq, end = 0, 0
+        for seq, _, _, _, end in self._entries():
+            last_seq = seq
+        return last_seq, end
+
+    def _entries(self) -> Iterator[Tuple[int, int, bytes, int, int]]:
+        """(seq, wall ns, payload, offset, end offset) of each valid entry, in order."""
+        buf = self._map
+        size = len(buf)
+        offset = 0
+        expected = None
+        while offset + ENTRY_HEADER.size <= size:
+            length, crc, seq, wall = ENTRY_HEADER.unpack_from(buf, offset)
+            start = offset + ENTRY_HEADER.size
+            end = start + length
+            if not length or end > size or (expected is not None and seq != expected):
+                return
+            payload = buf[start:end]
+            if zlib.crc32(payload) != crc:
+                return
+            yield seq, wall, payload, offset, end
+            expected = seq + 1
+            offset = end
+
+    def entries(self, after: int = 0) -> Iterator[Tuple[int, int, str, Any]]:
+        """(seq, wall clock ns, event type, data) of the journaled events with seq > after."""
+        with self._lock:
+            raw = [(seq, wall, payload) for seq, wall, payload, _, _ in self._entries() if seq > after]
+        for seq, wall, payload in raw:
+            event_type, data = pickle.loads(payload)
+            yield seq, wall, event_type, data
+
+    def recover(self, modules: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Restore modules (name -> module) from the last snapshot and replay the
+        events journaled after it; they are snapshotted from now on.  Call it
+        before the modules start and before the journal is set on the
+        dispatcher.  Returns the snapshot seq, events replayed and time taken.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self.modules = modules
+            snapshot = self._load_snapshot()
+            restored = 0
+            if snapshot:
+                for name, (class_name, state) in snapshot["modules"].items():
+                    module = modules.get(name)
+                    if module is None or module.__class__.__name__ != class_name:
+                        logging.warning(f"Journal snapshot of {name} ({class_name}) has no matching module")
+                        continue
+                    try:
+                        module.restore_state(state)
+                        restored += 1
+                    except Exception as e:
+                        self.errors += 1
+                        logging.error(f"Restoring module {name} from the journal failed: {e}")
+
+            replayed = 0
+            for _, _, event_type, data in self.entries(after=self.snapshot_seq):
+                replayed += 1
+                for name, module in modules.items():
+                    try:
+                        module.replay_event(event_type, data)
+                    except Exception as e:
+                        self.errors += 1
+                        logging.error(f"Replaying '{event_type}' into module {name} failed: {e}")
+
+        self.last_recovery = {
+            "snapshot_seq": self.snapshot_seq,
+            "snapshot_time": snapshot["time"] if snapshot else None,
+            "modules_restored": restored,
+            "replayed": replayed,
+            "seconds": time.perf_counter() - start,
+        }
+        logging.info("Journal recovery: %d modules from snapshot seq %d, %d events replayed in %.1fms" % (
+            restored, self.snapshot_seq, replayed, self.last_recovery["seconds"] * 1e3))
+        return self.last_recovery
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "seq": self.seq,
+                "snapshot_seq": self.snapshot_seq,
+                "written": self.written,
+                "snapshots": self.snapshots,
+                "errors": self.errors,
+                "log_bytes": self._offset,
+                "map_bytes": len(self._map),
+            }
+
+    def close(self, snapshot: bool = True) -> None:
+        """Take a final snapshot if anything was journaled since the last one, then unmap the log."""
+        with self._lock:
+            if self._map.closed:
+                return
+            if snapshot and self._since_snapshot and self.modules:
+                self.snapshot()
+            self._map.flush()
+            self._map.close()
+            os.close(self._fd)
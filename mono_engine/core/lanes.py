@@ -0,0 +1,276 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from streaming.latency import RollingHistogram
+
+LANE_EXECUTION = 0
+LANE_STATE = 1
+LANE_MARKET_DATA = 2
+LANE_NAMES = ("execution", "state", "market_data")
+
+# event type -> lane; anything not listed goes to the default lane (state)
+DEFAULT_LANES = {
+    "on_order_update": LANE_EXECUTION,
+    "on_trade": LANE_EXECUTION,
+    "order_filled": LANE_EXECUTION,
+    "order_placed": LANE_EXECUTION,
+    "order_rejected": LANE_EXECUTION,
+    "order_canceled": LANE_EXECUTION,
+    "buy_signal": LANE_EXECUTION,
+    "sell_signal": LANE_EXECUTION,
+    "on_tick": LANE_MARKET_DATA,
+    "on_depth": LANE_MARKET_DATA,
+    "on_greeks": LANE_MARKET_DATA,
+    "on_ohlc": LANE_MARKET_DATA,
+}
+
+# lane -> most events it may hold; lanes not listed are unbounded
+DEFAULT_MAX_QUEUE = {LANE_MARKET_DATA: 50000}
+
+_ABSORBED = object()  # put(): the event was merged into queued ones
+
+
+class LaneScheduler:
+    """
+    Priority lanes in front of the EventDispatcher's callbacks.
+
+    publish() only queues the event in its lane; one delivery thread runs
+    the callbacks, always taking the next event of the highest-priority
+    non-empty lane, so an order update or fill waits for at most the tick
+    callback already running rather than for the whole tick backlog.
+
+    Starvation protection: a lower lane is served once after max_burst
+    higher-lane events in a row while it was waiting, or as soon as its
+    oldest event has waited max_wait seconds.  Each lane tracks how long
+    events waited before delivery (a RollingHistogram in nanoseconds) and
+    its queue high water mark; see stats().
+
+    Queue bounds: max_queue (lane -> limit) caps the events queued in the
+    market data and state lanes, an item of a batch counting as one event.
+    When a bounded lane is full, an event (or each item of a batch)
+    replaces the queued one of the same type and key_field value (a newer
+    tick for a symbol still waiting); what is left makes room by dropping
+    the oldest queued entries.  Queued, delivered, dropped and conflated are
+    all counted in events in stats().  The execution lane is never bounded:
+    an order update or fill must not be lost.
+    """
+
+    def __init__(self, deliver: Callable[[str, Any], None], lanes: Optional[Dict[str, int]] = None,
+                 deliver_batch: Optional[Callable[[str, Any], None]] = None,
+                 default_lane: int = LANE_STATE, max_burst: int = 64, max_wait: float = 0.05,
+                 window: float = 60.0, max_queue: Optional[Dict[int, int]] = None, key_field: str = "symbol"):
+        self.deliver = deliver
+        self.deliver_batch = deliver_batch
+        self.lanes = dict(DEFAULT_LANES if lanes is None else lanes)
+        self.default_lane = default_lane
+        self.max_burst = max_burst
+        self.max_wait_ns = int(max_wait * 1e9)
+        self.key_field = key_field
+        limits = dict(DEFAULT_MAX_QUEUE if max_queue is None else max_queue)
+        if limits.get(LANE_EXECUTION) is not None:
+            raise ValueError("the execution lane cannot be bounded")
+        self.max_queue = [limits.get(lane) for lane in range(len(LANE_NAMES))]
+
+        self.delivered = [0] * len(LANE_NAMES)
+        self.high_water = [0] * len(LANE_NAMES)
+        self.promoted = 0
+        self.dropped = [0] * len(LANE_NAMES)
+        self.conflated = [0] * len(LANE_NAMES)
+        self.latency = [RollingHistogram(window) for _ in LANE_NAMES]
+
+        self._queues = [deque() for _ in LANE_NAMES]
+        self._sizes = [0] * len(LANE_NAMES)  # events queued per lane, a batch counting its items
+        # Bounded lanes: (event type, key) -> (entry, position in its batch or None), for conflation
+        self._latest = [{} if limit is not None else None for limit in self.max_queue]
+        self._burst = 0
+        self._busy = False
+        self._cond = threading.Condition()
+        self._stopped = True
+        self._thread: Optional[threading.Thread] = None
+
+    def lane_of(self, event_type: str) -> int:
+        return self.lanes.get(event_type, self.default_lane)
+
+    def set_lane(self, event_type: str, lane: int) -> None:
+        if not 0 <= lane < len(LANE_NAMES):
+            raise ValueError(f"lane must be one of 0..{len(LANE_NAMES) - 1}")
+        self.lanes[event_type] = lane
+
+    def put(self, event_type: str, data: Any, batch: bool = False) -> None:
+        """Queue one event, or with batch=True a list of them for deliver_batch."""
+        lane = self.lanes.get(event_type, self.default_lane)
+        with self._cond:
+            latest = self._latest[lane]
+            if latest is not None:
+                data = self._bound(lane, event_type, data, batch)
+                if data is _ABSORBED:
+                    return
+            entry = [time.perf_counter_ns(), event_type, data, batch, False]
+            self._queues[lane].append(entry)
+            size = self._sizes[lane] = self._sizes[lane] + (len(data) if batch else 1)
+            if latest is not None:
+                if batch:
+                    for pos, item in enumerate(data):
+                        key = self._key(event_type, item)
+                        if key is not None:
+                            latest[key] = (entry, pos)
+                else:
+                    key = self._key(event_type, data)
+                    if key is not None:
+                        latest[key] = (entry, None)
+            if size > self.high_water[lane]:
+                self.high_water[lane] = size
+            self._cond.notify()
+
+    def _bound(self, lane: int, event_type: str, data: Any, batch: bool) -> Any:
+        """
+        Make room for an event (or batch) in a bounded lane: items whose key
+        is already queued replace it in place, then the oldest entries are
+        dropped until the rest fits.  Returns what is left to queue, or
+        _ABSORBED when every item replaced a queued one.
+        """
+        items = data if batch else (data,)
+        limit = self.max_queue[lane]
+        if self._sizes[lane] + len(items) <= limit:
+            return data
+        latest = self._latest[lane]
+        queue = self._queues[lane]
+        while True:
+            refs = [latest.get(self._key(event_type, item)) for item in items]
+            rest = [item for item, ref in zip(items, refs) if ref is None]
+            if not queue or self._sizes[lane] + len(rest) <= limit:
+                break
+            self._drop_oldest(lane)  # may take queued items some of ours would replace
+        for item, ref in zip(items, refs):
+            if ref is None:
+                continue
+            entry, pos = ref
+            if pos is None:
+                entry[2] = item
+            else:
+                if not entry[4]:  # the publisher's list: replace items in a copy
+                    entry[2], entry[4] = list(entry[2]), True
+                entry[2][pos] = item
+            self.conflated[lane] += 1
+        if not rest:
+            return _ABSORBED
+        if len(rest) > limit:
+            self._dropped(lane, len(rest) - limit)
+            rest = rest[-limit:]
+        return rest if batch else rest[0]
+
+    def _key(self, event_type: str, item: Any):
+        if not isinstance(item, dict):
+            return None
+        value = item.get(self.key_field)
+        return None if value is None else (event_type, value)
+
+    def _forget(self, lane: int, entry: list) -> None:
+        """Take a dequeued entry off its lane's size and conflation index (called with the lock held)."""
+        _, event_type, data, batch, _ = entry
+        self._sizes[lane] -= len(data) if batch else 1
+        latest = self._latest[lane]
+        if latest is None:
+            return
+        for pos, item in (enumerate(data) if batch else ((None, data),)):
+            key = self._key(event_type, item)
+            ref = latest.get(key) if key is not None else None
+            if ref is not None and ref[0] is entry and ref[1] == pos:
+                del latest[key]
+
+    def _drop_oldest(self, lane: int) -> None:
+        entry = self._queues[lane].popleft()
+        self._forget(lane, entry)
+        self._dropped(lane, len(entry[2]) if entry[3] else 1)
+
+    def _dropped(self, lane: int, count: int) -> None:
+        if not self.dropped[lane]:
+            logging.warning(f"Event lane {LANE_NAMES[lane]} is full ({self.max_queue[lane]} events); "
+                            f"dropping the oldest")
+        self.dropped[lane] += count
+
+    def _next(self):
+        """Lane to serve next (called with the lock held and something queued)."""
+        queues = self._queues
+        top = next(lane for lane, queue in enumerate(queues) if queue)
+        waiting = [lane for lane in range(top + 1, len(queues)) if queues[lane]]
+        if not waiting:
+            self._burst = 0
+            return top
+        now = time.perf_counter_ns()
+        for lane in waiting:
+            if now - queues[lane][0][0] >= self.max_wait_ns:
+                break
+        else:
+            lane = waiting[0] if self._burst >= self.max_burst else None
+        if lane is None:
+            self._burst += 1
+            return top
+        self._burst = 0
+        self.promoted += 1
+        return lane
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not any(self._queues) and not self._stopped:
+                    self._cond.wait()
+                if not any(self._queues):
+                    return
+                lane = self._next()
+                entry = self._queues[lane].popleft()
+                self._forget(lane, entry)
+                queued_at, event_type, data, batch, _ = entry
+                self._busy = True
+            self.latency[lane].record(time.perf_counter_ns() - queued_at)
+            try:
+                if batch:
+                    self.deliver_batch(event_type, data)
+                else:
+                    self.deliver(event_type, data)
+            except Exception as e:
+                logging.error(f"Event delivery failed for '{event_type}': {e}")
+            with self._cond:
+                self.delivered[lane] += len(data) if batch else 1
+                self._busy = False
+                if not any(self._queues):
+                    self._cond.notify_all()
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="event-lanes", daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every lane is empty and delivered; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy and not any(self._queues), timeout)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Deliver what is queued, then stop the delivery thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Per lane: queued, delivered, high water, limit, dropped, conflated and wait
+        latency (ns); plus starvation promotions."""
+        with self._cond:
+            stats = {name: {"queued": self._sizes[lane], "delivered": self.delivered[lane],
+                            "high_water": self.high_water[lane], "max_queue": self.max_queue[lane],
+                            "dropped": self.dropped[lane], "conflated": self.conflated[lane]}
+                     for lane, name in enumerate(LANE_NAMES)}
+            stats["promoted"] = self.promoted
+        for lane, name in enumerate(LANE_NAMES):
+            stats[name]["latency"] = self.latency[lane].snapshot()
+        return stats
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from mono_engine.core.delivery import callback_name
+
+
+class DispatchProfiler:
+    """
+    Per (event type, callback) dispatch counters of an EventDispatcher:
+    calls, items (events delivered, > calls for batch callbacks), total and
+    max duration in nanoseconds and exceptions raised.
+
+    For threaded and conflated subscribers the time measured is the enqueue
+    on the publishing thread; their worker's own counters are in
+    EventDispatcher.subscriber_stats().  start() logs summary() every
+    log_interval seconds on a background thread.
+    """
+
+    def __init__(self, log_interval: Optional[float] = None, top: int = 10):
+        self.log_interval = log_interval
+        self.top = top
+        self.since = time.monotonic()
+        # (event type, callback) -> [calls, items, total ns, max ns, errors]
+        self._entries: Dict[Tuple[str, Hashable], List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, event_type: str, callback: Callable, elapsed_ns: int, items: int = 1,
+               failed: bool = False) -> None:
+        key = (event_type, callback)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [0, 0, 0, 0, 0]
+            entry[0] += 1
+            entry[1] += items
+            entry[2] += elapsed_ns
+            if elapsed_ns > entry[3]:
+                entry[3] = elapsed_ns
+            if failed:
+                entry[4] += 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """One dict per (event type, callback), slowest total first."""
+        with self._lock:
+            entries = [(key, list(entry)) for key, entry in self._entries.items()]
+        stats = []
+        for (event_type, callback), (calls, items, total, high, errors) in entries:
+            stats.append({
+                "event": event_type,
+                "callback": callback_name(callback),
+                "calls": calls,
+                "items": items,
+                "total_ns": total,
+                "mean_ns": total // calls if calls else 0,
+                "max_ns": high,
+                "errors": errors,
+            })
+        stats.sort(key=lambda entry: entry["total_ns"], reverse=True)
+        return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.since = time.monotonic()
+
+    def summary(self, top: Optional[int] = None) -> str:
+        stats = self.stats()
+        top = self.top if top is None else top
+        lines = ["dispatch profile over %.0fs (%d callbacks, slowest first):" % (
+            time.monotonic() - self.since, len(stats))]
+        for entry in stats[:top]:
+            lines.append("  %-18s %-40s calls=%-8d items=%-8d total=%.1fms mean=%.1fus max=%.1fus errors=%d" % (
+                entry["event"], entry["callback"], entry["calls"], entry["items"], entry["total_ns"] / 1e6,
+                entry["mean_ns"] / 1e3, entry["max_ns"] / 1e3, entry["errors"]))
+        return "\n".join(lines)
+
+    def start(self) -> None:
+        if not self.log_interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dispatch-profile", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.log_interval):
+            logging.info(self.summary())
@@ -0,0 +1,92 @@
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from streaming.nxtradstream import L1, L5, OHLC, GREEKS, AUTH, MARKET_STATUS, EVENTS, PING
+
+from mono_engine.core.events import (EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS, EVENT_OHLC, EVENT_ORDER_UPDATE,
+                                     EVENT_TRADE, EVENT_POSITION_UPDATE)
+
+# msgType of a market data packet -> event it is published as
+STREAM_EVENTS = {
+    L1: EVENT_TICK,
+    L5: EVENT_DEPTH,
+    GREEKS: EVENT_GREEKS,
+    OHLC: EVENT_OHLC,
+}
+
+# Packets that are not market data; the Streamer handles these itself
+CONTROL_TYPES = frozenset((AUTH, MARKET_STATUS, EVENTS, PING))
+
+# evntType of an EVENTS packet -> event it is published as
+ACCOUNT_EVENTS = {
+    "orders": EVENT_ORDER_UPDATE,
+    "trades": EVENT_TRADE,
+    "positions": EVENT_POSITION_UPDATE,
+}
+
+# Broker order statuses -> the statuses the Order module acts on
+ORDER_STATUSES = {
+    "complete": "FILLED",
+    "completed": "FILLED",
+    "filled": "FILLED",
+    "traded": "FILLED",
+    "partial": "PARTIAL",
+    "partially_filled": "PARTIAL",
+    "partially filled": "PARTIAL",
+    "rejected": "REJECTED",
+    "cancelled": "CANCELLED",
+    "canceled": "CANCELLED",
+}
+
+
+def stream_event(data: Dict[str, Any]) -> str:
+    """Event type of a market data packet (EVENT_TICK for anything unknown)."""
+    return STREAM_EVENTS.get(data.get("msgType"), EVENT_TICK)
+
+
+def normalize_market_status(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    marketStatus packet -> {"segments": {"NSE": 1, ...}, "status": [...]}, keeping
+    the decoded per-segment list as "status".
+    """
+    status = data.get("status") or []
+    return {"segments": {s.get("exchSeg"): s.get("marketStatus") for s in status}, "status": status}
+
+
+def normalize_account_event(data: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    EVENTS packet -> (event type, payload), or None if it is not an order,
+    trade or position event.  The payload keeps the broker fields and adds
+    the snake_case keys the modules read (order_id, status, symbol, side,
+    quantity, filled_qty, price, reason).
+    """
+    message = data.get("message")
+    try:
+        event = json.loads(message) if isinstance(message, str) else dict(message or {})
+    except ValueError:
+        logging.warning(f"Unparseable stream event: {message!r}")
+        return None
+    event_type = ACCOUNT_EVENTS.get(event.get("evntType"))
+    if event_type is None:
+        return None
+
+    payload = dict(event)
+    payload["order_id"] = event.get("orderId")
+    payload["symbol"] = event.get("trdSym")
+    payload["side"] = (event.get("side") or "").lower() or None
+    payload["quantity"] = event.get("qty")
+    payload["price"] = event.get("price")
+    if event_type == EVENT_ORDER_UPDATE:
+        raw_status = str(event.get("status") or "")
+        status = ORDER_STATUSES.get(raw_status.lower(), raw_status.upper())
+        payload["status"] = status
+        filled = event.get("fillQty", event.get("filledQty"))
+        if filled is None:
+            filled = event.get("qty", 0) if status == "FILLED" else 0
+        payload["filled_qty"] = filled
+        payload["reason"] = event.get("reason") or event.get("msg")
+    elif event_type == EVENT_TRADE:
+        payload["fill_price"] = event.get("price")
+        payload["fill_time"] = event.get("fillTime", event.get("orderTime"))
+    return event_type, payload
@@ -0,0 +1,108 @@
+import bisect
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+
+class HashRing:
+    """
+    Consistent token -> shard assignment.
+
+    Each shard owns `replicas` points on a crc32 ring and a token belongs to
+    the first point at or after its own hash, so the assignment is stable
+    across restarts and processes, and going from N to N+1 shards only moves
+    about 1/(N+1) of the tokens.
+    """
+
+    def __init__(self, shards: int, replicas: int = 64):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.shards = shards
+        points = sorted((zlib.crc32(f"shard-{shard}-{i}".encode()), shard)
+                        for shard in range(shards) for i in range(replicas))
+        self._hashes = [h for h, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, token: Any) -> int:
+        if self.shards == 1:
+            return 0
+        i = bisect.bisect(self._hashes, zlib.crc32(str(token).encode()))
+        return self._owners[i % len(self._owners)]
+
+    def split(self, tokens: Iterable[Any]) -> Dict[int, List[Any]]:
+        """Tokens grouped by shard, keeping their order."""
+        parts = defaultdict(list)
+        for token in tokens:
+            parts[self.shard_for(token)].append(token)
+        return parts
+
+
+class ShardMetrics:
+    """
+    Throughput and exchange-time lag of one shard's packets.
+
+    Lag is local time minus the packet's ltt (1 s resolution on the wire),
+    tracked as the last value, the maximum and an exponential moving average.
+    Every packet is counted but the lag is only taken from one packet in
+    lag_every, and a formatted ltt is parsed once per distinct value, to keep
+    the dispatch path cheap.
+    """
+
+    def __init__(self, shard: int, alpha: float = 0.05, lag_every: int = 16):
+        self.shard = shard
+        self.alpha = alpha
+        self.lag_every = max(lag_every, 1)
+        self.packets = 0
+        self.lag_samples = 0
+        self.lag = None
+        self.avg_lag = None
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._since = time.monotonic()
+        self._since_packets = 0
+        self._ltt = (None, None)  # last formatted ltt parsed and its epoch seconds, swapped as one
+
+    def record(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self.packets += 1
+            if (self.packets - 1) % self.lag_every:
+                return
+        ltt = data.get("ltt")
+        if ltt is None:
+            return
+        if isinstance(ltt, (int, float)):
+            ts = ltt
+        elif ltt == self._ltt[0]:
+            ts = self._ltt[1]
+        else:
+            try:
+                ts = datetime.fromisoformat(ltt).timestamp()
+            except (TypeError, ValueError):
+                return
+            self._ltt = (ltt, ts)
+        lag = time.time() - ts
+        with self._lock:
+            self.lag_samples += 1
+            self.lag = lag
+            self.avg_lag = lag if self.avg_lag is None else self.avg_lag + self.alpha * (lag - self.avg_lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus packets/sec since the previous snapshot."""
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._since
+            rate = (self.packets - self._since_packets) / elapsed if elapsed > 0 else 0.0
+            self._since, self._since_packets = now, self.packets
+            return {
+                "shard": self.shard,
+                "packets": self.packets,
+                "rate": rate,
+                "lag": self.lag,
+                "avg_lag": self.avg_lag,
+                "max_lag": self.max_lag,
+            }
@@ -1,36 +1,176 @@
 import logging
 import time
+from functools import partial
 
-from streaming.nxtradstream import NxtradStream
+from streaming.latency import LatencyMonitor
+from streaming.nxtradstream import NxtradStream, MARKET_STATUS, EVENTS
+from streaming.process_stream import ProcessNxtradStream
+from streaming.recorder import FrameRecorder, FrameReplayer, capture_files
 
-from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_ORDER_UPDATE, EVENT_TRADE, EVENT_CONNECT, EVENT_DISCONNECT, EVENT_ERROR
+from mono_engine.core.conflation import Conflator
+from mono_engine.core.routing import STREAM_EVENTS, CONTROL_TYPES, stream_event, normalize_market_status, normalize_account_event
+from mono_engine.core.sharding import HashRing, ShardMetrics
+from mono_engine.core.subscriptions import SubscriptionManager, STREAM_L1, STREAM_L5, STREAM_GREEKS, STREAM_OHLC
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_ORDER_UPDATE, EVENT_TRADE, EVENT_CONNECT, EVENT_DISCONNECT, EVENT_ERROR, EVENT_MARKET_STATUS
 
 class Streamer:
-    def __init__(self, session, events: EventDispatcher, host: str = "api.tradejini.com"):
+    """
+    Tradejini stream -> EventDispatcher bridge.
+
+    Packets are published by msgType: L1 as EVENT_TICK, L5 as EVENT_DEPTH,
+    greeks as EVENT_GREEKS and OHLC as EVENT_OHLC.  Market status packets
+    are published as EVENT_MARKET_STATUS ({"segments": {exchSeg: status}})
+    and order/trade/position events as EVENT_ORDER_UPDATE / EVENT_TRADE /
+    EVENT_POSITION_UPDATE with normalized fields (see core/routing.py).
+    The packets of one websocket frame are published together, one
+    publish_batch() per event type.
+
+    With shards > 1 the subscribed tokens are spread over that many
+    websocket connections by a consistent HashRing, each decoding on its own
+    pipeline worker; all shards publish into the same EventDispatcher, so
+    subscribers may be called from several threads at once.  Order/trade
+    events are subscribed on shard 0 only.  shard_stats() reports per-shard
+    throughput, exchange-time lag and queue counters.
+    """
+
+    def __init__(self, session, events: EventDispatcher, host: str = "api.tradejini.com",
+                 stream_options: dict = None, conflate_interval: float = None,
+                 subscription_options: dict = None, shards: int = 1, feed_process: bool = False,
+                 record_dir: str = None, record_compress: bool = False, latency_options: dict = None):
         self.session = session
         self.events = events
         self.host = host
-        self.nx_stream: NxtradStream = None
         self.connected = False
+        # Extra NxtradStream keyword arguments, e.g. pipeline/queue_size/overflow/workers
+        self.stream_options = dict(stream_options or {})
+        if shards > 1:
+            self.stream_options.setdefault("pipeline", True)
+            self.stream_options.setdefault("workers", 1)
+        # Field projection per owner and message type; streams decode only the
+        # union of the requested fields (see request_fields).  A "fields"
+        # stream option is registered under the owner "config".
+        self._field_requests = {}
+        for msg_type, fields in (self.stream_options.pop("fields", None) or {}).items():
+            self._field_requests.setdefault("config", {})[msg_type] = fields
+        # conflate_interval set: ticks are coalesced per symbol before EVENT_TICK
+        # (0 = once per delivery cycle, > 0 = at most once per interval seconds)
+        self.conflator = (Conflator(events, EVENT_TICK, conflate_interval, route=stream_event)
+                          if conflate_interval is not None else None)
+        # Latest marketStatus per exchange segment
+        self.market_status = {}
+
+        # record_dir: every raw frame of every connection is captured there (daily files)
+        self.recorder = FrameRecorder(record_dir, compress=record_compress) if record_dir else None
+        if self.recorder is not None and feed_process:
+            logging.warning("record_dir is ignored with feed_process; frames are received in the feed process")
+        # latency_options: LatencyMonitor arguments (window, ping_interval, log_interval);
+        # frames and packets of every connection are timed, see latency_stats()
+        self.latency = LatencyMonitor(**latency_options) if latency_options is not None else None
+        if self.latency is not None and feed_process:
+            logging.warning("latency_options is ignored with feed_process; frames are decoded in the feed process")
+        # feed_process: each connection decodes in a child process (ProcessNxtradStream)
+        self.feed_process = feed_process
+        self.shards = shards
+        self.ring = HashRing(shards)
+        self.nx_streams = [None] * shards
+        self._shard_connected = [False] * shards
+        self.shard_metrics = [ShardMetrics(i) for i in range(shards)] if shards > 1 else []
+        # Desired tokens per stream and owner, one registry per shard; replayed on every (re)connect
+        self.shard_subscriptions = [SubscriptionManager(partial(self._send_request, shard=i),
+                                                        **(subscription_options or {}))
+                                    for i in range(shards)]
+        self.subscriptions = self.shard_subscriptions[0]
+        self._auth_token = None
+
+    @property
+    def nx_stream(self) -> NxtradStream:
+        return self.nx_streams[0]
+
+    @nx_stream.setter
+    def nx_stream(self, stream: NxtradStream):
+        self.nx_streams[0] = stream
+
+    def _shard_of(self, nx_stream) -> int:
+        for i, stream in enumerate(self.nx_streams):
+            if stream is nx_stream:
+                return i
+        return 0
 
-    def _stream_callback(self, nx_stream, data):
+    def _stream_callback(self, nx_stream, data, shard=0):
         logging.info("Stream data received: %s", data)  # Change to info for console display
-        self.events.publish(EVENT_TICK, data)
+        msg_type = data.get("msgType")
+        if msg_type in CONTROL_TYPES:
+            self._control_packet(data)
+            return
+        event_type = STREAM_EVENTS.get(msg_type, EVENT_TICK)
+        if self.shard_metrics:
+            self.shard_metrics[shard].record(data)
+        if self.conflator is not None:
+            self.conflator.push(data)
+        else:
+            self.events.publish(event_type, data)
+
+    def _frame_callback(self, nx_stream, packets, shard=0):
+        """All packets of one frame: published with one publish_batch per event type."""
+        batches = {}
+        metrics = self.shard_metrics[shard] if self.shard_metrics else None
+        conflator = self.conflator
+        for data in packets:
+            logging.info("Stream data received: %s", data)  # Change to info for console display
+            msg_type = data.get("msgType")
+            if msg_type in CONTROL_TYPES:
+                routed = self._route_control(data)
+                if routed is not None:
+                    batches.setdefault(routed[0], []).append(routed[1])
+                continue
+            if metrics is not None:
+                metrics.record(data)
+            if conflator is not None:
+                conflator.push(data)
+            else:
+                batches.setdefault(STREAM_EVENTS.get(msg_type, EVENT_TICK), []).append(data)
+        for event_type, items in batches.items():
+            self.events.publish_batch(event_type, items)
+
+    def _control_packet(self, data):
+        routed = self._route_control(data)
+        if routed is not None:
+            self.events.publish(*routed)
+
+    def _route_control(self, data):
+        """(event type, payload) of a market status or account event packet, or None."""
+        msg_type = data.get("msgType")
+        if msg_type == MARKET_STATUS:
+            status = normalize_market_status(data)
+            self.market_status.update(status["segments"])
+            return EVENT_MARKET_STATUS, status
+        if msg_type == EVENTS:
+            return normalize_account_event(data)
+        logging.debug(f"Unrouted stream packet: {data}")
+        return None
 
     def _connect_callback(self, nx_stream, ev):
         status = ev.get("s")
-        logging.info("WS event: %s", ev)
+        shard = self._shard_of(nx_stream)
+        logging.info("WS event (shard %d): %s", shard, ev)
 
         if status == "connected":
             self.connected = True
-            nx_stream.subscribeEvents(["orders", "positions", "trades"])
-            self.events.publish(EVENT_CONNECT, ev)
+            self._shard_connected[shard] = True
+            if shard == 0:
+                nx_stream.subscribeEvents(["orders", "positions", "trades"])
+            sent = self.shard_subscriptions[shard].replay()
+            if sent:
+                logging.info(f"Replayed subscriptions in {sent} requests")
+            if shard == 0:
+                self.events.publish(EVENT_CONNECT, ev)
         elif status == "disconnected":
-            self.connected = False
+            self._shard_connected[shard] = False
+            self.connected = any(self._shard_connected)
             self.events.publish(EVENT_DISCONNECT, ev)
             logging.warning("WS disconnected — reconnecting in 5s")
             time.sleep(5)
-            self.start()
+            self._start_shard(shard)
         else:
             self.events.publish(EVENT_ERROR, ev)
 
@@ -46,40 +186,179 @@ class Streamer:
 
         apikey = self.session.config.credentials['apikey']
         access_token = self.session.rest.access_token
-        auth_token = f"{apikey}:{access_token}"
+        self._auth_token = f"{apikey}:{access_token}"
+
+        logging.info("Starting WebSocket streamer" + (f" with {self.shards} shards" if self.shards > 1 else ""))
+        if self.conflator is not None:
+            self.conflator.start()
+        if self.recorder is not None:
+            self.recorder.reopen()  # closed by a previous stop()
+        if self.latency is not None and not self.feed_process:
+            self.latency.start()
+        for shard in range(self.shards):
+            self._start_shard(shard)
+        return True
 
-        logging.info("Starting WebSocket streamer")
-        self.nx_stream = NxtradStream(
+    def _start_shard(self, shard: int) -> None:
+        old = self.nx_streams[shard]
+        if isinstance(old, ProcessNxtradStream):
+            old.disconnect()
+        elif old is not None and old.frames is not None:
+            old.frames.close()  # let the old decode workers drain and exit
+        self._shard_connected[shard] = False
+        options = dict(self.stream_options)
+        if self.recorder is not None and not self.feed_process:
+            options["recorder"] = self.recorder
+        if self.latency is not None and not self.feed_process:
+            options["latency"] = self.latency
+        fields = self.fields()
+        if fields:
+            options["fields"] = fields
+        if self.feed_process:
+            stream_class = ProcessNxtradStream
+        else:
+            stream_class = NxtradStream
+            # each frame's packets reach the dispatcher as one publish_batch per event type
+            options["frame_cb"] = partial(self._frame_callback, shard=shard)
+        stream = stream_class(
             self.host,
-            stream_cb=self._stream_callback,
-            connect_cb=self._connect_callback
+            stream_cb=partial(self._stream_callback, shard=shard),
+            connect_cb=self._connect_callback,
+            **options
         )
-        self.nx_stream.connect(auth_token)
-        return True
+        self.nx_streams[shard] = stream
+        stream.connect(self._auth_token)
+
+    def replay(self, capture, speed: float = None, max_gap: float = None) -> int:
+        """
+        Feed a capture (file, directory or glob) through the decoder into the
+        EventDispatcher, as if it came from the socket.  speed=None replays
+        as fast as possible, otherwise at `speed` times the recorded pace.
+        """
+        options = {k: v for k, v in self.stream_options.items() if k not in ("pipeline", "workers")}
+        if self.fields():
+            options["fields"] = self.fields()
+        stream = NxtradStream(self.host, stream_cb=self._stream_callback, frame_cb=self._frame_callback, **options)
+        replayer = FrameReplayer(capture_files(capture), speed=speed, max_gap=max_gap)
+        count = replayer.replay(stream.process_frame)
+        if self.conflator is not None:
+            self.conflator.drain()
+        logging.info(f"Replayed {count} frames ({replayer.bytes} bytes) from {capture}")
+        return count
+
+    def _send_request(self, req, shard=0) -> bool:
+        stream = self.nx_streams[shard]
+        if stream and self._shard_connected[shard]:
+            return stream.sendRequest(req)
+        return False
+
+    def _set_subscription(self, owner, stream_type, symbols, interval=None):
+        parts = self.ring.split(symbols)
+        added, removed = [], []
+        for shard, manager in enumerate(self.shard_subscriptions):
+            a, r = manager.set(owner, stream_type, parts.get(shard, ()), interval)
+            added += a
+            removed += r
+        return added, removed
+
+    def shard_stats(self):
+        """Per-shard packets, rate, lag, subscribed token counts and pipeline counters."""
+        stats = []
+        for shard in range(self.shards):
+            entry = self.shard_metrics[shard].snapshot() if self.shard_metrics else {"shard": shard}
+            entry["connected"] = self._shard_connected[shard]
+            entry["tokens"] = sum(len(self.shard_subscriptions[shard].desired(t)) for t in
+                                  (STREAM_L1, STREAM_L5, STREAM_GREEKS))
+            stream = self.nx_streams[shard]
+            entry["pipeline"] = stream.pipeline_stats() if stream is not None else None
+            stats.append(entry)
+        return stats
+
+    def fields(self):
+        """Current projection: message type -> union of the requested fields (None: all fields)."""
+        union = {}
+        for requests in self._field_requests.values():
+            for msg_type, fields in requests.items():
+                if fields is None or union.get(msg_type, ()) is None:
+                    union[msg_type] = None
+                else:
+                    union[msg_type] = union.get(msg_type, frozenset()) | frozenset(fields)
+        return union
+
+    def request_fields(self, owner, msg_type, fields):
+        """
+        Declare the fields `owner` reads from `msg_type` ("L1", "OHLC" or
+        "greeks") packets; None means every field.  Once any owner declares
+        fields for a type, the other fields of that type are no longer
+        decoded, so every consumer of the type should declare its own.
+        """
+        self._field_requests.setdefault(owner, {})[msg_type] = None if fields is None else frozenset(fields)
+        self._apply_fields()
+
+    def release_fields(self, owner):
+        if self._field_requests.pop(owner, None) is not None:
+            self._apply_fields()
+
+    def _apply_fields(self):
+        fields = self.fields()
+        logging.info(f"Stream field projection: {fields or 'all fields'}")
+        for shard, stream in enumerate(self.nx_streams):
+            if isinstance(stream, (NxtradStream, ProcessNxtradStream)):
+                stream.set_fields(fields)
+            elif stream is not None:
+                logging.warning(f"Shard {shard} stream {type(stream).__name__} cannot apply a field projection")
+
+    def depth(self, symbol):
+        """Live DepthView of a symbol when the streams run with depth_book, else None."""
+        stream = self.nx_streams[self.ring.shard_for(symbol)]
+        book = getattr(stream, "depth_book", None)
+        return book.view(symbol) if book is not None else None
+
+    def latency_stats(self):
+        """Frame/decode/dispatch times, per-segment feed lag and ping RTT percentiles (ns), or None."""
+        return self.latency.snapshot() if self.latency is not None else None
+
+    def subscribe_l1(self, symbols, owner="streamer"):
+        """Make `symbols` the owner's L1 set; snapshots are requested for new symbols."""
+        added, removed = self._set_subscription(owner, STREAM_L1, symbols)
+        logging.info(f"L1 subscriptions for {owner}: +{added} -{removed}")
+
+    def subscribe_greeks(self, tokens, owner="streamer"):
+        added, removed = self._set_subscription(owner, STREAM_GREEKS, tokens)
+        logging.info(f"Greeks subscriptions for {owner}: +{added} -{removed}")
 
-    def subscribe_l1(self, symbols):
-        if self.nx_stream and self.connected:
-            self.nx_stream.subscribeL1(symbols)
-            self.nx_stream.subscribeL1SnapShot(symbols)
-            logging.info(f"Subscribed L1 + snapshot for: {symbols}")
+    def subscribe_l5(self, symbols, owner="streamer"):
+        added, removed = self._set_subscription(owner, STREAM_L5, symbols)
+        logging.info(f"L5 subscriptions for {owner}: +{added} -{removed}")
 
-    def subscribe_greeks(self, tokens):
-        if self.nx_stream and self.connected:
-            self.nx_stream.subscribeGreeks(tokens)
-            self.nx_stream.subscribeGreeksSnapShot(tokens)
-            logging.info(f"Subscribed greeks + snapshot for tokens: {tokens}")
+    def subscribe_l2(self, symbols, owner="streamer"):
+        self.subscribe_l5(symbols, owner)  # Alias l2 to l5
 
-    def subscribe_l5(self, symbols):
-        if self.nx_stream and self.connected:
-            self.nx_stream.subscribeL5(symbols)  # L5 for depth
-            self.nx_stream.subscribeL5SnapShot(symbols)  # Snapshot
-            logging.info(f"Subscribed L5 + snapshot for: {symbols}")
+    def subscribe_ohlc(self, symbols, interval, owner="streamer"):
+        added, removed = self._set_subscription(owner, STREAM_OHLC, symbols, interval)
+        logging.info(f"OHLC {interval} subscriptions for {owner}: +{added} -{removed}")
 
-    def subscribe_l2(self, symbols):
-        self.subscribe_l5(symbols)  # Alias l2 to l5
+    def unsubscribe(self, owner="streamer", stream_type=None, symbols=None, interval=None):
+        """Release an owner's symbols (all of them when stream_type is None)."""
+        for manager in self.shard_subscriptions:
+            if stream_type is None:
+                manager.remove_owner(owner)
+            else:
+                manager.remove(owner, stream_type, symbols, interval)
 
     def stop(self):
-        if self.nx_stream:
-            self.nx_stream.disconnect()
+        stopped = False
+        for shard, stream in enumerate(self.nx_streams):
+            if stream:
+                stream.disconnect()
+                self._shard_connected[shard] = False
+                stopped = True
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.latency is not None:
+            self.latency.stop()
+        if stopped:
             self.connected = False
-            logging.info("WebSocket streamer stopped")
\ No newline at end of file
+            if self.conflator is not None:
+                self.conflator.stop()
+            logging.info("WebSocket streamer stopped")
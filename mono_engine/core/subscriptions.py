@@ -0,0 +1,172 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+STREAM_L1 = "L1"
+STREAM_L5 = "L5"
+STREAM_GREEKS = "greeks"
+STREAM_OHLC = "OHLC"
+
+# One-shot snapshot request sent for newly added tokens of a stream type
+SNAPSHOT_TYPES = {STREAM_L1: "L1S", STREAM_L5: "L5S", STREAM_GREEKS: "greeks-snapshot"}
+
+# (stream type, OHLC chart interval or None)
+StreamKey = Tuple[str, Optional[str]]
+
+
+class SubscriptionManager:
+    """
+    Registry of the tokens each owner (module) wants per stream type.
+
+    A token stays subscribed while at least one owner holds it (reference
+    counted).  Every change is turned into stream requests through send(req):
+
+    - incremental=False (default): the server replaces the subscription of a
+      type on every "sub" request (see streaming/README.md), so the whole
+      desired set is sent in one request whenever it changes, and an empty
+      set is sent as "unsub".
+    - incremental=True: for servers that add on "sub" and remove per token
+      on "unsub", only the added/removed tokens are sent, in requests of at
+      most chunk_size tokens.
+
+    Newly added tokens also get a snapshot request, chunked in both modes.
+    replay() re-sends the full desired state, e.g. after a reconnect.
+    """
+
+    def __init__(self, send: Callable[[dict], bool] = None, chunk_size: int = 500,
+                 incremental: bool = False, snapshots: bool = True):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.send = send
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+        self.snapshots = snapshots
+        self.requests_sent = 0
+        self.requests_failed = 0
+
+        self._owners: Dict[Tuple[Hashable, StreamKey], Set[str]] = {}
+        self._refs: Dict[StreamKey, Dict[str, int]] = defaultdict(dict)
+        self._lock = threading.RLock()
+
+    def set(self, owner: Hashable, stream_type: str, tokens: Iterable[str],
+            interval: str = None) -> Tuple[List[str], List[str]]:
+        """Make `tokens` the owner's full set for the stream; returns (added, removed)."""
+        key = (stream_type, interval)
+        with self._lock:
+            current = self._owners.get((owner, key), set())
+            wanted = set(tokens)
+            return self.__apply(owner, key, wanted - current, current - wanted)
+
+    def add(self, owner: Hashable, stream_type: str, tokens: Iterable[str],
+            interval: str = None) -> Tuple[List[str], List[str]]:
+        key = (stream_type, interval)
+        with self._lock:
+            current = self._owners.get((owner, key), set())
+            return self.__apply(owner, key, set(tokens) - current, set())
+
+    def remove(self, owner: Hashable, stream_type: str, tokens: Iterable[str] = None,
+               interval: str = None) -> Tuple[List[str], List[str]]:
+        """Drop tokens (all of them if None) from the owner's set for the stream."""
+        key = (stream_type, interval)
+        with self._lock:
+            current = self._owners.get((owner, key), set())
+            drop = set(current) if tokens is None else current & set(tokens)
+            return self.__apply(owner, key, set(), drop)
+
+    def remove_owner(self, owner: Hashable) -> None:
+        """Release everything the owner holds, e.g. when a module stops."""
+        with self._lock:
+            for (_, (stream_type, interval)) in [k for k in self._owners if k[0] == owner]:
+                self.remove(owner, stream_type, interval=interval)
+
+    def desired(self, stream_type: str, interval: str = None) -> Set[str]:
+        with self._lock:
+            return set(self._refs.get((stream_type, interval), ()))
+
+    def owners(self, stream_type: str, token: str, interval: str = None) -> List[Hashable]:
+        key = (stream_type, interval)
+        with self._lock:
+            return [o for (o, k), tokens in self._owners.items() if k == key and token in tokens]
+
+    def replay(self) -> int:
+        """Send the full desired state of every stream; returns the request count."""
+        with self._lock:
+            before = self.requests_sent + self.requests_failed
+            for key, refs in list(self._refs.items()):
+                if not refs:
+                    continue
+                tokens = sorted(refs)
+                if self.incremental:
+                    self.__send_chunked(key, "sub", tokens)
+                else:
+                    self.__send_full(key)
+                self.__send_snapshot(key, tokens)
+            return self.requests_sent + self.requests_failed - before
+
+    def __apply(self, owner, key, add, drop):
+        refs = self._refs[key]
+        owned = self._owners.setdefault((owner, key), set())
+        added, removed = [], []
+        for token in sorted(add):
+            owned.add(token)
+            count = refs.get(token, 0)
+            refs[token] = count + 1
+            if not count:
+                added.append(token)
+        for token in sorted(drop):
+            owned.discard(token)
+            count = refs.get(token, 0) - 1
+            if count > 0:
+                refs[token] = count
+            else:
+                refs.pop(token, None)
+                removed.append(token)
+        if not owned:
+            del self._owners[(owner, key)]
+
+        if added or removed:
+            if self.incremental:
+                self.__send_chunked(key, "unsub", removed)
+                self.__send_chunked(key, "sub", added)
+            else:
+                self.__send_full(key)
+            self.__send_snapshot(key, added)
+        return added, removed
+
+    def __send_full(self, key):
+        tokens = sorted(self._refs.get(key, ()))
+        if tokens:
+            self.__send(self.__request(key, key[0], "sub", tokens))
+        else:
+            self.__send(self.__request(key, key[0], "unsub", None))
+
+    def __send_chunked(self, key, action, tokens):
+        for i in range(0, len(tokens), self.chunk_size):
+            self.__send(self.__request(key, key[0], action, tokens[i:i + self.chunk_size]))
+
+    def __send_snapshot(self, key, tokens):
+        snapshot_type = SNAPSHOT_TYPES.get(key[0])
+        if not self.snapshots or snapshot_type is None:
+            return
+        for i in range(0, len(tokens), self.chunk_size):
+            self.__send(self.__request(key, snapshot_type, "sub", tokens[i:i + self.chunk_size]))
+
+    @staticmethod
+    def __request(key, type, action, tokens):
+        req = {"type": type, "action": action}
+        if tokens is not None:
+            req["tokens"] = [{"t": t} for t in tokens]
+        if key[1] is not None:
+            req["chartInterval"] = key[1]
+        return req
+
+    def __send(self, req):
+        sent = bool(self.send and self.send(req))
+        if sent:
+            self.requests_sent += 1
+        else:
+            # kept in the desired state; replay() sends it once connected
+            self.requests_failed += 1
+            logging.debug(f"Subscription request not sent: {req['type']} {req['action']}")
+        return sent
@@ -5,6 +5,7 @@ import time
 
 from mono_engine.config import Config
 from mono_engine.core.events import EventDispatcher
+from mono_engine.core.journal import EventJournal
 from mono_engine.core.session import Session
 from mono_engine.core.streamer import Streamer
 
@@ -14,9 +15,26 @@ class MonoEngine:
         logging.basicConfig(level=getattr(logging, self.config.logging_level),
                             format='%(asctime)s - %(levelname)s - %(message)s')
 
-        self.events = EventDispatcher()
+        # event_lanes: LaneScheduler options ({} for defaults) to deliver order/fill
+        # events ahead of market data on a priority lane thread
+        self.events = EventDispatcher(lane_options=self.config.get('event_lanes'))
+        # event_profiling: DispatchProfiler options, e.g. {'log_interval': 60}, to time
+        # every callback from the start (also switchable at runtime, see events.enable_profiling)
+        if self.config.get('event_profiling') is not None:
+            self.events.enable_profiling(**self.config.get('event_profiling'))
+        # journal: EventJournal options, e.g. {'directory': 'journal'}, to journal order and
+        # state events and rebuild module state from the last snapshot on restart
+        journal_options = self.config.get('journal')
+        self.journal = EventJournal(**journal_options) if journal_options is not None else None
         self.session = Session(self.config)
-        self.streamer = Streamer(self.session, self.events)
+        self.streamer = Streamer(self.session, self.events, stream_options=self.config.get('stream'),
+                                 conflate_interval=self.config.get('conflate_interval'),
+                                 subscription_options=self.config.get('subscriptions'),
+                                 shards=self.config.get('stream_shards', 1),
+                                 feed_process=self.config.get('feed_process', False),
+                                 record_dir=self.config.get('record_dir'),
+                                 record_compress=self.config.get('record_compress', False),
+                                 latency_options=self.config.get('latency'))
 
         self.modules = {}  # Changed to dict for keyed access
         self.mode = 'real'  # Default mode; set in run_engine.py after prompt
@@ -63,6 +81,11 @@ class MonoEngine:
         except Exception as e:
             logging.error(f"Failed to load execution module ({self.mode}): {e}")
 
+        # Rebuild module state from the journal before anything publishes
+        if self.journal is not None:
+            self.journal.recover(self.modules)
+            self.events.journal = self.journal
+
         # Start modules (order matters if dependencies; e.g., state before execution)
         for module_name in ['state', 'execution']:  # Prioritize
             if module_name in self.modules:
@@ -106,6 +129,9 @@ class MonoEngine:
             except Exception as e:
                 logging.error(f"Error stopping module {module.__class__.__name__}: {e}")
         self.streamer.stop()
+        self.events.close()  # stops the lane thread and the workers of queued subscribers
+        if self.journal is not None:
+            self.journal.close()  # final snapshot
         self.session.close()
 
     def run(self):
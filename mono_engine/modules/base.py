@@ -21,4 +21,18 @@ class BaseModule(ABC):
     @abstractmethod
     def stop(self):
         """Called on engine stop — cleanup"""
-        pass
\ No newline at end of file
+        pass
+
+    # Crash recovery (see core/journal.py); modules without state keep the defaults
+
+    def snapshot_state(self):
+        """Picklable copy of the module's state for a journal snapshot, or None."""
+        return None
+
+    def restore_state(self, state):
+        """Restore what snapshot_state() returned; called before start()."""
+        pass
+
+    def replay_event(self, event_type, data):
+        """Apply a journaled event published after the snapshot, without publishing or calling the broker."""
+        pass
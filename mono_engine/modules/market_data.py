@@ -13,7 +13,7 @@ from openapi_client.api import SymbolDetailsApi
 from tabulate import tabulate
 
 from mono_engine.modules.base import BaseModule
-from mono_engine.core.events import EVENT_TICK, EVENT_CONNECT
+from mono_engine.core.events import EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS, EVENT_CONNECT, DELIVERY_CONFLATED
 
 # NEW: For IST time checks
 from pytz import timezone  # Add this import; if not installed, use manual UTC+5:30 offset
@@ -34,6 +34,7 @@ class MarketData(BaseModule):
         self.sensex_spot_token = None
         self.watchlist = []  # List of dicts {'strike': int, 'type': str, 'token': str, 'symbol': str}
         self.token_to_scrip = {}  # NEW: Map token to user-friendly scrip name
+        self.owner = "market_data"  # Our subscriptions in the streamer, apart from other modules'
         # MOD: Load watchlist moved to workflow (after expiry compute)
 
     def _load_watchlist(self):
@@ -51,7 +52,14 @@ class MarketData(BaseModule):
 
     def start(self):
         logging.info("MarketData starting — SENSEX options workflow (as in sensex_day_open_strikes.py)")
-        self.events.subscribe(EVENT_TICK, self._on_tick)
+        # A whole frame of ticks per call; depth and greeks are merged into the same per-symbol quote
+        self.events.subscribe(EVENT_TICK, self._on_ticks, batch=True)
+        self.events.subscribe(EVENT_DEPTH, self._on_ticks, batch=True)
+        self.events.subscribe(EVENT_GREEKS, self._on_ticks, batch=True)
+        # The table re-render is slow; it runs on its own worker with the latest
+        # state per symbol so it never holds up the stream thread (or fills)
+        self.events.subscribe(EVENT_TICK, self._on_watchlist_tick, delivery=DELIVERY_CONFLATED)
+        self.events.subscribe(EVENT_DEPTH, self._on_watchlist_tick, delivery=DELIVERY_CONFLATED)
         self.events.subscribe(EVENT_CONNECT, self._on_connect)
 
         self._sensex_options_workflow()
@@ -59,26 +67,35 @@ class MarketData(BaseModule):
     def stop(self):
         self._save_watchlist()  # Save on stop
         logging.info("MarketData stopping")
-        self.events.unsubscribe(EVENT_TICK, self._on_tick)
+        self.events.unsubscribe(EVENT_TICK, self._on_ticks)
+        self.events.unsubscribe(EVENT_DEPTH, self._on_ticks)
+        self.events.unsubscribe(EVENT_GREEKS, self._on_ticks)
+        self.events.unsubscribe(EVENT_TICK, self._on_watchlist_tick)
+        self.events.unsubscribe(EVENT_DEPTH, self._on_watchlist_tick)
+        self.streamer.unsubscribe(self.owner)
 
     def _on_connect(self, *args):
         logging.info("Streamer connected — subscribing to SENSEX spot for open capture")
 
-    def _on_tick(self, tick):
-        symbol = tick.get('symbol')
-        if symbol:
-            self.quotes[symbol].update(tick)
+    def _on_ticks(self, ticks):
+        quotes = self.quotes
+        spot_symbol = f"{self.sensex_spot_token}_BSE"
+        for tick in ticks:
+            symbol = tick.get('symbol')
+            if not symbol:
+                continue
+            quotes[symbol].update(tick)
             # Capture spot open as soon as a valid tick arrives (safeguard if loop misses it)
-            spot_symbol = f"{self.sensex_spot_token}_BSE"
             if symbol == spot_symbol and self.spot_open is None and 'open' in tick and tick['open'] > 0:
                 self.spot_open = tick['open']
                 with open(cache_file, 'w') as f:
                     f.write(str(self.spot_open))
                 logging.info(f"Captured SENSEX open from tick: {self.spot_open}")
 
-            # NEW: If symbol is in selected_symbols (watchlist), display updated table
-            if symbol in self.selected_symbols:
-                self._display_watchlist_tick_table()
+    def _on_watchlist_tick(self, tick):
+        # NEW: If symbol is in selected_symbols (watchlist), display updated table
+        if tick.get('symbol') in self.selected_symbols:
+            self._display_watchlist_tick_table()
 
     def _display_watchlist_tick_table(self):
         extended_table = []
@@ -153,7 +170,7 @@ class MarketData(BaseModule):
                     break
 
         # Subscribe to SENSEX spot for open price
-        self.streamer.subscribe_l1([f"{self.sensex_spot_token}_BSE"])
+        self.streamer.subscribe_l1([f"{self.sensex_spot_token}_BSE"], owner=self.owner)
         self.streamer.snapshot([f"{self.sensex_spot_token}_BSE"])
 
         # Wait for spot open from streamer (or fallback to cache)
@@ -265,7 +282,7 @@ class MarketData(BaseModule):
                 logging.info(tabulate(watchlist_table, headers=["Strike", "Type", "Token", "Symbol"], tablefmt="plain"))
                 self._save_watchlist()
 
-            self.streamer.subscribe_l1([f"{t}_BFO" for t in selected_tokens] + [f"{self.sensex_spot_token}_BSE"])
+            self.streamer.subscribe_l1([f"{t}_BFO" for t in selected_tokens] + [f"{self.sensex_spot_token}_BSE"], owner=self.owner)
             self.streamer.snapshot(selected_tokens + [self.sensex_spot_token])
 
         # Condition 2: Propose top scrips with high upside potential
@@ -277,8 +294,8 @@ class MarketData(BaseModule):
                 if token:
                     all_tokens.append(token)
         all_symbols = [f"{t}_BFO" for t in all_tokens] + [f"{self.sensex_spot_token}_BSE"]
-        self.streamer.subscribe_l1(all_symbols)
-        self.streamer.subscribe_greeks(all_tokens)  # Greeks for options
+        self.streamer.subscribe_l1(all_symbols, owner=self.owner)
+        self.streamer.subscribe_greeks(all_tokens, owner=self.owner)  # Greeks for options
 
         # Wait for data (up to 20s for more coverage)
         logging.info("Waiting up to 20s for grid market data to analyze proposals...")
@@ -357,11 +374,11 @@ class MarketData(BaseModule):
 
         # Final subscriptions (only selected + spot)
         self.selected_symbols = [f"{t}_BFO" if t != self.sensex_spot_token else f"{t}_BSE" for t in selected_tokens]
-        self.streamer.subscribe_l1(self.selected_symbols)
+        self.streamer.subscribe_l1(self.selected_symbols, owner=self.owner)
         #self.streamer.subscribe_l2(self.selected_symbols)  # Add subscribe_l2 for depth data
         option_tokens = [t for t in selected_tokens if t != self.sensex_spot_token]
         if option_tokens:
-            self.streamer.subscribe_greeks(option_tokens)
+            self.streamer.subscribe_greeks(option_tokens, owner=self.owner)
         logging.info(f"Monitoring {len(self.selected_symbols)} symbols with greeks")
 
         
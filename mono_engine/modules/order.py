@@ -23,6 +23,7 @@ Dependencies:
 """
 
 
+import copy
 import logging
 
 from mono_engine.modules.base import BaseModule
@@ -68,11 +69,25 @@ class Order(BaseModule):
 
     def stop(self):
         """Stop the module: Unsubscribe events and clean up."""
-        self.events.callbacks.pop('buy_signal', None)
-        self.events.callbacks.pop('sell_signal', None)
-        self.events.callbacks.pop('on_order_update', None)
+        self.events.unsubscribe_all(self)
         self.logger.info("OrderModule stopped.")
 
+    def snapshot_state(self):
+        return {'pending_orders': copy.deepcopy(self.pending_orders)}
+
+    def restore_state(self, state):
+        self.pending_orders = state['pending_orders']
+
+    def replay_event(self, event_type, data):
+        """Rebuild pending_orders from journaled placements, cancellations and order updates."""
+        if event_type == 'order_placed':
+            self.pending_orders[data['order_id']] = {'side': data['side'], 'quantity': data['quantity'],
+                                                     'filled': data['filled']}
+        elif event_type == 'order_canceled':
+            self.pending_orders.pop(data.get('order_id'), None)
+        elif event_type == 'on_order_update':
+            self._apply_order_update(data)
+
     def _handle_buy_signal(self, data: Dict):
         """
         Handle buy_signal event from module 6.
@@ -112,7 +127,8 @@ class Order(BaseModule):
         if resp and resp.get('s') == 'ok':
             order_id = resp.get('d', {}).get('order_id')
             self.pending_orders[order_id] = {'side': 'buy', 'quantity': quantity, 'filled': 0}
-            self.events.publish('order_placed', {'order_id': order_id, 'side': 'buy', 'scrip': self.scrip})
+            self.events.publish('order_placed', {'order_id': order_id, 'side': 'buy', 'scrip': self.scrip,
+                                                 'quantity': quantity, 'filled': 0})
 
     def _handle_sell_signal(self, data: Dict):
         """
@@ -145,7 +161,8 @@ class Order(BaseModule):
         if resp and resp.get('s') == 'ok':
             order_id = resp.get('d', {}).get('order_id')
             self.pending_orders[order_id] = {'side': 'sell', 'quantity': quantity, 'filled': 0}
-            self.events.publish('order_placed', {'order_id': order_id, 'side': 'sell', 'scrip': self.scrip})
+            self.events.publish('order_placed', {'order_id': order_id, 'side': 'sell', 'scrip': self.scrip,
+                                                 'quantity': quantity, 'filled': 0})
 
     def _on_order_update(self, data: Dict):
         """
@@ -155,40 +172,59 @@ class Order(BaseModule):
         Assumes streamer.py normalizes Shoonya WS messages into this dict format.
         """
         order_id = data.get('order_id')
-        if order_id not in self.pending_orders:
+        result = self._apply_order_update(data)
+        if result is None:
             self.logger.debug(f"Ignoring update for unknown order: {order_id}")
             return
 
-        status = data.get('status', '').upper()
+        status, order = result
         if status == 'REJECTED':
-            del self.pending_orders[order_id]
             self.events.publish('order_rejected', {**data, 'scrip': self.scrip})
             self.logger.error(f"Order rejected: {order_id} Reason: {data.get('reason', 'Unknown')}")
 
-        elif status in ['FILLED', 'PARTIAL']:
-            filled_qty = data.get('filled_qty', 0)
-            self.pending_orders[order_id]['filled'] += filled_qty
-
-            remaining = self.pending_orders[order_id]['quantity'] - self.pending_orders[order_id]['filled']
-            if remaining <= 0:
-                # Complete fill
-                fill_data = {
-                    'order_type': self.pending_orders[order_id]['side'],
-                    'scrip': self.scrip,
-                    'price': data.get('price'),
-                    'quantity': self.pending_orders[order_id]['filled'] // self.lot_size,  # User-level qty
-                    'fill_time': data.get('fill_time', datetime.now())
-                }
-                self.events.publish('order_filled', fill_data)
-                del self.pending_orders[order_id]
-                self.logger.info(f"Order fully filled: {order_id}")
-            else:
-                # Partial: Log and wait for more updates
-                self.logger.info(f"Partial fill: {order_id} Filled {self.pending_orders[order_id]['filled']} / {self.pending_orders[order_id]['quantity']}")
+        elif status == 'FILLED':
+            fill_data = {
+                'order_type': order['side'],
+                'scrip': self.scrip,
+                'price': data.get('price'),
+                'quantity': order['filled'] // self.lot_size,  # User-level qty
+                'fill_time': data.get('fill_time', datetime.now())
+            }
+            self.events.publish('order_filled', fill_data)
+            self.logger.info(f"Order fully filled: {order_id}")
+
+        elif status == 'PARTIAL':
+            # Partial: Log and wait for more updates
+            self.logger.info(f"Partial fill: {order_id} Filled {order['filled']} / {order['quantity']}")
 
         else:
             self.logger.warning(f"Unknown order status: {status} for {order_id}")
 
+    def _apply_order_update(self, data: Dict):
+        """
+        Apply an order update to pending_orders (shared by _on_order_update and
+        journal replay).  Returns (status, order): status is REJECTED, FILLED
+        once the order is completely filled, PARTIAL while it is not, or the
+        unknown status as received; the order is dropped from pending_orders
+        when rejected or filled.  None for an order that is not pending.
+        """
+        order_id = data.get('order_id')
+        order = self.pending_orders.get(order_id)
+        if order is None:
+            return None
+
+        status = data.get('status', '').upper()
+        if status == 'REJECTED':
+            del self.pending_orders[order_id]
+        elif status in ['FILLED', 'PARTIAL']:
+            order['filled'] += data.get('filled_qty', 0)
+            if order['quantity'] - order['filled'] <= 0:
+                status = 'FILLED'
+                del self.pending_orders[order_id]
+            else:
+                status = 'PARTIAL'
+        return status, order
+
     def modify_order(self, order_id: str, new_price: Optional[float] = None, new_quantity: Optional[int] = None, new_trigger_price: Optional[float] = None):
         """
         Modify an existing order (e.g., for trailing SL).
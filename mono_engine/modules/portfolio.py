@@ -35,13 +35,22 @@ class Portfolio(BaseModule):
         logging.info("Portfolio module starting — subscribing to updates")
         self.events.subscribe(EVENT_CONNECT, self._on_connect)
         self.events.subscribe(EVENT_ORDER_UPDATE, self._on_order_update)
-        self.events.subscribe(EVENT_TRADE, self._on_trade_update)
+        # Trades of one frame arrive together; positions are refreshed once per batch
+        self.events.subscribe(EVENT_TRADE, self._on_trade_updates, batch=True)
 
     def stop(self):
         logging.info("Portfolio module stopping")
         self.events.unsubscribe(EVENT_CONNECT, self._on_connect)
         self.events.unsubscribe(EVENT_ORDER_UPDATE, self._on_order_update)
-        self.events.unsubscribe(EVENT_TRADE, self._on_trade_update)
+        self.events.unsubscribe(EVENT_TRADE, self._on_trade_updates)
+
+    def snapshot_state(self):
+        return {'positions': dict(self.positions), 'funds': dict(self.funds)}
+
+    def restore_state(self, state):
+        # Last known positions/funds until the next on_connect refresh
+        self.positions = state['positions']
+        self.funds = state['funds']
 
     def _on_connect(self, data):
         logging.info("Portfolio: WS connected — fetching initial positions/funds")
@@ -53,8 +62,9 @@ class Portfolio(BaseModule):
         # Parse order status changes (filled, cancelled, etc.) — update positions if needed
         # Tradejini events have order details — extend parsing as needed
 
-    def _on_trade_update(self, data):
-        logging.info(f"TRADE EXECUTED: {data}")
+    def _on_trade_updates(self, trades):
+        for data in trades:
+            logging.info(f"TRADE EXECUTED: {data}")
         # Update positions/P&L on new trades
         self._fetch_positions()  # Simple refresh — or parse event for delta
 
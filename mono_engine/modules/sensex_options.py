@@ -100,7 +100,7 @@ class SensexOptions:
 
         # Subscribe spot for open capture
         spot_symbol = f"{self.spot_token}_BSE"
-        self.engine.streamer.subscribe_l1([spot_symbol])
+        self.engine.streamer.subscribe_l1([spot_symbol], owner=self.name)
         if hasattr(self.engine.streamer, 'subscribeL1SnapShot'):
             self.engine.streamer.subscribeL1SnapShot([spot_symbol])
         logging.info(f"Subscribed L1 + snapshot for spot: {spot_symbol}")
@@ -67,6 +67,7 @@ class StateModule(BaseModule):
         self.logger = logging.getLogger(__name__)  # Centralized logging
         # Configurable params (from config.py, e.g., scrip to monitor)
         self.scrip = self.engine.config.get('scrip', None)  # Assume single scrip for now
+        self.restored = False  # State rebuilt from the event journal; skips the initial REST sync
 
     def start(self):
         """Start the module: Register event subscriptions and perform initial sync."""
@@ -75,6 +76,9 @@ class StateModule(BaseModule):
         self.events.subscribe('on_connect', self._sync_state)  # Sync on WS connect/reconnect
         self.events.subscribe('on_error', self._handle_error)  # Flag stale on errors
 
+        if self.restored:
+            self.logger.info(f"StateModule started with state recovered from the journal: {self.state.get_state()}")
+            return
         # Initial sync on start
         self._sync_state(None)  # Pass dummy data for on_connect event
         self.logger.info("StateModule started and initial sync performed.")
@@ -82,14 +86,24 @@ class StateModule(BaseModule):
     def stop(self):
         """Stop the module: Unsubscribe events and optionally persist state."""
         # Unsubscribe (though events.py might not require it, good practice)
-        self.events.callbacks.pop('order_filled', None)
-        self.events.callbacks.pop('on_connect', None)
-        self.events.callbacks.pop('on_error', None)
+        self.events.unsubscribe_all(self)
         
         # Optional: Persist state to file for restart (future enhancement)
         # self._persist_state()
         self.logger.info("StateModule stopped.")
 
+    def snapshot_state(self):
+        return self.state.get_state()
+
+    def restore_state(self, state):
+        self.state.update(state['in_trade'], state['entry_details'])
+        self.restored = True
+
+    def replay_event(self, event_type, data):
+        # state_updated carries the whole TradeState, so the last one wins
+        if event_type == 'state_updated':
+            self.restore_state(data)
+
     def _sync_state(self, data):
         """
         Sync state with broker via portfolio module.
@@ -5,7 +5,7 @@ from pytz import timezone
 
 # Assuming your engine imports (adapt paths if needed)
 from mono_engine.core.engine import Engine  # Or wherever your main Engine class is
-from mono_engine.core.events import EVENT_TICK, EVENT_CONNECT
+from mono_engine.core.events import EVENT_TICK, EVENT_DEPTH, EVENT_CONNECT
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +39,7 @@ def on_tick(tick):
 engine = Engine()  # Adapt if your Engine needs config/params
 engine.events.subscribe(EVENT_CONNECT, on_connect)
 engine.events.subscribe(EVENT_TICK, on_tick)
+engine.events.subscribe(EVENT_DEPTH, on_tick)  # L5 packets arrive as EVENT_DEPTH
 
 # Start engine/streamer
 engine.start()
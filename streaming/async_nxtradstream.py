@@ -0,0 +1,159 @@
+import json
+from collections import deque, namedtuple
+
+try:
+    import websockets
+except ImportError:  # optional; only needed by AsyncNxtradStream.connect
+    websockets = None
+
+from streaming.nxtradstream import NxtradStream, L1
+
+# One batch_cb delivery in batch mode: msgType and a BATCH_DTYPES array
+StreamBatch = namedtuple("StreamBatch", ["msgType", "rows"])
+
+
+class AsyncNxtradStream:
+    """
+    asyncio client for the Nxtrad binary stream.
+
+    Frames are decoded with the same code as NxtradStream (compiled decode,
+    L1 state table, raw and batch modes) in the event loop itself, without
+    any thread.  Iterate the client to receive decoded packets as dicts and,
+    with batch=True, StreamBatch tuples:
+
+        stream = AsyncNxtradStream("api.tradejini.com")
+        await stream.connect(auth_token)
+        await stream.subscribeL1(["845112_BFO"])
+        async for packet in stream:
+            ...
+
+    Iteration ends when the connection closes; close_code and close_reason
+    then hold the server's reason (4001 is an unauthorized token).  url is
+    a host name as for NxtradStream, or a ws:// or wss:// base URL.
+    """
+
+    def __init__(self, url, version='3.1', compiled_decode=True, batch=False, raw=False,
+                 max_tokens=None):
+        base = url if "://" in url else "wss://" + url
+        self.host = base + "/v2.1/stream"
+        self.version = version
+        self.ws = None
+        self.isConnected = False
+        self.close_code = None
+        self.close_reason = None
+
+        self._ready = deque()
+        self._codec = NxtradStream(url, version, stream_cb=self.__on_packet,
+                                   batch_cb=self.__on_batch if batch else None,
+                                   compiled_decode=compiled_decode, raw=raw, max_tokens=max_tokens)
+
+    @property
+    def l1_state(self):
+        return self._codec.l1_state
+
+    async def connect(self, token):
+        if websockets is None:
+            raise RuntimeError("AsyncNxtradStream needs the 'websockets' package (pip3 install websockets)")
+        url = self.host + "?token=" + token + "&version=" + self.version
+        self.ws = await websockets.connect(url, max_size=None)
+        self.isConnected = True
+        self.close_code = None
+        self.close_reason = None
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        self.isConnected = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        ready = self._ready
+        while not ready:
+            if self.ws is None:
+                raise StopAsyncIteration
+            try:
+                message = await self.ws.recv()
+            except websockets.ConnectionClosed as e:
+                self.isConnected = False
+                rcvd = e.rcvd
+                self.close_code = rcvd.code if rcvd else None
+                self.close_reason = rcvd.reason if rcvd else None
+                raise StopAsyncIteration
+            if isinstance(message, bytes):
+                self._codec.process_frame(message)
+        return ready.popleft()
+
+    def __on_packet(self, _stream, jData):
+        self._ready.append(jData)
+
+    def __on_batch(self, _stream, msgType, rows):
+        self._ready.append(StreamBatch(msgType, rows))
+
+    async def __send_data(self, req):
+        if not self.isConnected:
+            return False
+        await self.ws.send(json.dumps(req) + "\n")
+        return True
+
+    async def __subscribe(self, type, tokens, **extra):
+        req = {"type": type, "action": "sub", "tokens": [{"t": i} for i in tokens]}
+        req.update(extra)
+        return await self.__send_data(req)
+
+    async def __unsubscribe(self, type, **extra):
+        req = {"type": type, "action": "unsub"}
+        req.update(extra)
+        return await self.__send_data(req)
+
+    async def subscribeEvents(self, type):
+        return await self.__send_data({"type": "event", "action": "sub", "events": type})
+
+    async def sendPing(self):
+        return await self.__send_data({"type": "PING"})
+
+    async def subscribeL1(self, tokens):
+        return await self.__subscribe("L1", tokens)
+
+    async def subscribeL1SnapShot(self, tokens):
+        return await self.__subscribe("L1S", tokens)
+
+    async def subscribeL2(self, tokens):
+        return await self.__subscribe("L5", tokens)
+
+    async def subscribeL2SnapShot(self, tokens):
+        return await self.__subscribe("L5S", tokens)
+
+    async def subscribeGreeks(self, tokens):
+        return await self.__subscribe("greeks", tokens)
+
+    async def subscribeGreeksSnapShot(self, tokens):
+        return await self.__subscribe("greeks-snapshot", tokens)
+
+    async def subscribeOHLC(self, tokens, interval):
+        return await self.__subscribe("OHLC", tokens, chartInterval=interval)
+
+    async def unsubscribeEvents(self):
+        return await self.__unsubscribe("event")
+
+    async def unsubscribeL1(self):
+        self._codec.L1_dict.clear()
+        if self._codec.l1_state is not None:
+            self._codec.l1_state.clear()
+        return await self.__unsubscribe(L1)
+
+    async def unsubscribeL2(self):
+        return await self.__unsubscribe("L5")
+
+    async def unsubscribeGreeks(self):
+        return await self.__unsubscribe("greeks")
+
+    async def unsubscribeOHLC(self, interval):
+        return await self.__unsubscribe("OHLC", chartInterval=interval)
@@ -0,0 +1,100 @@
+"""
+Encoder for the Nxtrad binary stream, the inverse of NxtradStream's decoder.
+
+Values are given in wire units, exactly as the decoder reads them before
+formatting: integer prices in 1/divisor of a rupee, chngPer in 1/100 of a
+percent, ltt/time as epoch seconds and exchSeg as the SEG_INFO id.
+
+    frame = encode_frame([encode_fields(10, exchSeg=4, token=845112, ltp=24550),
+                          encode_depth(4, 845112, bids=[(24500, 300, 4)], asks=[(24600, 120, 2)])])
+"""
+
+import struct
+import zlib
+
+from streaming.nxtradstream import CURRENT_VERSION, DEFAULT_PKT_INFO, FRAME_HEADER, PKT_HEADER, SEG_INFO
+
+PKT_SPEC = DEFAULT_PKT_INFO["PKT_SPEC"]
+
+# SEG_INFO exchange name -> id, e.g. "BFO" -> 4
+SEG_IDS = {info["exchSeg"]: seg for seg, info in SEG_INFO.items()}
+
+# key name -> first key id per packet type, for encode_fields
+_KEY_IDS = {}
+for _pkt_type, _spec in PKT_SPEC.items():
+    for _key, _field in _spec.items():
+        _KEY_IDS.setdefault(_pkt_type, {}).setdefault(_field["key"], _key)
+
+_STRUCTS = {}
+
+
+def _pack(spec, value):
+    if spec["struct"] == "string":
+        return value.encode("utf_8")[:spec["len"]].ljust(spec["len"], b"\x00")
+    packer = _STRUCTS.get(spec["struct"])
+    if packer is None:
+        packer = _STRUCTS[spec["struct"]] = struct.Struct("<" + spec["struct"].lstrip("<"))
+    return packer.pack(value)
+
+
+def encode_packet(pkt_type, fields, pkt_spec=None):
+    """One packet from (key id, value) pairs, in order, following PKT_SPEC."""
+    spec = (pkt_spec or PKT_SPEC)[pkt_type]
+    body = b"".join(bytes((key,)) + _pack(spec[key], value) for key, value in fields)
+    return PKT_HEADER.pack(PKT_HEADER.size + len(body), pkt_type) + body
+
+
+def encode_fields(pkt_type, **values):
+    """One packet from field names, e.g. encode_fields(10, exchSeg=4, token=22, ltp=24550)."""
+    ids = _KEY_IDS[pkt_type]
+    return encode_packet(pkt_type, [(ids[name], value) for name, value in values.items()])
+
+
+def encode_frame(packets, compress=True, version=CURRENT_VERSION):
+    """A websocket payload: the 6 byte header and the packets, zlib compressed by default."""
+    payload = b"".join(packets)
+    if compress:
+        payload = zlib.compress(payload)
+    return FRAME_HEADER.pack(FRAME_HEADER.size + len(payload), version, 100 if compress else 0) + payload
+
+
+def encode_depth(exch_seg, token, bids, asks, precision=None, tot_buy_qty=None, tot_sell_qty=None):
+    """L5 packet; bids and asks are lists of (price, qty, no) from the best level down."""
+    if len(bids) != len(asks):
+        raise ValueError("bids and asks need the same number of levels")
+    fields = [(26, exch_seg), (27, token)]
+    if precision is not None:
+        fields.append((28, precision))
+    if tot_buy_qty is not None:
+        fields.append((47, tot_buy_qty))
+    if tot_sell_qty is not None:
+        fields.append((48, tot_sell_qty))
+    fields.append((55, len(bids)))
+    for price, qty, no in bids:
+        fields += [(49, price), (50, qty), (51, no)]
+    for price, qty, no in asks:
+        fields += [(52, price), (53, qty), (54, no)]
+    return encode_packet(11, fields)
+
+
+def encode_market_status(statuses):
+    """marketStatus packet from (exchSeg id, status) pairs."""
+    fields = [(56, len(statuses))]
+    for exch_seg, status in statuses:
+        fields += [(26, exch_seg), (57, status)]
+    return encode_packet(14, fields)
+
+
+def encode_event(message):
+    """EVENTS packet carrying a message string (usually JSON)."""
+    raw = message.encode("utf_8")
+    body = bytes((56,)) + struct.pack("<H", len(raw)) + bytes((61,)) + raw
+    return PKT_HEADER.pack(PKT_HEADER.size + len(body), 15) + body
+
+
+def encode_auth(status=1):
+    return encode_packet(13, [(25, status)])
+
+
+def encode_pong(pong=1):
+    return encode_packet(16, [(62, pong)])
@@ -0,0 +1,243 @@
+"""
+Local stand-in for the Nxtrad stream server, for load tests without the broker.
+
+Serves the binary protocol over plain ws:// with synthetic random-walk
+prices for whatever tokens the client subscribes to (and optionally a set
+of pre-subscribed tokens), at a configurable number of L1 ticks per second:
+
+    python -m streaming.feed_server --port 8765 --rate 20000 --tokens 500
+
+    stream = NxtradStream("ws://127.0.0.1:8765", stream_cb=...)
+    stream.connect("any:token")
+
+Subscriptions follow the SDK README: a "sub" replaces the set of its type,
+"unsub" without tokens drops it.  Snapshot requests (L1S, L5S,
+greeks-snapshot) are answered with full packets, PING with a pong, and an
+empty auth token is rejected with close code 4001.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Add project root to path
+
+from streaming.encoder import (SEG_IDS, encode_depth, encode_frame, encode_market_status, encode_packet,
+                               encode_pong)
+
+
+class Instrument:
+    """Random-walk state of one symbol, in wire units."""
+
+    __slots__ = ("seg", "token", "ltp", "open", "high", "low", "close", "vol", "oi", "iv", "tick")
+
+    def __init__(self, seg, token, rnd, tick=5):
+        self.seg = seg
+        self.token = token
+        self.tick = tick
+        self.close = rnd.randrange(1000, 500000, tick)
+        self.ltp = self.open = self.high = self.low = self.close
+        self.vol = 0
+        self.oi = rnd.randrange(0, 1000000)
+        self.iv = rnd.uniform(10.0, 30.0)
+
+    def step(self, rnd, volatility):
+        move = int(rnd.gauss(0.0, volatility * self.ltp) / self.tick) * self.tick
+        self.ltp = max(self.tick, self.ltp + move)
+        self.high = max(self.high, self.ltp)
+        self.low = min(self.low, self.ltp)
+        self.vol += rnd.randrange(1, 500)
+        self.iv = max(1.0, self.iv + rnd.gauss(0.0, 0.05))
+
+    def l1(self, now, full=False):
+        fields = [(26, self.seg), (27, self.token)]
+        if full:
+            fields += [(28, 2), (30, self.open), (31, self.high), (32, self.low), (33, self.close)]
+        chng = self.ltp - self.close
+        fields += [(29, self.ltp), (34, chng), (35, chng * 10000 // self.close), (39, 1), (40, self.vol),
+                   (44, self.oi), (46, now), (49, self.ltp - self.tick), (50, 100),
+                   (52, self.ltp + self.tick), (53, 100)]
+        return encode_packet(10, fields)
+
+    def depth(self, levels=5):
+        bids = [(max(self.tick, self.ltp - (i + 1) * self.tick), 100 * (i + 1), i + 1) for i in range(levels)]
+        asks = [(self.ltp + (i + 1) * self.tick, 100 * (i + 1), i + 1) for i in range(levels)]
+        return encode_depth(self.seg, self.token, bids, asks, precision=2,
+                            tot_buy_qty=sum(q for _, q, _ in bids), tot_sell_qty=sum(q for _, q, _ in asks))
+
+    def greeks(self):
+        return encode_packet(17, [(26, self.seg), (27, self.token), (64, self.iv), (65, 0.5), (66, 0.001),
+                                  (67, -10.0), (69, 5.0)])
+
+
+class SyntheticFeed:
+    """Instruments shared by every connection of a FeedServer."""
+
+    def __init__(self, seed=None, volatility=0.0005):
+        self.rnd = random.Random(seed)
+        self.volatility = volatility
+        self.instruments = {}
+
+    def get(self, symbol):
+        inst = self.instruments.get(symbol)
+        if inst is None:
+            token, _, exch = symbol.partition("_")
+            inst = self.instruments[symbol] = Instrument(SEG_IDS.get(exch, 1), int(token), self.rnd)
+        return inst
+
+
+class FeedServer:
+    """
+    Synthetic Nxtrad feed on ws://host:port.
+
+    rate is L1 ticks per second per connection, sent in frames every
+    frame_interval seconds; tokens pre-subscribes that many synthetic BFO
+    symbols to L1 so a client can load-test without subscribing.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, rate=1000, tokens=0, frame_interval=0.01,
+                 compress=True, seed=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.frame_interval = frame_interval
+        self.compress = compress
+        self.feed = SyntheticFeed(seed)
+        self.auto_symbols = ["%d_BFO" % (800000 + i) for i in range(tokens)]
+        self.clients = 0
+        self.frames_sent = 0
+        self.packets_sent = 0
+        self._loop = None
+        self._stop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return "ws://%s:%d" % (self.host, self.port)
+
+    async def serve_forever(self):
+        self._stop = asyncio.get_running_loop().create_future()
+        async with serve(self.__handler, self.host, self.port, max_size=None, close_timeout=1) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop
+
+    def start(self):
+        """Run the server on a background thread; returns once it is listening."""
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve_forever())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="feed-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set_result, None)
+            self._thread.join(5)
+
+    async def __handler(self, ws):
+        query = parse_qs(urlsplit(ws.request.path).query)
+        if not query.get("token", [""])[0]:
+            await ws.close(4001, "Unauthorized Access")
+            return
+        subs = {"L1": set(self.auto_symbols), "L5": set(), "greeks": set()}
+        self.clients += 1
+        writer = asyncio.create_task(self.__stream(ws, subs))
+        try:
+            await self.__send(ws, [encode_market_status([(seg, 1) for seg in range(1, 9)])])
+            async for message in ws:
+                await self.__request(ws, subs, json.loads(message))
+        except ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            self.clients -= 1
+
+    async def __request(self, ws, subs, req):
+        kind, action = req.get("type"), req.get("action")
+        symbols = [t["t"] for t in req.get("tokens", [])]
+        if kind in subs:
+            if action == "sub":
+                subs[kind] = set(symbols)
+            elif symbols:
+                subs[kind].difference_update(symbols)
+            else:
+                subs[kind] = set()
+        elif kind in ("L1S", "L5S", "greeks-snapshot"):
+            now = int(time.time())
+            build = {"L1S": lambda i: i.l1(now, full=True), "L5S": lambda i: i.depth(),
+                     "greeks-snapshot": lambda i: i.greeks()}[kind]
+            await self.__send(ws, [build(self.feed.get(s)) for s in symbols])
+        elif kind == "PING":
+            await self.__send(ws, [encode_pong()])
+
+    async def __stream(self, ws, subs):
+        rnd = self.feed.rnd
+        volatility = self.feed.volatility
+        budget = 0.0
+        next_at = time.monotonic()
+        while True:
+            next_at += self.frame_interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_at = time.monotonic()  # running behind; don't try to catch up in a burst
+            l1 = list(subs["L1"])
+            if not l1:
+                continue
+            budget += self.rate * self.frame_interval
+            n, budget = int(budget), budget - int(budget)
+            now = int(time.time())
+            packets = []
+            for symbol in rnd.choices(l1, k=n) if n else ():
+                inst = self.feed.get(symbol)
+                inst.step(rnd, volatility)
+                packets.append(inst.l1(now))
+                if symbol in subs["L5"]:
+                    packets.append(inst.depth())
+                if symbol in subs["greeks"] and rnd.random() < 0.1:
+                    packets.append(inst.greeks())
+            if packets:
+                await self.__send(ws, packets)
+
+    async def __send(self, ws, packets):
+        await ws.send(encode_frame(packets, compress=self.compress))
+        self.frames_sent += 1
+        self.packets_sent += len(packets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1000, help="L1 ticks per second per connection")
+    parser.add_argument("--tokens", type=int, default=0, help="pre-subscribed synthetic symbols")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between frames")
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args()
+
+    server = FeedServer(args.host, args.port, args.rate, args.tokens, args.interval, not args.no_compress)
+    print(f"Serving synthetic feed on {server.url} at {args.rate:,.0f} ticks/sec")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class RollingHistogram:
+    """
+    Log-linear histogram of the values recorded in the last `window` seconds.
+
+    Values are non-negative integers (nanoseconds here) counted in buckets
+    that are exact below 2**(sub_bits+1) and 1/2**sub_bits wide relative to the
+    value above, so percentiles are within ~6% for the default sub_bits=4.
+    The window is kept as `slots` sub-histograms; the oldest one is dropped
+    as time moves on.  record() and snapshot() are thread safe.
+    """
+
+    def __init__(self, window=60.0, slots=6, sub_bits=4, clock=time.monotonic):
+        self.window = window
+        self.slot_width = window / slots
+        self.sub_bits = sub_bits
+        self.clock = clock
+        self._slots = [self.__empty() for _ in range(slots)]
+        self._current = 0
+        self._slot_end = clock() + self.slot_width
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def __empty():
+        # [bucket counts, count, sum, min, max]
+        return [{}, 0, 0, None, 0]
+
+    def _bucket(self, value):
+        shift = value.bit_length() - self.sub_bits - 1
+        if shift <= 0:
+            return value
+        return (shift << self.sub_bits) + (value >> shift)
+
+    def _bucket_value(self, index):
+        """Midpoint of a bucket."""
+        if index < 2 << self.sub_bits:
+            return index
+        shift = (index >> self.sub_bits) - 1
+        low = (index - (shift << self.sub_bits)) << shift
+        return low + (1 << shift) // 2
+
+    def __rotate(self, now):
+        if now - self._slot_end >= self.window:  # idle for a whole window
+            self._slots = [self.__empty() for _ in self._slots]
+            self._slot_end = now + self.slot_width
+            return
+        while now >= self._slot_end:
+            self._current = (self._current + 1) % len(self._slots)
+            self._slots[self._current] = self.__empty()
+            self._slot_end += self.slot_width
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self._bucket(value)
+        with self._lock:
+            self.__rotate(self.clock())
+            slot = self._slots[self._current]
+            counts = slot[0]
+            counts[index] = counts.get(index, 0) + 1
+            slot[1] += 1
+            slot[2] += value
+            if slot[3] is None or value < slot[3]:
+                slot[3] = value
+            if value > slot[4]:
+                slot[4] = value
+
+    def snapshot(self, percentiles=_PERCENTILES):
+        """count, mean, min, max and the given percentiles over the window."""
+        with self._lock:
+            self.__rotate(self.clock())
+            counts = {}
+            count = total = high = 0
+            low = None
+            for slot in self._slots:
+                for index, n in slot[0].items():
+                    counts[index] = counts.get(index, 0) + n
+                count += slot[1]
+                total += slot[2]
+                if slot[3] is not None and (low is None or slot[3] < low):
+                    low = slot[3]
+                high = max(high, slot[4])
+
+        stats = {"count": count, "mean": total / count if count else None, "min": low,
+                 "max": high if count else None}
+        ordered = sorted(counts.items())
+        for p in percentiles:
+            stats["p%g" % p] = self.__percentile(ordered, count, p, low, high)
+        return stats
+
+    def __percentile(self, ordered, count, p, low, high):
+        if not count:
+            return None
+        rank = p / 100.0 * count
+        seen = 0
+        for index, n in ordered:
+            seen += n
+            if seen >= rank:
+                return min(max(self._bucket_value(index), low), high)
+        return high
+
+
+def _fmt_ns(value):
+    if value is None:
+        return "-"
+    if value < 1e3:
+        return "%dns" % value
+    if value < 1e6:
+        return "%.1fus" % (value / 1e3)
+    if value < 1e9:
+        return "%.1fms" % (value / 1e6)
+    return "%.2fs" % (value / 1e9)
+
+
+class LatencyMonitor:
+    """
+    Latency histograms of one or more NxtradStreams, all in nanoseconds:
+
+    frame     receive of a websocket frame to the end of its dispatch
+    queue     receive to decode start (pipeline mode only)
+    decode    per packet, start of decode to the stream callback
+    dispatch  per packet, time spent in the stream callback
+    lag       per segment, local wall clock minus the tick's ltt (the feed
+              sends whole seconds, so this is accurate to about 1 s)
+    rtt       PING request to pong
+
+    Pass the monitor to NxtradStream(latency=...).  start() runs a thread
+    that sends a PING on every attached, connected stream each ping_interval
+    seconds and logs summary() each log_interval seconds (either may be
+    None to disable it).
+    """
+
+    def __init__(self, window=60.0, ping_interval=5.0, log_interval=60.0, clock=time.monotonic):
+        self.window = window
+        self.ping_interval = ping_interval
+        self.log_interval = log_interval
+        self.clock = clock
+        self.frame = RollingHistogram(window, clock=clock)
+        self.queue = RollingHistogram(window, clock=clock)
+        self.decode = RollingHistogram(window, clock=clock)
+        self.dispatch = RollingHistogram(window, clock=clock)
+        self.rtt = RollingHistogram(window, clock=clock)
+        self.lag = {}
+        self.frames = 0
+        self.packets = 0
+        self.pings = 0
+        self.pongs = 0
+        self._streams = []
+        self._ping_sent = {}
+        self._ltt_cache = {}
+        self._lock = threading.Lock()
+        # The counters are bumped by every stream's receive or decode threads
+        self._count_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def attach(self, stream):
+        with self._lock:
+            if stream not in self._streams:
+                self._streams.append(stream)
+
+    def detach(self, stream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+            self._ping_sent.pop(id(stream), None)
+
+    # Recording, called by NxtradStream
+
+    def frame_done(self, received_ns, decode_start_ns=None):
+        with self._count_lock:
+            self.frames += 1
+        now = time.perf_counter_ns()
+        self.frame.record(now - received_ns)
+        if decode_start_ns is not None:
+            self.queue.record(decode_start_ns - received_ns)
+
+    def packet(self, data, decode_ns, dispatch_ns=None):
+        """A decoded packet; data and dispatch_ns are None while its dispatch is deferred."""
+        with self._count_lock:
+            self.packets += 1
+        self.decode.record(decode_ns)
+        if dispatch_ns is not None:
+            self.dispatched(data, dispatch_ns)
+
+    def dispatched(self, data, dispatch_ns):
+        self.dispatch.record(dispatch_ns)
+        ltt = data.get("ltt")
+        seg = data.get("exchSeg")
+        if ltt is None or seg is None:
+            return
+        ts = self.__ltt_seconds(ltt)
+        if ts is not None:
+            hist = self.lag.get(seg)
+            if hist is None:
+                hist = self.lag.setdefault(seg, RollingHistogram(self.window, clock=self.clock))
+            hist.record((time.time() - ts) * 1e9)
+
+    def __ltt_seconds(self, ltt):
+        if isinstance(ltt, (int, float)):
+            return ltt
+        ts = self._ltt_cache.get(ltt)
+        if ts is None:
+            try:
+                ts = datetime.fromisoformat(ltt).timestamp()
+            except (TypeError, ValueError):
+                return None
+            if len(self._ltt_cache) > 4096:
+                self._ltt_cache.clear()
+            self._ltt_cache[ltt] = ts
+        return ts
+
+    def ping_sent(self, stream):
+        with self._count_lock:
+            self.pings += 1
+        self._ping_sent[id(stream)] = time.perf_counter_ns()
+
+    def pong_received(self, stream):
+        sent = self._ping_sent.pop(id(stream), None)
+        if sent is not None:
+            with self._count_lock:
+                self.pongs += 1
+            self.rtt.record(time.perf_counter_ns() - sent)
+
+    # Reporting
+
+    def snapshot(self):
+        """Counters and percentile stats of every histogram, in nanoseconds."""
+        with self._count_lock:
+            frames, packets, pings, pongs = self.frames, self.packets, self.pings, self.pongs
+        return {
+            "frames": frames,
+            "packets": packets,
+            "pings": pings,
+            "pongs": pongs,
+            "frame": self.frame.snapshot(),
+            "queue": self.queue.snapshot(),
+            "decode": self.decode.snapshot(),
+            "dispatch": self.dispatch.snapshot(),
+            "rtt": self.rtt.snapshot(),
+            "lag": {seg: hist.snapshot() for seg, hist in sorted(self.lag.items())},
+        }
+
+    def summary(self):
+        snap = self.snapshot()
+        lines = ["latency over the last %gs: %d frames, %d packets" % (self.window, snap["frames"],
+                                                                     snap["packets"])]
+        rows = [(name, snap[name]) for name in ("frame", "queue", "decode", "dispatch", "rtt")]
+        rows += [("lag " + seg, stats) for seg, stats in snap["lag"].items()]
+        for name, stats in rows:
+            if stats["count"]:
+                lines.append("  %-10s n=%-8d p50=%-8s p90=%-8s p99=%-8s p99.9=%-8s max=%s" % (
+                    name, stats["count"], _fmt_ns(stats["p50"]), _fmt_ns(stats["p90"]),
+                    _fmt_ns(stats["p99"]), _fmt_ns(stats["p99.9"]), _fmt_ns(stats["max"])))
+        return "\n".join(lines)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__run, name="nxtrad-latency", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(5)
+        self._thread = None
+
+    def __run(self):
+        now = time.monotonic()
+        next_ping = now + self.ping_interval if self.ping_interval else None
+        next_log = now + self.log_interval if self.log_interval else None
+        while True:
+            due = [t for t in (next_ping, next_log) if t is not None]
+            if not due:
+                return
+            if self._stop.wait(max(min(due) - time.monotonic(), 0)):
+                return
+            now = time.monotonic()
+            if next_ping is not None and now >= next_ping:
+                next_ping = now + self.ping_interval
+                with self._lock:
+                    streams = list(self._streams)
+                for stream in streams:
+                    if stream.isConnected:
+                        stream.sendPing()
+            if next_log is not None and now >= next_log:
+                next_log = now + self.log_interval
+                logging.info(self.summary())
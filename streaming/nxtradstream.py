@@ -1,3 +1,4 @@
+import numpy as np
 import websocket
 import threading
 import time
@@ -9,7 +10,12 @@ import json
 import re
 import os
 import sys
+from collections import deque
+from collections.abc import Mapping
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
 
 CURRENT_VERSION = 1
 PKG_VERSION = '1.0.2'
@@ -25,6 +31,10 @@ def divide(value, divisor=100.0):
     return value / float(divisor)
 
 
+def percent(value, divisor=None):
+    return divide(value)
+
+
 def datefmt(value):
     if value is None:
         return value
@@ -71,28 +81,28 @@ DEFAULT_PKT_INFO = {
             26: {"struct": "B", "key": "exchSeg", "len": 1},
             27: {"struct": "i", "key": "token", "len": 4},
             28: {"struct": "B", "key": "precision", "len": 1},
-            29: {"struct": "i", "key": "ltp", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            30: {"struct": "i", "key": "open", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            31: {"struct": "i", "key": "high", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            32: {"struct": "i", "key": "low", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            33: {"struct": "i", "key": "close", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            34: {"struct": "i", "key": "chng", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            35: {"struct": "i", "key": "chngPer", "len": 4, "fmt": lambda v, d: divide(v)},
-            36: {"struct": "i", "key": "atp", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            37: {"struct": "i", "key": "yHigh", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            38: {"struct": "i", "key": "yLow", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            29: {"struct": "i", "key": "ltp", "len": 4, "fmt": divide},
+            30: {"struct": "i", "key": "open", "len": 4, "fmt": divide},
+            31: {"struct": "i", "key": "high", "len": 4, "fmt": divide},
+            32: {"struct": "i", "key": "low", "len": 4, "fmt": divide},
+            33: {"struct": "i", "key": "close", "len": 4, "fmt": divide},
+            34: {"struct": "i", "key": "chng", "len": 4, "fmt": divide},
+            35: {"struct": "i", "key": "chngPer", "len": 4, "fmt": percent},
+            36: {"struct": "i", "key": "atp", "len": 4, "fmt": divide},
+            37: {"struct": "i", "key": "yHigh", "len": 4, "fmt": divide},
+            38: {"struct": "i", "key": "yLow", "len": 4, "fmt": divide},
             39: {"struct": "<I", "key": "ltq", "len": 4},
             40: {"struct": "<I", "key": "vol", "len": 4},
             41: {"struct": "d", "key": "ttv", "len": 8},
-            42: {"struct": "i", "key": "ucl", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            43: {"struct": "i", "key": "lcl", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            42: {"struct": "i", "key": "ucl", "len": 4, "fmt": divide},
+            43: {"struct": "i", "key": "lcl", "len": 4, "fmt": divide},
             44: {"struct": "<I", "key": "OI", "len": 4},
-            45: {"struct": "i", "key": "OIChngPer", "len": 4, "fmt": lambda v, d: divide(v)},
-            46: {"struct": "i", "key": "ltt", "len": 4, "fmt": lambda v: datefmt(v)},
-            49: {"struct": "i", "key": "bidPrice", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            45: {"struct": "i", "key": "OIChngPer", "len": 4, "fmt": percent},
+            46: {"struct": "i", "key": "ltt", "len": 4, "fmt": datefmt},
+            49: {"struct": "i", "key": "bidPrice", "len": 4, "fmt": divide},
             50: {"struct": "<I", "key": "qty", "len": 4},
             51: {"struct": "<I", "key": "no", "len": 4},
-            52: {"struct": "i", "key": "askPrice", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            52: {"struct": "i", "key": "askPrice", "len": 4, "fmt": divide},
             53: {"struct": "<I", "key": "qty", "len": 4},
             54: {"struct": "<I", "key": "no", "len": 4},
             55: {"struct": "B", "key": "nDepth", "len": 1},
@@ -100,9 +110,9 @@ DEFAULT_PKT_INFO = {
             58: {"struct": "<I", "key": "prevOI", "len": 4},
             59: {"struct": "<I", "key": "dayHighOI", "len": 4},
             60: {"struct": "<I", "key": "dayLowOI", "len": 4},
-            70: {"struct": "i", "key": "spotPrice", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            71: {"struct": "i", "key": "dayClose", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            74: {"struct": "i", "key": "vwap", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            70: {"struct": "i", "key": "spotPrice", "len": 4, "fmt": divide},
+            71: {"struct": "i", "key": "dayClose", "len": 4, "fmt": divide},
+            74: {"struct": "i", "key": "vwap", "len": 4, "fmt": divide},
         },
         11: {
             26: {"struct": "B", "key": "exchSeg", "len": 1},
@@ -110,10 +120,10 @@ DEFAULT_PKT_INFO = {
             28: {"struct": "B", "key": "precision", "len": 1},
             47: {"struct": "<I", "key": "totBuyQty", "len": 4},
             48: {"struct": "<I", "key": "totSellQty", "len": 4},
-            49: {"struct": "i", "key": "price", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            49: {"struct": "i", "key": "price", "len": 4, "fmt": divide},
             50: {"struct": "<I", "key": "qty", "len": 4},
             51: {"struct": "<I", "key": "no", "len": 4},
-            52: {"struct": "i", "key": "price", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            52: {"struct": "i", "key": "price", "len": 4, "fmt": divide},
             53: {"struct": "<I", "key": "qty", "len": 4},
             54: {"struct": "<I", "key": "no", "len": 4},
             55: {"struct": "B", "key": "nDepth", "len": 1},
@@ -122,13 +132,13 @@ DEFAULT_PKT_INFO = {
             26: {"struct": "B", "key": "exchSeg", "len": 1},
             27: {"struct": "i", "key": "token", "len": 4},
             28: {"struct": "B", "key": "precision", "len": 1},
-            30: {"struct": "i", "key": "open", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            31: {"struct": "i", "key": "high", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            32: {"struct": "i", "key": "low", "len": 4, "fmt": lambda v, d: divide(v, d)},
-            33: {"struct": "i", "key": "close", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            30: {"struct": "i", "key": "open", "len": 4, "fmt": divide},
+            31: {"struct": "i", "key": "high", "len": 4, "fmt": divide},
+            32: {"struct": "i", "key": "low", "len": 4, "fmt": divide},
+            33: {"struct": "i", "key": "close", "len": 4, "fmt": divide},
             40: {"struct": "<I", "key": "vol", "len": 4},
-            46: {"struct": "i", "key": "time", "len": 4, "fmt": lambda v: datefmt(v)},
-            74: {"struct": "i", "key": "vwap", "len": 4, "fmt": lambda v, d: divide(v, d)},
+            46: {"struct": "i", "key": "time", "len": 4, "fmt": datefmt},
+            74: {"struct": "i", "key": "vwap", "len": 4, "fmt": divide},
             75: {"struct": "string", "key": "type", "len": 4},
             76: {"struct": "<I", "key": "minuteOi", "len": 4},
         },
@@ -166,21 +176,1337 @@ DEFAULT_PKT_INFO = {
     "MARKET_STATUS_OBJ_LEN": 2
 }
 
+# Keys formatted by divide/percent/datefmt in PKT_SPEC, for raw mode helpers
+PRICE_KEYS = frozenset(s["key"] for spec in DEFAULT_PKT_INFO["PKT_SPEC"].values()
+                       for s in spec.values() if s.get("fmt") is divide)
+PERCENT_KEYS = frozenset(s["key"] for spec in DEFAULT_PKT_INFO["PKT_SPEC"].values()
+                         for s in spec.values() if s.get("fmt") is percent)
+TIME_KEYS = frozenset(s["key"] for spec in DEFAULT_PKT_INFO["PKT_SPEC"].values()
+                      for s in spec.values() if s.get("fmt") is datefmt)
+
+
+def tick_price(tick, key):
+    """Price field of a raw-mode tick in rupees (formatted ticks pass through)."""
+    value = tick[key]
+    divisor = tick.get("divisor")
+    if divisor is None or value is None:
+        return value
+    return value / divisor
+
+
+def tick_time(tick, key="ltt"):
+    """Timestamp field of a raw-mode tick as a datetime."""
+    value = tick.get(key)
+    if value is None or isinstance(value, str):
+        return value
+    return datetime.fromtimestamp(value)
+
+
+def format_tick(tick):
+    """Copy of a raw-mode tick formatted as the default mode would deliver it."""
+    divisor = tick.get("divisor")
+    if divisor is None:
+        return dict(tick)
+
+    def fmt(key, value):
+        if key in PRICE_KEYS:
+            return value / divisor
+        if key in PERCENT_KEYS:
+            return percent(value)
+        if key in TIME_KEYS:
+            return datefmt(value)
+        return value
+
+    jData = {k: fmt(k, v) for k, v in tick.items() if k != "divisor"}
+    for side in ("bid", "ask"):
+        if side in jData:
+            jData[side] = [{k: fmt(k, v) for k, v in level.items()} for level in jData[side]]
+    return jData
+
+
+# 4 byte payload length, 1 byte version, 1 byte compression flag
+FRAME_HEADER = struct.Struct("<ibb")
+# 2 byte packet length followed by the 1 byte packet type
+PKT_HEADER = struct.Struct("<hb")
+
+# Packet types decoded into one flat dict per packet (L1, OHLC, greeks) and
+# packet types carrying bid/ask levels (L5).  These are the hot packets and
+# are handled by the compiled PacketDecoder below.
+FLAT_PKT_TYPES = (10, 12, 17)
+DEPTH_PKT_TYPES = (11,)
+
+# Columns of the structured arrays delivered to batch_cb, as (column, spec key).
+# Every batch also carries token, exchSeg (the SEG_INFO id) and a "present"
+# bitmask with bit n set when the n-th column below was in the packet; L1
+# packets after the first snapshot only carry the fields that changed.
+# NxtradStream(batch_columns=...) takes other columns in the same form; a
+# tuple of spec keys fills one column from whichever of them comes last in
+# the packet, as a decoded dict keeps the last of fields sharing a name.
+BATCH_COLUMNS = {
+    10: (("ltp", 29), ("open", 30), ("high", 31), ("low", 32), ("close", 33),
+         ("vol", 40), ("OI", 44), ("bidPrice", 49), ("bidQty", 50),
+         ("askPrice", 52), ("askQty", 53), ("ltt", 46)),
+    17: (("itm", 63), ("iv", 64), ("delta", 65), ("gamma", 66), ("theta", 67),
+         ("rho", 68), ("vega", 69), ("highiv", 72), ("lowiv", 73)),
+}
+
+_NP_TYPES = {"B": "u1", "H": "u2", "i": "i4", "<I": "u4", "d": "f8"}
+
+
+def batch_dtype(pkt_type, columns=None):
+    """Structured dtype of batch rows of pkt_type with the given columns (BATCH_COLUMNS by default)."""
+    spec = DEFAULT_PKT_INFO["PKT_SPEC"][pkt_type]
+    fields = [("token", "i4"), ("exchSeg", "u1")]
+    for name, key in (BATCH_COLUMNS[pkt_type] if columns is None else columns):
+        first = key[0] if isinstance(key, tuple) else key
+        fields.append((name, _NP_TYPES[spec[first]["struct"]]))
+    fields.append(("present", "u4"))
+    return np.dtype(fields)
+
+
+BATCH_DTYPES = {pkt_type: batch_dtype(pkt_type) for pkt_type in BATCH_COLUMNS}
+
+# Divisor per exchSeg id, so batch prices scale as arr["ltp"] / SEG_DIVISORS[arr["exchSeg"]]
+SEG_DIVISORS = np.array([100.0] + [SEG_INFO[seg]["divisor"] for seg in range(1, max(SEG_INFO) + 1)])
+
+# Upper bound on distinct key sequences kept by a PacketDecoder
+MAX_LAYOUTS = 4096
+
+# Exchange timestamps repeat across every packet within the same second
+_cached_datefmt = lru_cache(maxsize=4096)(datefmt)
+
+_RAW, _PRICE, _PERCENT, _CALL, _DATE, _SEG, _STRING = range(7)
+
+
+def _field_kind(spec):
+    key = spec["key"]
+    fmt = spec.get("fmt")
+    if key == "exchSeg":
+        return _SEG
+    if spec["struct"] == "string":
+        return _STRING
+    if fmt is None:
+        return _RAW
+    if key in ("ltt", "time"):
+        return _DATE
+    if fmt is divide:
+        return _PRICE
+    if fmt is percent:
+        return _PERCENT
+    return _CALL
+
+
+def _struct_code(spec):
+    if spec["struct"] == "string":
+        return str(spec["len"]) + "s"
+    return spec["struct"].lstrip("<")
+
+
+# Fields every projection keeps: the packet is useless without them
+_PROJECTION_KEEP = frozenset(("exchSeg", "token"))
+
+
+class _FlatLayout:
+    """
+    Decode plan for one key sequence of an L1/OHLC/greeks packet.
+
+    With a projection (a set of field names), the other fields are skipped
+    as pad bytes in the struct and never unpacked or formatted.  vals then
+    holds only the kept values; index maps a field's position in keys to
+    its position in vals, and key_get/val_get split the unpacked tuple.
+    """
+
+    def __init__(self, pkt_type, pkt_spec, keys, head=None, projection=None):
+        self.pkt_type = pkt_type
+        self.keys = keys
+        self._row_plan = None
+        if projection is None:
+            kept = range(len(keys))
+        else:
+            kept = [i for i, k in enumerate(keys)
+                    if pkt_spec[k]["key"] in projection or pkt_spec[k]["key"] in _PROJECTION_KEEP]
+        self.index = {i: n for n, i in enumerate(kept)}
+        self.struct = struct.Struct("<3x" + "".join(
+            "B" + (_struct_code(pkt_spec[k]) if i in self.index else "%dx" % pkt_spec[k]["len"])
+            for i, k in enumerate(keys)))
+        # Key-only struct and name -> (offset, unpack_from, kind, fmt) of every
+        # kept field (the last occurrence wins), for LazyTick
+        self.key_struct = struct.Struct("<3x" + "".join("B%dx" % pkt_spec[k]["len"] for k in keys))
+        self.offsets = {}
+        pos = 3
+        for i, k in enumerate(keys):
+            spec = pkt_spec[k]
+            pos += 1
+            if i in self.index:
+                self.offsets[spec["key"]] = (pos, struct.Struct("<" + _struct_code(spec)).unpack_from,
+                                             _field_kind(spec), spec.get("fmt"))
+            pos += spec["len"]
+        self.key_get = self.val_get = None
+        if projection is not None:
+            key_pos, val_pos, pos = [], [], 0
+            for i in range(len(keys)):
+                key_pos.append(pos)
+                pos += 1
+                if i in self.index:
+                    val_pos.append(pos)
+                    pos += 1
+            self.key_get = _group_getter([(None, p, None) for p in key_pos])[1]
+            self.val_get = _group_getter([(None, p, None) for p in val_pos])[1]
+        if head is None:
+            head = range(len(keys))
+
+        # The last occurrence of a key wins, as it does in the dict
+        last = {}
+        for i in head:
+            if i in self.index:
+                last[pkt_spec[keys[i]]["key"]] = i
+        groups = {}
+        for name, i in last.items():
+            spec = pkt_spec[keys[i]]
+            groups.setdefault(_field_kind(spec), []).append((name, self.index[i], spec.get("fmt")))
+
+        def group(*kinds):
+            return [f for kind in kinds for f in groups.get(kind, ())]
+
+        self.raw_names, self.raw_get = _group_getter(
+            group(_RAW, _PRICE, _PERCENT, _CALL, _DATE, _SEG, _STRING))
+        self.plain_names, self.plain_get = _group_getter(group(_RAW, _SEG, _CALL, _DATE, _STRING))
+        self.price_names, self.price_get = _group_getter(group(_PRICE))
+        self.percent_names, self.percent_get = _group_getter(group(_PERCENT))
+        self.call_fields = tuple((name, fmt) for name, i, fmt in group(_CALL))
+        self.date_fields = tuple((name, _cached_datefmt if fmt is datefmt else fmt)
+                                 for name, i, fmt in group(_DATE))
+        self.string_names = tuple(name for name, i, fmt in group(_STRING))
+
+    def _head(self, vals):
+        jData = dict(zip(self.plain_names, self.plain_get(vals)))
+        seg = SEG_INFO[jData["exchSeg"]]
+        divisor = seg["divisor"]
+        jData["exchSeg"] = seg["exchSeg"]
+        if self.price_names:
+            jData.update(zip(self.price_names, [v / divisor for v in self.price_get(vals)]))
+        if self.percent_names:
+            jData.update(zip(self.percent_names, [v / 100.0 for v in self.percent_get(vals)]))
+        for name, fmt in self.call_fields:
+            jData[name] = fmt(jData[name], divisor)
+        for name, fmt in self.date_fields:
+            jData[name] = fmt(jData[name])
+        for name in self.string_names:
+            jData[name] = jData[name].rstrip(b'\x00').decode("utf_8")
+        jData["symbol"] = str(jData["token"]) + "_" + seg["exchSeg"]
+        jData["precision"] = seg["precision"]
+        return jData, divisor
+
+    def _head_raw(self, vals):
+        jData = dict(zip(self.raw_names, self.raw_get(vals)))
+        seg = SEG_INFO[jData["exchSeg"]]
+        jData["exchSeg"] = seg["exchSeg"]
+        for name in self.string_names:
+            jData[name] = jData[name].rstrip(b'\x00').decode("utf_8")
+        jData["symbol"] = str(jData["token"]) + "_" + seg["exchSeg"]
+        jData["precision"] = seg["precision"]
+        jData["divisor"] = seg["divisor"]
+        return jData
+
+    def decode(self, vals):
+        return self._head(vals)[0]
+
+    def decode_raw(self, vals):
+        return self._head_raw(vals)
+
+    def batch_row(self, vals, columns):
+        """Row tuple matching batch_dtype(pkt_type, columns), in wire units."""
+        if self._row_plan is None:
+            last = {key: self.index[i] for i, key in enumerate(self.keys) if i in self.index}
+            missing, present = len(self.index), len(self.index) + 1
+            mask = 0
+            indices = [last[27], last[26]]
+            for bit, (name, key) in enumerate(columns):
+                index = max((last[k] for k in key if k in last), default=None) if isinstance(key, tuple) \
+                    else last.get(key)
+                if index is not None:
+                    mask |= 1 << bit
+                indices.append(missing if index is None else index)
+            indices.append(present)
+            self._row_plan = (itemgetter(*indices), (0, mask))
+        getter, tail = self._row_plan
+        return getter(vals + tail)
+
+
+class _DepthLayout(_FlatLayout):
+    """Decode plan for one key sequence of an L5 packet."""
+
+    def __init__(self, pkt_type, pkt_spec, keys, head, depth_idx, levels):
+        super().__init__(pkt_type, pkt_spec, keys, head)
+        self.depth_idx = depth_idx
+        self.head = tuple(head)
+        # {name: value index} per level, bids first, for DepthBook
+        self.level_fields = [dict(level) for level in levels]
+        self.levels = []
+        for level in levels:
+            names = tuple(name for name, i in level)
+            getter = _group_getter([(name, i, None) for name, i in level])[1]
+            prices = tuple(name for name, i in level if _field_kind(pkt_spec[keys[i]]) == _PRICE)
+            calls = tuple((name, pkt_spec[keys[i]]["fmt"]) for name, i in level
+                          if _field_kind(pkt_spec[keys[i]]) in (_PERCENT, _CALL, _DATE))
+            self.levels.append((names, getter, prices, calls))
+
+    def decode(self, vals):
+        jData, divisor = self._head(vals)
+        levels = []
+        for names, getter, prices, calls in self.levels:
+            lObj = dict(zip(names, getter(vals)))
+            for name in prices:
+                lObj[name] = lObj[name] / divisor
+            for name, fmt in calls:
+                lObj[name] = fmt(lObj[name], divisor)
+            levels.append(lObj)
+        noLevel = vals[self.depth_idx]
+        jData["bid"] = levels[:noLevel]
+        jData["ask"] = levels[noLevel:]
+        return jData
+
+    def decode_raw(self, vals):
+        jData = self._head_raw(vals)
+        levels = [dict(zip(names, getter(vals))) for names, getter, prices, calls in self.levels]
+        noLevel = vals[self.depth_idx]
+        jData["bid"] = levels[:noLevel]
+        jData["ask"] = levels[noLevel:]
+        return jData
+
+
+def _group_getter(fields):
+    """Names and a tuple-returning getter for (name, index, fmt) fields."""
+    names = tuple(name for name, i, fmt in fields)
+    indices = [i for name, i, fmt in fields]
+    if len(indices) == 1:
+        i = indices[0]
+        return names, lambda vals: (vals[i],)
+    if not indices:
+        return names, lambda vals: ()
+    return names, itemgetter(*indices)
+
+
+def _compile_layout(pkt_type, pkt_spec, keys, projection=None):
+    """
+    Compile the decode plan for one key sequence, or return None when the
+    sequence relies on ordering quirks the generic walker must reproduce.
+    projection (field names) only applies to flat packet types.
+    """
+    names = [pkt_spec[k]["key"] for k in keys]
+    if "exchSeg" not in names or "token" not in names:
+        return None
+    if pkt_type in FLAT_PKT_TYPES:
+        return _FlatLayout(pkt_type, pkt_spec, keys, projection=projection)
+
+    head = []
+    levels = []
+    lObj = {}
+    depth_idx = None
+    for i, name in enumerate(names):
+        if name == "nDepth":
+            if depth_idx is not None:
+                return None
+            depth_idx = i
+        elif name == "exchSeg":
+            # Levels already read would have been scaled by the default divisor
+            if levels or lObj:
+                return None
+            head.append(i)
+        elif depth_idx is not None:
+            lObj[name] = i
+            if len(lObj) == DEFAULT_PKT_INFO["BID_ASK_OBJ_LEN"]:
+                levels.append(list(lObj.items()))
+                lObj = {}
+        else:
+            head.append(i)
+    if depth_idx is None:
+        return None
+    return _DepthLayout(pkt_type, pkt_spec, keys, head, depth_idx, levels)
+
+
+class PacketDecoder:
+    """
+    Decodes L1, L5, OHLC and greeks packets using plans compiled from PKT_SPEC.
+
+    Packets are key/value encoded, so the first packet with a new key sequence
+    is walked once and compiled into a single struct.Struct for the whole
+    packet.  Later packets of the same type and length are unpacked with one
+    unpack_from call and checked against the compiled keys.  The dicts
+    produced are the same as those of the per-field decoders in NxtradStream.
+
+    With raw=True prices, percentages and timestamps are left in wire units
+    and each dict carries the segment "divisor"; see format_tick.
+
+    fields projects packet types onto the named fields, e.g.
+    {"L1": ["ltp", "vol", "OI", "bidPrice", "askPrice"]}: other fields are
+    skipped over without being unpacked or formatted (exchSeg and token are
+    always kept).  Only L1, OHLC and greeks packets can be projected.
+    """
+
+    def __init__(self, pkt_spec=None, raw=False, fields=None, batch_columns=None):
+        self.pkt_spec = pkt_spec if pkt_spec is not None else DEFAULT_PKT_INFO["PKT_SPEC"]
+        self.raw = raw
+        # columns and row dtypes of decode_row, per packet type (see BATCH_COLUMNS)
+        self.batch_columns = BATCH_COLUMNS if batch_columns is None else batch_columns
+        self.batch_dtypes = (BATCH_DTYPES if batch_columns is None else
+                             {pkt_type: batch_dtype(pkt_type, cols) for pkt_type, cols in batch_columns.items()})
+        self.field_lens = {}
+        for pkt_type in FLAT_PKT_TYPES + DEPTH_PKT_TYPES:
+            self.field_lens[pkt_type] = {
+                k: s["len"] for k, s in self.pkt_spec[pkt_type].items()}
+
+        self.compiled = 0
+        self.misses = 0
+        self.set_fields(fields)
+
+    def set_fields(self, fields):
+        """Replace the projection (see above; None decodes every field); compiled plans are dropped."""
+        ids = {name: pkt_type for pkt_type, name in PKT_TYPE.items()}
+        projections = {}
+        for msg_type, names in (fields or {}).items():
+            pkt_type = ids.get(msg_type, msg_type)
+            if pkt_type not in FLAT_PKT_TYPES:
+                raise ValueError("cannot project %s packets" % msg_type)
+            if names is not None:
+                projections[pkt_type] = frozenset(names)
+        self.projections = projections
+        self._by_keys = {}
+        self._by_len = {}
+
+    def decode(self, pkt_type, data, offset, data_len):
+        """
+        Decode the packet at data[offset:offset + data_len], or return None if
+        it needs the generic walker.  data may be bytes or a memoryview.
+        """
+        layout, vals = self.values(pkt_type, data, offset, data_len)
+        if layout is None:
+            return None
+        if self.raw:
+            return layout.decode_raw(vals)
+        return layout.decode(vals)
+
+    def decode_row(self, pkt_type, data, offset, data_len):
+        """Decode an L1/greeks packet into a batch_dtypes[pkt_type] row tuple, or None."""
+        layout, vals = self.values(pkt_type, data, offset, data_len)
+        if layout is None:
+            return None
+        return layout.batch_row(vals, self.batch_columns[pkt_type])
+
+    def lazy(self, pkt_type, data, offset, data_len, state=None):
+        """LazyTick over an L1/OHLC/greeks packet (see LazyTick), or None."""
+        layout = self._by_len.get((pkt_type, data_len))
+        if layout is None or layout.key_struct.unpack_from(data, offset) != layout.keys:
+            layout = self.values(pkt_type, data, offset, data_len)[0]
+            if layout is None or pkt_type not in FLAT_PKT_TYPES:
+                return None
+        return LazyTick(data, offset, layout.offsets, PKT_TYPE[pkt_type], self.raw, state)
+
+    def values(self, pkt_type, data, offset, data_len):
+        """Compiled layout and wire values of a packet, or (None, None)."""
+        layout = self._by_len.get((pkt_type, data_len))
+        if layout is not None:
+            values = layout.struct.unpack_from(data, offset)
+            if layout.key_get is None:
+                if values[0::2] == layout.keys:
+                    return layout, values[1::2]
+            elif layout.key_get(values) == layout.keys:
+                return layout, layout.val_get(values)
+
+        layout = self.__layout_for(pkt_type, data, offset, data_len)
+        if layout is None:
+            return None, None
+        values = layout.struct.unpack_from(data, offset)
+        if layout.val_get is None:
+            return layout, values[1::2]
+        return layout, layout.val_get(values)
+
+    def __layout_for(self, pkt_type, data, offset, data_len):
+        lens = self.field_lens.get(pkt_type)
+        if lens is None:
+            return None
+
+        keys = []
+        idx = offset + 3
+        end = offset + data_len
+        if end > len(data):
+            return None
+        while idx < end:
+            key = data[idx]
+            if key not in lens:
+                return None
+            keys.append(key)
+            idx += 1 + lens[key]
+        if idx != end:
+            return None
+
+        self.misses += 1
+        keys = tuple(keys)
+        if (pkt_type, keys) in self._by_keys:
+            layout = self._by_keys[(pkt_type, keys)]
+        else:
+            if len(self._by_keys) >= MAX_LAYOUTS:
+                self._by_keys.clear()
+                self._by_len.clear()
+            layout = _compile_layout(pkt_type, self.pkt_spec[pkt_type], keys, self.projections.get(pkt_type))
+            self._by_keys[(pkt_type, keys)] = layout
+            self.compiled += 1
+
+        if layout is not None:
+            self._by_len[(pkt_type, data_len)] = layout
+        return layout
+
+
+
+class LazyTick(Mapping):
+    """
+    Read-only mapping over one packet in the decompressed frame buffer.
+
+    Nothing is unpacked up front: each field is read from the buffer at its
+    precomputed offset, formatted (unless raw) and cached on first access,
+    so a consumer that only looks at "symbol" pays for exchSeg and token.
+    Fields an L1 packet does not carry are looked up in the merged state
+    (an L1StateTable row) when first needed; that lookup sees the state at
+    the time of the access, not of the packet.  Once the table has been
+    cleared (unsubscribeL1) the row may belong to another token, so a tick
+    first accessed after that only has the fields of its own packet.
+
+    The tick keeps the frame buffer alive; call to_dict() to keep data
+    around.  Assigning a key overrides it.  Pickling and deepcopy produce
+    a plain dict.
+    """
+
+    __slots__ = ("_buf", "_offset", "_fields", "_raw", "_state", "_seg", "_cache", "_merged")
+
+    def __init__(self, buf, offset, fields, msg_type, raw=False, state=None):
+        self._buf = buf
+        self._offset = offset
+        self._fields = fields
+        self._raw = raw
+        # (L1StateTable, row, lock, table generation) of the merged state, or None
+        self._state = state
+        self._seg = None
+        self._cache = {"msgType": msg_type}
+        self._merged = None
+
+    def __segment(self):
+        seg = self._seg
+        if seg is None:
+            off, unpack, _, _ = self._fields["exchSeg"]
+            seg = self._seg = SEG_INFO[unpack(self._buf, self._offset + off)[0]]
+        return seg
+
+    def __decode(self, name):
+        field = self._fields.get(name)
+        if field is not None:
+            off, unpack, kind, fmt = field
+            value = unpack(self._buf, self._offset + off)[0]
+            if kind == _SEG:
+                return self.__segment()["exchSeg"]
+            if kind == _STRING:
+                return value.rstrip(b'\x00').decode("utf_8")
+            if self._raw:
+                return value
+            if kind == _PRICE:
+                return value / self.__segment()["divisor"]
+            if kind == _PERCENT:
+                return value / 100.0
+            if kind == _DATE:
+                return _cached_datefmt(value) if fmt is datefmt else fmt(value)
+            if kind == _CALL:
+                return fmt(value, self.__segment()["divisor"])
+            return value
+        if name == "symbol":
+            return str(self["token"]) + "_" + self.__segment()["exchSeg"]
+        if name == "precision":
+            return self.__segment()["precision"]
+        if name == "divisor" and self._raw:
+            return self.__segment()["divisor"]
+        merged = self.__merged_state()
+        if name in merged:
+            return merged[name]
+        raise KeyError(name)
+
+    def __merged_state(self):
+        merged = self._merged
+        if merged is None:
+            if self._state is None:
+                merged = {}
+            else:
+                table, row, lock, generation = self._state
+                with lock:
+                    merged = table.row_dict(row) if table.generation == generation else {}
+            self._merged = merged
+        return merged
+
+    def __getitem__(self, name):
+        cache = self._cache
+        try:
+            return cache[name]
+        except KeyError:
+            pass
+        value = cache[name] = self.__decode(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self._cache[name] = value
+
+    def __contains__(self, name):
+        return (name in self._cache or name in self._fields or name in ("symbol", "precision")
+                or (name == "divisor" and self._raw) or name in self.__merged_state())
+
+    def __names(self):
+        names = dict.fromkeys(self.__merged_state())
+        names.update(dict.fromkeys(self._fields))
+        names.update(dict.fromkeys(("symbol", "precision", "msgType")))
+        if self._raw:
+            names["divisor"] = None
+        names.update(dict.fromkeys(self._cache))
+        return names
+
+    def __iter__(self):
+        return iter(self.__names())
+
+    def __len__(self):
+        return len(self.__names())
+
+    def to_dict(self):
+        return {name: self[name] for name in self.__names()}
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return "LazyTick(%r)" % self.to_dict()
+
+
+class L1StateTable:
+    """
+    Latest L1 state per token in preallocated NumPy columns.
+
+    Each token gets one row, found through a (token, exchSeg) -> row map.
+    Packets are written into the row in place, in wire units, and a per-row
+    bitmask records which fields have been received so far.  Integer fields
+    live in one int64 matrix and double fields (ttv) in a float64 matrix, one
+    column per field, so a token costs bytes_per_token bytes whatever the
+    packet mix, and at most max_tokens rows are ever allocated.
+
+    snapshot(symbol) returns a read-only mapping of the merged state,
+    formatted unless the table is raw, and never shares state with the table.
+    """
+
+    def __init__(self, capacity=1024, max_tokens=None, raw=False):
+        spec = DEFAULT_PKT_INFO["PKT_SPEC"][10]
+        names = []
+        for s in spec.values():
+            if s["key"] not in ("exchSeg", "token", "precision") and s["key"] not in names:
+                names.append(s["key"])
+        floats = {s["key"] for s in spec.values() if s["struct"] == "d"}
+        self.int_names = tuple(n for n in names if n not in floats)
+        self.float_names = tuple(n for n in names if n in floats)
+        self._bit = {name: 1 << i for i, name in enumerate(self.int_names + self.float_names)}
+        self._col = {name: i for i, name in enumerate(self.int_names)}
+        self._col.update({name: i for i, name in enumerate(self.float_names)})
+
+        self.raw = raw
+        self.max_tokens = max_tokens
+        self.overflow = 0
+        # Bumped by clear(), after which rows are handed to other tokens
+        self.generation = 0
+        self._index = {}
+        self._by_symbol = {}
+        self._symbols = []
+        # Python-side mirrors of the present/seg/token columns for the per-tick path
+        self._present = []
+        self._segs = []
+        self._tokens = []
+        self._update_plans = {}
+        self._snapshot_plans = {}
+        self._allocate(capacity if max_tokens is None else min(capacity, max_tokens))
+
+    def _allocate(self, capacity):
+        ints = np.zeros((capacity, len(self.int_names)), dtype=np.int64)
+        floats = np.zeros((capacity, len(self.float_names)), dtype=np.float64)
+        present = np.zeros(capacity, dtype=np.uint64)
+        seg = np.zeros(capacity, dtype=np.uint8)
+        token = np.zeros(capacity, dtype=np.int64)
+        rows = len(self._symbols)
+        if rows:
+            ints[:rows] = self.ints[:rows]
+            floats[:rows] = self.floats[:rows]
+            present[:rows] = self.present[:rows]
+            seg[:rows] = self.seg[:rows]
+            token[:rows] = self.token[:rows]
+        self.ints, self.floats, self.present, self.seg, self.token = ints, floats, present, seg, token
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._by_symbol
+
+    @property
+    def bytes_per_token(self):
+        return (self.ints.itemsize * len(self.int_names) + self.floats.itemsize * len(self.float_names)
+                + self.present.itemsize + self.seg.itemsize + self.token.itemsize)
+
+    def memory_usage(self):
+        """Bytes held by the preallocated columns."""
+        return sum(a.nbytes for a in (self.ints, self.floats, self.present, self.seg, self.token))
+
+    def update(self, layout, vals):
+        """Merge one compiled L1 packet into its row; returns the row or None if full."""
+        plan = self._update_plans.get(layout)
+        if plan is None:
+            plan = self._update_plans[layout] = self.__update_plan(layout)
+        seg_idx, token_idx, int_cols, int_get, float_cols, float_get, mask = plan
+
+        key = (vals[token_idx], vals[seg_idx])
+        row = self._index.get(key)
+        if row is None:
+            row = self.__add_row(key)
+            if row is None:
+                return None
+        if int_cols is not None:
+            self.ints[row][int_cols] = int_get(vals)
+        if float_cols is not None:
+            self.floats[row][float_cols] = float_get(vals)
+        present = self._present[row]
+        if present | mask != present:
+            self._present[row] = present | mask
+            self.present[row] = present | mask
+        return row
+
+    def __update_plan(self, layout):
+        spec = DEFAULT_PKT_INFO["PKT_SPEC"][10]
+        last = {spec[k]["key"]: layout.index[i] for i, k in enumerate(layout.keys) if i in layout.index}
+        ints = [(name, last[name], None) for name in self.int_names if name in last]
+        floats = [(name, last[name], None) for name in self.float_names if name in last]
+        mask = 0
+        for name, i, _ in ints + floats:
+            mask |= self._bit[name]
+        int_cols = np.array([self._col[n] for n, i, _ in ints], dtype=np.intp) if ints else None
+        float_cols = np.array([self._col[n] for n, i, _ in floats], dtype=np.intp) if floats else None
+        return (last["exchSeg"], last["token"], int_cols, _group_getter(ints)[1],
+                float_cols, _group_getter(floats)[1], mask)
+
+    def __add_row(self, key):
+        token, seg = key
+        row = len(self._symbols)
+        if row >= self.capacity:
+            if self.max_tokens is not None and row >= self.max_tokens:
+                self.overflow += 1
+                return None
+            capacity = self.capacity * 2
+            if self.max_tokens is not None:
+                capacity = min(capacity, self.max_tokens)
+            self._allocate(capacity)
+        symbol = str(token) + "_" + SEG_INFO[seg]["exchSeg"]
+        self._index[key] = row
+        self._by_symbol[symbol] = row
+        self._symbols.append(symbol)
+        self._present.append(0)
+        self._segs.append(SEG_INFO[seg])
+        self._tokens.append(token)
+        self.token[row] = token
+        self.seg[row] = seg
+        return row
+
+    def row_dict(self, row):
+        """Merged state of a row as a new dict, laid out like a decoded L1 packet."""
+        mask = self._present[row]
+        plan = self._snapshot_plans.get(mask)
+        if plan is None:
+            plan = self._snapshot_plans[mask] = self.__snapshot_plan(mask)
+        int_names, int_get, float_names, float_get, prices, percents, times = plan
+
+        jData = dict(zip(int_names, int_get(self.ints[row].tolist())))
+        if float_names:
+            jData.update(zip(float_names, float_get(self.floats[row].tolist())))
+        seg = self._segs[row]
+        if self.raw:
+            jData["divisor"] = seg["divisor"]
+        else:
+            divisor = seg["divisor"]
+            if prices:
+                jData.update(zip(prices, [jData[n] / divisor for n in prices]))
+            if percents:
+                jData.update(zip(percents, [jData[n] / 100.0 for n in percents]))
+            for name in times:
+                jData[name] = _cached_datefmt(jData[name])
+        symbol = self._symbols[row]
+        jData["exchSeg"] = seg["exchSeg"]
+        jData["token"] = self._tokens[row]
+        jData["symbol"] = symbol
+        jData["precision"] = seg["precision"]
+        jData["msgType"] = L1
+        return jData
+
+    def __snapshot_plan(self, mask):
+        ints = [(n, self._col[n], None) for n in self.int_names if mask & self._bit[n]]
+        floats = [(n, self._col[n], None) for n in self.float_names if mask & self._bit[n]]
+        names = {n for n, _, _ in ints + floats}
+        return (_group_getter(ints) + _group_getter(floats)
+                + (tuple(PRICE_KEYS & names), tuple(PERCENT_KEYS & names), tuple(TIME_KEYS & names)))
+
+    def snapshot(self, symbol):
+        """Read-only merged state for a symbol such as '845112_BFO', or None."""
+        row = self._by_symbol.get(symbol)
+        if row is None:
+            return None
+        return MappingProxyType(self.row_dict(row))
+
+    def column(self, name):
+        """Read-only view of one field's column over the allocated rows."""
+        if name in self.float_names:
+            col = self.floats[:len(self), self._col[name]]
+        else:
+            col = self.ints[:len(self), self._col[name]]
+        col.flags.writeable = False
+        return col
+
+    def symbols(self):
+        return list(self._symbols)
+
+    def clear(self):
+        self.generation += 1
+        self._index.clear()
+        self._by_symbol.clear()
+        self._symbols.clear()
+        self._present.clear()
+        self._segs.clear()
+        self._tokens.clear()
+        self.present[:] = 0
+
+
+class DepthView:
+    """
+    Read-only view of one token's row in a DepthBook.
+
+    Levels and derived fields are read from the book on every access, so a
+    view kept by a consumer always shows the latest depth.  Prices are in
+    rupees unless the book is raw.  Pickling a view (e.g. across processes)
+    pickles a dict snapshot instead.  Once the book releases the row
+    (DepthBook.clear(), unsubscribeL2) the view is frozen: it keeps showing
+    the depth it had last.
+    """
+
+    __slots__ = ("book", "row")
+
+    def __init__(self, book, row):
+        self.book = book
+        self.row = row
+
+    @property
+    def symbol(self):
+        return self.book._symbols[self.row]
+
+    @property
+    def frozen(self):
+        """True once the row was released; the view then no longer updates."""
+        return self.book.frozen
+
+    def __side(self, side):
+        book = self.book
+        n = int(book.counts[self.row, side])
+        levels = book.levels[self.row, side, :n].tolist()
+        if book.raw:
+            return [tuple(level) for level in levels]
+        divisor = book._segs[self.row]["divisor"]
+        return [(price / divisor, qty, no) for price, qty, no in levels]
+
+    @property
+    def bids(self):
+        """[(price, qty, orders)] from the best bid down."""
+        return self.__side(0)
+
+    @property
+    def asks(self):
+        return self.__side(1)
+
+    @property
+    def tot_buy_qty(self):
+        value = int(self.book.totals[self.row, 0])
+        return value if value >= 0 else None
+
+    @property
+    def tot_sell_qty(self):
+        value = int(self.book.totals[self.row, 1])
+        return value if value >= 0 else None
+
+    def __best(self):
+        book, row = self.book, self.row
+        if not book.counts[row, 0] or not book.counts[row, 1]:
+            return None
+        bid, bid_qty = book.levels[row, 0, 0, :2].tolist()
+        ask, ask_qty = book.levels[row, 1, 0, :2].tolist()
+        divisor = 1 if book.raw else book._segs[row]["divisor"]
+        return bid / divisor, bid_qty, ask / divisor, ask_qty
+
+    @property
+    def best_bid(self):
+        bids = self.bids
+        return bids[0] if bids else None
+
+    @property
+    def best_ask(self):
+        asks = self.asks
+        return asks[0] if asks else None
+
+    @property
+    def spread(self):
+        best = self.__best()
+        return None if best is None else best[2] - best[0]
+
+    @property
+    def mid(self):
+        best = self.__best()
+        return None if best is None else (best[0] + best[2]) / 2
+
+    @property
+    def microprice(self):
+        """Top-of-book mid weighted by the opposite side's quantity."""
+        best = self.__best()
+        if best is None:
+            return None
+        bid, bid_qty, ask, ask_qty = best
+        if bid_qty + ask_qty == 0:
+            return (bid + ask) / 2
+        return (bid * ask_qty + ask * bid_qty) / (bid_qty + ask_qty)
+
+    def imbalance(self, levels=None):
+        """(bid qty - ask qty) / (bid qty + ask qty) over the top `levels` levels (all by default)."""
+        book, row = self.book, self.row
+        bid_qty = int(book.levels[row, 0, :min(int(book.counts[row, 0]), levels or book.depth), 1].sum())
+        ask_qty = int(book.levels[row, 1, :min(int(book.counts[row, 1]), levels or book.depth), 1].sum())
+        if bid_qty + ask_qty == 0:
+            return None
+        return (bid_qty - ask_qty) / (bid_qty + ask_qty)
+
+    def as_dict(self):
+        """The depth laid out like a decoded L5 packet (bid/ask lists of level dicts)."""
+        return self.book.row_dict(self.row)
+
+    def __reduce__(self):
+        return dict, (self.as_dict(),)
+
+    def __repr__(self):
+        return "DepthView(%s, bids=%r, asks=%r)" % (self.symbol, self.bids, self.asks)
+
+
+class DepthBook:
+    """
+    Latest L5 depth per token in one preallocated NumPy array.
+
+    levels has shape (capacity, 2, depth, 3): side (0 = bid, 1 = ask),
+    level from the best down, and (price, qty, orders) in wire units.
+    Packets are written into the token's row in place; counts holds the
+    number of levels per side and totals totBuyQty/totSellQty (-1 until
+    received).  Rows are found like L1StateTable's and at most max_tokens
+    are ever allocated.
+
+    view(symbol) returns a DepthView with the levels and derived fields
+    (spread, mid, microprice, imbalance) computed on access, and derived()
+    computes the same over all tokens at once.  clear() releases every row;
+    views handed out before are frozen with a copy of their row.
+    """
+
+    def __init__(self, capacity=256, max_tokens=None, depth=5, raw=False):
+        self.depth = depth
+        self.raw = raw
+        self.max_tokens = max_tokens
+        self.frozen = False
+        self.overflow = 0
+        self._index = {}
+        self._by_symbol = {}
+        self._symbols = []
+        self._segs = []
+        self._tokens = []
+        self._views = []
+        self._plans = {}
+        self._allocate(capacity if max_tokens is None else min(capacity, max_tokens))
+
+    def _allocate(self, capacity):
+        levels = np.zeros((capacity, 2, self.depth, 3), dtype=np.int64)
+        counts = np.zeros((capacity, 2), dtype=np.uint8)
+        totals = np.full((capacity, 2), -1, dtype=np.int64)
+        rows = len(self._symbols)
+        if rows:
+            levels[:rows] = self.levels[:rows]
+            counts[:rows] = self.counts[:rows]
+            totals[:rows] = self.totals[:rows]
+        self.levels, self.counts, self.totals = levels, counts, totals
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._by_symbol
+
+    @property
+    def bytes_per_token(self):
+        return (self.levels.itemsize * 2 * self.depth * 3 + self.counts.itemsize * 2
+                + self.totals.itemsize * 2)
+
+    def memory_usage(self):
+        """Bytes held by the preallocated arrays."""
+        return self.levels.nbytes + self.counts.nbytes + self.totals.nbytes
+
+    def update(self, layout, vals):
+        """Write one compiled L5 packet into its row; returns the row or None if full."""
+        plan = self._plans.get(layout)
+        if plan is None:
+            plan = self._plans[layout] = self.__plan(layout)
+        seg_idx, token_idx, buy_idx, sell_idx, level_get, nlevels = plan
+
+        key = (vals[token_idx], vals[seg_idx])
+        row = self._index.get(key)
+        if row is None:
+            row = self.__add_row(key)
+            if row is None:
+                return None
+        nbid = min(vals[layout.depth_idx], nlevels)
+        nask = min(nlevels - nbid, self.depth)
+        nbid = min(nbid, self.depth)
+        book = self.levels[row]
+        if nbid == nask == self.depth and nlevels == 2 * self.depth:
+            book.reshape(-1)[:] = level_get(vals)
+        else:
+            flat = np.array(level_get(vals), dtype=np.int64).reshape(-1, 3) if nlevels else None
+            book[:] = 0
+            if nbid:
+                book[0, :nbid] = flat[:nbid]
+            if nask:
+                book[1, :nask] = flat[nbid:nbid + nask]
+        self.counts[row] = (nbid, nask)
+        if buy_idx is not None:
+            self.totals[row, 0] = vals[buy_idx]
+        if sell_idx is not None:
+            self.totals[row, 1] = vals[sell_idx]
+        return row
+
+    def __plan(self, layout):
+        spec = DEFAULT_PKT_INFO["PKT_SPEC"][11]
+        head = {spec[layout.keys[i]]["key"]: i for i in layout.head}
+        indices = [level[name] for level in layout.level_fields for name in ("price", "qty", "no")]
+        if indices:
+            getter = itemgetter(*indices) if len(indices) > 1 else (lambda vals: (vals[indices[0]],))
+        else:
+            getter = lambda vals: ()
+        return (head["exchSeg"], head["token"], head.get("totBuyQty"), head.get("totSellQty"),
+                getter, len(layout.level_fields))
+
+    def __add_row(self, key):
+        token, seg = key
+        row = len(self._symbols)
+        if row >= self.capacity:
+            if self.max_tokens is not None and row >= self.max_tokens:
+                self.overflow += 1
+                return None
+            capacity = self.capacity * 2
+            if self.max_tokens is not None:
+                capacity = min(capacity, self.max_tokens)
+            self._allocate(capacity)
+        symbol = str(token) + "_" + SEG_INFO[seg]["exchSeg"]
+        self._index[key] = row
+        self._by_symbol[symbol] = row
+        self._symbols.append(symbol)
+        self._segs.append(SEG_INFO[seg])
+        self._tokens.append(token)
+        self._views.append(DepthView(self, row))
+        return row
+
+    def row_view(self, row):
+        return self._views[row]
+
+    def tick(self, row):
+        """Small stream_cb dict for a row: header fields and totals plus the live DepthView as "depth"."""
+        seg = self._segs[row]
+        jData = {"exchSeg": seg["exchSeg"], "token": self._tokens[row], "symbol": self._symbols[row],
+                 "precision": seg["precision"], "msgType": L5, "depth": self._views[row]}
+        buy, sell = self.totals[row].tolist()
+        if buy >= 0:
+            jData["totBuyQty"] = buy
+        if sell >= 0:
+            jData["totSellQty"] = sell
+        if self.raw:
+            jData["divisor"] = seg["divisor"]
+        return jData
+
+    def view(self, symbol):
+        """DepthView for a symbol such as '845112_BFO', or None."""
+        row = self._by_symbol.get(symbol)
+        return None if row is None else self._views[row]
+
+    def row_dict(self, row):
+        """Depth of a row as a new dict, laid out like a decoded L5 packet."""
+        seg = self._segs[row]
+        divisor = seg["divisor"]
+        jData = {"exchSeg": seg["exchSeg"], "token": self._tokens[row]}
+        for side, name in ((0, "totBuyQty"), (1, "totSellQty")):
+            value = int(self.totals[row, side])
+            if value >= 0:
+                jData[name] = value
+        for side, name in ((0, "bid"), (1, "ask")):
+            levels = self.levels[row, side, :int(self.counts[row, side])].tolist()
+            if self.raw:
+                jData[name] = [{"price": p, "qty": q, "no": n} for p, q, n in levels]
+            else:
+                jData[name] = [{"price": p / divisor, "qty": q, "no": n} for p, q, n in levels]
+        jData["precision"] = seg["precision"]
+        jData["symbol"] = self._symbols[row]
+        if self.raw:
+            jData["divisor"] = divisor
+        jData["msgType"] = L5
+        return jData
+
+    def derived(self):
+        """
+        spread, mid, microprice and imbalance (all levels) of every token as
+        float arrays in row order (see symbols()), NaN where a side is empty.
+        """
+        n = len(self)
+        levels = self.levels[:n]
+        both = (self.counts[:n, 0] > 0) & (self.counts[:n, 1] > 0)
+        divisors = np.array([seg["divisor"] for seg in self._segs]) if not self.raw else np.ones(n)
+        bid = np.where(both, levels[:, 0, 0, 0] / divisors, np.nan)
+        ask = np.where(both, levels[:, 1, 0, 0] / divisors, np.nan)
+        bid_qty = levels[:, 0, 0, 1].astype(np.float64)
+        ask_qty = levels[:, 1, 0, 1].astype(np.float64)
+        top = bid_qty + ask_qty
+        with np.errstate(invalid="ignore", divide="ignore"):
+            micro = np.where(top > 0, (bid * ask_qty + ask * bid_qty) / top, (bid + ask) / 2)
+            depth_bid = levels[:, 0, :, 1].sum(axis=1).astype(np.float64)
+            depth_ask = levels[:, 1, :, 1].sum(axis=1).astype(np.float64)
+            total = depth_bid + depth_ask
+            imbalance = np.where(total > 0, (depth_bid - depth_ask) / total, np.nan)
+        return {"spread": ask - bid, "mid": (bid + ask) / 2, "microprice": micro, "imbalance": imbalance}
+
+    def symbols(self):
+        return list(self._symbols)
+
+    def __freeze(self, row):
+        """A one-row copy of `row` that its view is moved to when the row is released."""
+        copy = DepthBook(capacity=1, depth=self.depth, raw=self.raw)
+        copy.levels[0] = self.levels[row]
+        copy.counts[0] = self.counts[row]
+        copy.totals[0] = self.totals[row]
+        copy._symbols.append(self._symbols[row])
+        copy._segs.append(self._segs[row])
+        copy._tokens.append(self._tokens[row])
+        copy._views.append(self._views[row])
+        copy.frozen = True
+        return copy
+
+    def clear(self):
+        """Release every row; views already handed out keep their last depth (DepthView.frozen)."""
+        for row, view in enumerate(self._views):
+            view.book, view.row = self.__freeze(row), 0
+        self._index.clear()
+        self._by_symbol.clear()
+        self._symbols.clear()
+        self._segs.clear()
+        self._tokens.clear()
+        self._views.clear()
+        self.counts[:] = 0
+        self.totals[:] = -1
+
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_CONFLATE = "conflate"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_CONFLATE)
+
+
+class FrameRing:
+    """
+    Bounded FIFO of raw websocket payloads between the receive thread and
+    the decode workers.
+
+    Each slot holds a list of payloads.  When all capacity slots are taken,
+    put() follows the overflow policy:
+
+    - block: wait for a worker to free a slot (backpressure onto the socket)
+    - drop_oldest: discard the oldest slot and count it in dropped
+    - conflate: append the payload to the newest slot; the worker decodes
+      every payload of that slot but dispatches only the latest tick per
+      symbol (see NxtradStream.process_frames).  A slot holds at most
+      max_conflate payloads.  Once the newest slot is full the policy is no
+      longer lossless: the oldest slot is discarded as with drop_oldest
+      (its payloads counted in dropped) and the payload starts a new slot,
+      so the ring never holds more than capacity * max_conflate payloads
+
+    get() blocks until a slot is available and returns None once the ring
+    is closed and drained.
+    """
+
+    def __init__(self, capacity=1024, policy=OVERFLOW_BLOCK, max_conflate=64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if max_conflate < 1:
+            raise ValueError("max_conflate must be at least 1")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(OVERFLOW_POLICIES))
+        self.capacity = capacity
+        self.policy = policy
+        self.max_conflate = max_conflate
+        self.closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.blocked = 0
+        self.high_water = 0
+        self._slots = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def put(self, frame):
+        """Queue one payload; returns False if it was refused because the ring is closed."""
+        with self._lock:
+            slots = self._slots
+            if len(slots) >= self.capacity and not self.closed:
+                conflate = self.policy == OVERFLOW_CONFLATE
+                if conflate and len(slots[-1]) < self.max_conflate:
+                    slots[-1].append(frame)
+                    self.enqueued += 1
+                    self.conflated += 1
+                    return True
+                if conflate or self.policy == OVERFLOW_DROP_OLDEST:
+                    if not self.dropped:
+                        print("Frame ring full, dropping the oldest frames")
+                    self.dropped += len(slots.popleft())
+                else:
+                    self.blocked += 1
+                    while len(slots) >= self.capacity and not self.closed:
+                        self._not_full.wait()
+            if self.closed:
+                self.dropped += 1
+                return False
+            slots.append([frame])
+            self.enqueued += 1
+            if len(slots) > self.high_water:
+                self.high_water = len(slots)
+            self._not_empty.notify()
+            return True
+
+    def get(self):
+        """Next slot (a list of payloads), or None once closed and empty."""
+        with self._lock:
+            while not self._slots:
+                if self.closed:
+                    return None
+                self._not_empty.wait()
+            slot = self._slots.popleft()
+            self._not_full.notify()
+            return slot
+
+    def close(self):
+        """Refuse new payloads and wake every waiter; queued slots are still handed out."""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def reopen(self):
+        with self._lock:
+            self.closed = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": len(self._slots),
+                "capacity": self.capacity,
+                "policy": self.policy,
+                "high_water": self.high_water,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "conflated": self.conflated,
+                "blocked": self.blocked,
+            }
+
 
 class NxtradStream:
-    def __init__(self, url, version='3.1', stream_cb=None, connect_cb=None):
+    def __init__(self, url, version='3.1', stream_cb=None, connect_cb=None,
+                 compiled_decode=True, batch_cb=None, raw=False, max_tokens=None,
+                 pipeline=False, queue_size=1024, overflow=OVERFLOW_BLOCK, workers=1,
+                 recorder=None, latency=None, depth_book=False, fields=None, lazy=False,
+                 frame_cb=None, batch_columns=None):
         self.ws = None
         self.isConnected = False
 
         self.stream_cb = stream_cb
         self.connect_cb = connect_cb
-
-        self.host = "wss://" + url + "/v2.1/stream"
+        # Optional streaming.recorder.FrameRecorder; gets every raw frame as received
+        # (write() only queues it, the recorder's own thread does the file I/O)
+        self.recorder = recorder
+        # Optional streaming.latency.LatencyMonitor; frames and packets are
+        # timed only when it is set, and it pings the stream while connected
+        self.latency = latency
+        # Batch mode: L1 and greeks packets of a frame are delivered together
+        # as one BATCH_DTYPES structured array through
+        # batch_cb(stream, msgType, array) instead of one stream_cb each;
+        # batch_columns replaces BATCH_COLUMNS for the array's columns.  L1
+        # packets are still merged into l1_state, so snapshot() and column()
+        # stay current; the array rows carry only each packet's own fields.
+        self.batch_cb = batch_cb
+        if batch_cb is not None and not compiled_decode:
+            raise ValueError("batch_cb requires compiled_decode")
+        # Frame mode: the packets of a frame, decoded as for stream_cb, are
+        # delivered as one list through frame_cb(stream, packets) instead of
+        # one stream_cb each.
+        self.frame_cb = frame_cb
+
+        # url is the host name, or a ws:// / wss:// base URL (local test servers)
+        base = url if "://" in url else "wss://" + url
+        self.host = base + "/v2.1/stream"
 
         self.L1_dict = {}
+        self.l1_state = L1StateTable(max_tokens=max_tokens, raw=raw) if compiled_decode else None
         self.token = ''
         self.version = version
 
+        # compiled_decode=False keeps the per-field walker for every packet.
+        # raw=True keeps L1/L5/OHLC/greeks values in wire units (integer
+        # paise prices, epoch ltt) with a per-segment "divisor"; convert with
+        # tick_price, tick_time or format_tick only where needed.
+        if raw and not compiled_decode:
+            raise ValueError("raw requires compiled_decode")
+        # fields: per message type projection, e.g. {"L1": ["ltp", "vol"]};
+        # see PacketDecoder.  Unrequested fields are never unpacked.
+        if fields and not compiled_decode:
+            raise ValueError("fields requires compiled_decode")
+        self.decoder = PacketDecoder(raw=raw, fields=fields, batch_columns=batch_columns) if compiled_decode else None
+        # depth_book=True: L5 packets are written in place into a DepthBook and
+        # stream_cb gets a small dict whose "depth" is the token's live
+        # DepthView instead of bid/ask lists of level dicts
+        if depth_book and not compiled_decode:
+            raise ValueError("depth_book requires compiled_decode")
+        self.depth_book = DepthBook(max_tokens=max_tokens, raw=raw) if depth_book else None
+        # lazy=True: L1, OHLC and greeks packets reach stream_cb as LazyTick
+        # mappings that decode fields from the frame buffer on access
+        if lazy and not compiled_decode:
+            raise ValueError("lazy requires compiled_decode")
+        self.lazy = lazy
+
+        # pipeline=True: the websocket thread only queues payloads in a
+        # FrameRing of queue_size slots; `workers` threads decompress, decode
+        # and run the callbacks.  With more than one worker, callbacks may run
+        # concurrently and ticks of one symbol may arrive out of order.
+        if pipeline and workers < 1:
+            raise ValueError("pipeline needs at least one worker")
+        self.frames = FrameRing(queue_size, overflow) if pipeline else None
+        self.workers = workers if pipeline else 0
+        self._worker_threads = []
+        self._state_lock = threading.Lock()
+        if pipeline:
+            self.__start_workers()
+
     def connect(self, token):
         self.token = token
         self.__tryConnect()
@@ -205,8 +1531,51 @@ class NxtradStream:
             on_close=self.__on_close,
         )
 
+        if self.frames is not None:
+            self.__start_workers()
+        if self.latency is not None:
+            self.latency.attach(self)
         threading.Thread(target=self.__task).start()
 
+    def __start_workers(self):
+        self._worker_threads = [t for t in self._worker_threads if t.is_alive()]
+        self.frames.reopen()
+        while len(self._worker_threads) < self.workers:
+            t = threading.Thread(target=self.__worker, name="nxtrad-decode-%d" % len(self._worker_threads),
+                                 daemon=True)
+            t.start()
+            self._worker_threads.append(t)
+
+    def __worker(self):
+        frames = self.frames
+        while True:
+            slot = frames.get()
+            if slot is None:
+                return
+            try:
+                if self.latency is not None:
+                    self.__process_timed(slot)
+                elif len(slot) == 1:
+                    self.process_frame(slot[0])
+                else:
+                    self.process_frames(slot)
+            except Exception:
+                traceback.print_exc()
+
+    def pipeline_stats(self):
+        """Queue depth and drop/conflation counters of the pipeline, or None."""
+        if self.frames is None:
+            return None
+        stats = self.frames.stats()
+        stats["workers"] = sum(t.is_alive() for t in self._worker_threads)
+        return stats
+
+    def set_fields(self, fields):
+        """Change the field projection of the running stream (None: decode every field)."""
+        if self.decoder is None:
+            raise ValueError("fields requires compiled_decode")
+        self.decoder.set_fields(fields)
+
     def subscribeEvents(self, type):
         req = {}
         req["type"] = "event"
@@ -219,7 +1588,10 @@ class NxtradStream:
     def sendPing(self):
         req = {}
         req["type"] = "PING"
-        return self.__send_data(req)
+        sent = self.__send_data(req)
+        if sent and self.latency is not None:
+            self.latency.ping_sent(self)
+        return sent
 
     def subscribeL1(self, tokens):
         req = {}
@@ -308,7 +1680,10 @@ class NxtradStream:
 
     def unsubscribeL1(self):
 
-        self.L1_dict.clear()
+        with self._state_lock:
+            self.L1_dict.clear()
+            if self.l1_state is not None:
+                self.l1_state.clear()
 
         req = {}
         req["type"] = "L1"
@@ -317,6 +1692,11 @@ class NxtradStream:
         return self.__send_data(req)
 
     def unsubscribeL2(self):
+
+        if self.depth_book is not None:
+            with self._state_lock:
+                self.depth_book.clear()
+
         req = {}
         req["type"] = "L5"
         req["action"] = "unsub"
@@ -355,10 +1735,19 @@ class NxtradStream:
     def disconnect(self):
         self.ws.close()
         self.isConnected = False
+        if self.latency is not None:
+            self.latency.detach(self)
+        if self.frames is not None:
+            # workers finish the queued payloads and exit
+            self.frames.close()
 
     def isConnected(self):
         return self.isConnected
 
+    def sendRequest(self, req):
+        """Send a prebuilt request such as {"type": "L1", "action": "sub", "tokens": [...]}."""
+        return self.__send_data(req)
+
     def __send_data(self, req):
         if not self.isConnected:
             return False
@@ -376,7 +1765,7 @@ class NxtradStream:
         if binaryKey == "string":
             parsed = self.__ab2str(data, idx, binaryLen)
         else:
-            parsed = struct.unpack(binaryKey, data[idx: idx + binaryLen])[0]
+            parsed = struct.unpack_from(binaryKey, data, idx)[0]
 
         return parsed
 
@@ -389,12 +1778,11 @@ class NxtradStream:
 
     def __ab2str(self, buf, offset, length):
         unpacklen = str(length) + "s"
-        v = struct.unpack(unpacklen, buf[offset: offset + length])
+        v = struct.unpack_from(unpacklen, buf, offset)
         res = v[0].rstrip(b'\x00').decode("utf_8")
         return res
 
-    def __onsinglePacket(self, data, data_len):
-        pktType = struct.unpack("b", data[2:3])[0]
+    def __onsinglePacket(self, pktType, data, offset, data_len, pending=None, collect=None):
         pktSpec = DEFAULT_PKT_INFO["PKT_SPEC"]
         if pktType not in pktSpec:
             print("Unknown PktType : ", pktType)
@@ -402,46 +1790,118 @@ class NxtradStream:
 
         packetType = PKT_TYPE[pktType]
         quoteSpec = pktSpec[pktType]
+        jData = None
+        timed = self.latency is not None
+        t0 = time.perf_counter_ns() if timed else 0
+        if packetType == L1 and self.l1_state is not None:
+            # Merged into the state table; callbacks get a fresh merged dict
+            layout, vals = self.decoder.values(pktType, data, offset, data_len)
+            if layout is not None:
+                with self._state_lock:
+                    row = self.l1_state.update(layout, vals)
+                    generation = self.l1_state.generation
+                    if row is not None and pending is None and not self.lazy:
+                        jData = self.l1_state.row_dict(row)
+                    elif row is not None and pending is not None:
+                        # read back by symbol when the batch is flushed: a clear()
+                        # in between can hand the row to another token
+                        pending[(L1, self.l1_state._symbols[row])] = None
+                if row is not None and pending is None and self.lazy:
+                    jData = LazyTick(data, offset, layout.offsets, L1, self.decoder.raw,
+                                     (self.l1_state, row, self._state_lock, generation))
+                if row is not None:
+                    if pending is not None:
+                        if timed:
+                            self.latency.packet(None, time.perf_counter_ns() - t0)
+                    elif collect is not None:
+                        collect.append(jData)
+                        if timed:
+                            self.latency.packet(None, time.perf_counter_ns() - t0)
+                    elif timed:
+                        self.__timed_callback(jData, t0)
+                    else:
+                        self._callback(self.stream_cb, self, jData)
+                    return
+
+        if packetType == L5 and self.depth_book is not None:
+            layout, vals = self.decoder.values(pktType, data, offset, data_len)
+            if layout is not None:
+                with self._state_lock:
+                    row = self.depth_book.update(layout, vals)
+                    if row is not None:
+                        jData = self.depth_book.tick(row)
+
+        if jData is None and self.lazy and pktType in FLAT_PKT_TYPES:
+            jData = self.decoder.lazy(pktType, data, offset, data_len)
+
+        if jData is None and self.decoder is not None:
+            jData = self.decoder.decode(pktType, data, offset, data_len)
+
+        if jData is None:
+            jData = self.__decodePacket(packetType, quoteSpec, data, offset, data_len)
+
+        if jData is not None:
+            jData["msgType"] = packetType
+
+            if packetType == L1 and self.l1_state is None:
+                t = jData["symbol"]
+                with self._state_lock:
+                    if t in self.L1_dict:
+                        _cache_d = self.L1_dict[t]
+                        _cache_d.update(jData)
+                        jData = _cache_d
+                    self.L1_dict[t] = jData
+
+            if timed:
+                if packetType == PING:
+                    self.latency.pong_received(self)
+                if pending is None and collect is None:
+                    self.__timed_callback(jData, t0)
+                    return
+                self.latency.packet(None, time.perf_counter_ns() - t0)
+            if collect is not None:
+                collect.append(jData)
+            elif pending is None:
+                self._callback(self.stream_cb, self, jData)
+            elif "symbol" in jData:
+                pending[(packetType, jData["symbol"])] = jData
+            else:
+                pending[object()] = jData
+
+    def __timed_callback(self, jData, t0):
+        t1 = time.perf_counter_ns()
+        self._callback(self.stream_cb, self, jData)
+        self.latency.packet(jData, t1 - t0, time.perf_counter_ns() - t1)
+
+    def __decodePacket(self, packetType, quoteSpec, data, offset, data_len):
         jData = None
         if packetType == L1:
-            jData = self.__decodeL1PKT(quoteSpec, data_len, data)
+            jData = self.__decodeL1PKT(quoteSpec, data, offset, data_len)
         elif packetType == L5:
-            jData = self.__decodeL2PKT(quoteSpec, data_len, data)
+            jData = self.__decodeL2PKT(quoteSpec, data, offset, data_len)
         elif packetType == OHLC:
-            jData = self.__decodeOHLC(quoteSpec, data_len, data)
+            jData = self.__decodeOHLC(quoteSpec, data, offset, data_len)
         elif packetType == MARKET_STATUS:
-            jData = self.__decodeMarketStatus(quoteSpec, data_len, data)
+            jData = self.__decodeMarketStatus(quoteSpec, data, offset, data_len)
         elif packetType == EVENTS:
-            jData = self.__decodeMessage(quoteSpec, data_len, data)
+            jData = self.__decodeMessage(quoteSpec, data, offset, data_len)
         elif packetType == PING:
-            jData = self.__decodeStatus(quoteSpec, data_len, data)
+            jData = self.__decodeStatus(quoteSpec, data, offset, data_len)
         elif packetType == GREEKS:
-            jData = self.__decodeL1PKT(quoteSpec, data_len, data)
-
-        if jData is not None:
-            jData["msgType"] = packetType
-
-            if packetType == L1:
-                t = jData["symbol"]
-                if t in self.L1_dict:
-                    _cache_d = self.L1_dict[t]
-                    _cache_d.update(jData)
-                    jData = _cache_d
-                self.L1_dict[t] = jData
-
-            self._callback(self.stream_cb, self, jData)
+            jData = self.__decodeL1PKT(quoteSpec, data, offset, data_len)
+        return jData
 
-    def __decodeL1PKT(self, pktSpec, data_len, data):
+    def __decodeL1PKT(self, pktSpec, data, offset, data_len):
         jData = {}
         raw_data = {}
         exchange_info = None
         divisor = 100.0
         precision = 2
-        idx = 3
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        idx = offset + 3
+        end = offset + data_len
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             if spec["key"] == "exchSeg":
                 exchange_info = SEG_INFO[framed]
@@ -464,7 +1924,7 @@ class NxtradStream:
 
         return jData
 
-    def __decodeL2PKT(self, pktSpec, data_len, data):
+    def __decodeL2PKT(self, pktSpec, data, offset, data_len):
         exchange_info = None
         raw_data = {}
         divisor = 100.0
@@ -475,11 +1935,11 @@ class NxtradStream:
         list = None
         lObj = {}
         jData = {}
-        idx = 3
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        idx = offset + 3
+        end = offset + data_len
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             if spec["key"] == "nDepth":
                 noLevel = framed
@@ -516,17 +1976,17 @@ class NxtradStream:
         jData["symbol"] = str(jData["token"]) + "_" + jData["exchSeg"]
         return jData
 
-    def __decodeOHLC(self, pktSpec, data_len, data):
+    def __decodeOHLC(self, pktSpec, data, offset, data_len):
         jData = {}
         raw_data = {}
         exchange_info = None
         divisor = 100.0
         precision = 2
-        idx = 3
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        idx = offset + 3
+        end = offset + data_len
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             if spec["key"] == "exchSeg":
                 exchange_info = SEG_INFO[framed]
@@ -549,17 +2009,17 @@ class NxtradStream:
 
         return jData
 
-    def __decodeMarketStatus(self, pktSpec, data_len, data):
+    def __decodeMarketStatus(self, pktSpec, data, offset, data_len):
         lObj = {}
         jData = {}
-        idx = 3
+        idx = offset + 3
+        end = offset + data_len
         noOfLen = 0
         exchange_info = None
         list = None
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             if spec["key"] == "nLen":
                 noOfLen = framed
@@ -580,14 +2040,14 @@ class NxtradStream:
         jData["status"] = list
         return jData
 
-    def __decodeMessage(self, pktSpec, data_len, data):
+    def __decodeMessage(self, pktSpec, data, offset, data_len):
         jData = {}
-        idx = 3
+        idx = offset + 3
+        end = offset + data_len
         noOfLen = 0
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             if spec["key"] == "nLen":
                 noOfLen = framed
@@ -599,13 +2059,13 @@ class NxtradStream:
 
         return jData
 
-    def __decodeStatus(self, pktSpec, data_len, data):
+    def __decodeStatus(self, pktSpec, data, offset, data_len):
         jData = {}
-        idx = 3
-        while idx < data_len:
-            pktKey = struct.unpack("B", data[idx: idx + 1])
+        idx = offset + 3
+        end = offset + data_len
+        while idx < end:
+            spec = pktSpec[data[idx]]
             idx += 1
-            spec = pktSpec[pktKey[0]]
             framed = self.__frame_from_spec(spec, data, idx)
             jData[spec["key"]] = (spec["fmt"](
                 framed) if "fmt" in spec else framed)
@@ -618,30 +2078,144 @@ class NxtradStream:
         return dc_data
 
     def __on_message(self, ws, message):
-        totalRecivedLen = struct.unpack("i", message[:4])[0]
-        version = struct.unpack("b", message[4:5])[0]
+        if self.recorder is not None:
+            self.recorder.write(message)
+        if self.latency is not None:
+            received = time.perf_counter_ns()
+            if self.frames is not None:
+                self.frames.put((received, message))  # unpacked in __process_timed
+            else:
+                self.process_frame(message)
+                self.latency.frame_done(received)
+        elif self.frames is not None:
+            self.frames.put(message)
+        else:
+            self.process_frame(message)
+
+    def __process_timed(self, slot):
+        start = time.perf_counter_ns()
+        if len(slot) == 1:
+            self.process_frame(slot[0][1])
+        else:
+            self.process_frames([message for _, message in slot])
+        for received, _ in slot:
+            self.latency.frame_done(received, start)
+
+    def process_frame(self, message):
+        """Decode one binary websocket payload and dispatch its packets."""
+        batches = {} if self.batch_cb is not None else None
+        if self.frame_cb is None:
+            self.__decode_frame(message, batches)
+        else:
+            packets = []
+            self.__decode_frame(message, batches, collect=packets)
+            if packets:
+                self.__dispatch_frame(packets)
+        if batches:
+            self.__dispatch_batches(batches)
+
+    def process_frames(self, messages):
+        """
+        Decode several payloads and dispatch only the latest tick per symbol.
+
+        Every packet is still decoded (and L1 packets merged into the state
+        table), but stream_cb is called once per symbol and packet type with
+        the newest data, in order of first appearance; packets without a
+        symbol (auth, events, market status) are all delivered.  In batch
+        mode the rows of all payloads are delivered as one array per type,
+        in frame mode the latest ticks as one frame_cb list.
+        """
+        batches = {} if self.batch_cb is not None else None
+        pending = {}
+        for message in messages:
+            self.__decode_frame(message, batches, pending)
+        if batches:
+            self.__dispatch_batches(batches)
+        latency = self.latency
+        if self.frame_cb is not None:
+            packets = list(pending.values())
+            if any(jData is None for jData in packets):
+                with self._state_lock:
+                    packets = [self.__pending_tick(key[1]) if jData is None else jData
+                               for key, jData in pending.items()]
+                packets = [jData for jData in packets if jData is not None]
+            if packets:
+                self.__dispatch_frame(packets)
+            return
+        for key, jData in pending.items():
+            if jData is None:
+                with self._state_lock:
+                    jData = self.__pending_tick(key[1])
+                if jData is None:
+                    continue
+            if latency is None:
+                self._callback(self.stream_cb, self, jData)
+            else:
+                t0 = time.perf_counter_ns()
+                self._callback(self.stream_cb, self, jData)
+                latency.dispatched(jData, time.perf_counter_ns() - t0)
+
+    def __pending_tick(self, symbol):
+        """Merged L1 tick of a conflated symbol (called with _state_lock held), or None once it was cleared."""
+        row = self.l1_state._by_symbol.get(symbol)
+        return None if row is None else self.l1_state.row_dict(row)
+
+    def __decode_frame(self, message, batches, pending=None, collect=None):
+        # The payload is wrapped once in a memoryview and every packet and
+        # field below is read in place with unpack_from, without slicing.
+        message = memoryview(message)
+        totalRecivedLen, version, compressionAlgo = FRAME_HEADER.unpack_from(message, 0)
         if version != CURRENT_VERSION:
             print("Kindly download and use the updated SDK.")
             return
 
-        compressionAlgo = struct.unpack("b", message[5:6])[0]
-        dc_data = message[6:]
         if compressionAlgo == 100:
-            dc_data = self.__decompressZLib(message[6:])
+            dc_data = memoryview(self.__decompressZLib(message[6:]))
+            bufferIndex = 0
+        else:
+            dc_data = message
+            bufferIndex = 6
 
         totalRecivedLen = len(dc_data)
-        bufferIndex = 0
+        unpack_header = PKT_HEADER.unpack_from
         while bufferIndex < totalRecivedLen:
-            pktLen = struct.unpack(
-                "h", dc_data[bufferIndex: (bufferIndex + 2)])[0]
+            pktLen, pktType = unpack_header(dc_data, bufferIndex)
             if pktLen <= 0:
                 print("Packet Length is wrong exiting the loop" + str(pktLen))
                 break
 
-            self.__onsinglePacket(
-                dc_data[bufferIndex: (bufferIndex + pktLen)], pktLen)
+            row = None
+            if batches is not None and pktType in self.decoder.batch_dtypes:
+                if pktType == 10 and self.l1_state is not None:
+                    # merged into the state table as well, for snapshot()/column()
+                    layout, vals = self.decoder.values(pktType, dc_data, bufferIndex, pktLen)
+                    if layout is not None:
+                        with self._state_lock:
+                            self.l1_state.update(layout, vals)
+                        row = layout.batch_row(vals, self.decoder.batch_columns[pktType])
+                else:
+                    row = self.decoder.decode_row(pktType, dc_data, bufferIndex, pktLen)
+            if row is not None:
+                batches.setdefault(pktType, []).append(row)
+            else:
+                self.__onsinglePacket(pktType, dc_data, bufferIndex, pktLen, pending, collect)
             bufferIndex += pktLen
 
+    def __dispatch_frame(self, packets):
+        if self.latency is None:
+            self._callback(self.frame_cb, self, packets)
+            return
+        t0 = time.perf_counter_ns()
+        self._callback(self.frame_cb, self, packets)
+        per_packet = (time.perf_counter_ns() - t0) // len(packets)
+        for jData in packets:
+            self.latency.dispatched(jData, per_packet)
+
+    def __dispatch_batches(self, batches):
+        for pktType, rows in batches.items():
+            self._callback(self.batch_cb, self, PKT_TYPE[pktType],
+                           np.array(rows, dtype=self.decoder.batch_dtypes[pktType]))
+
     def __on_error(self, ws, error):
         self.isConnected = False
         self._callback(self.connect_cb, self, {"s": "error", "reason": error})
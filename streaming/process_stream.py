@@ -0,0 +1,348 @@
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from streaming.nxtradstream import (NxtradStream, DEFAULT_PKT_INFO, PKT_TYPE, SEG_INFO, batch_dtype,
+                                    format_tick)
+
+
+def _record_columns(pkt_type):
+    """
+    One batch column per field name of a packet type, so a record holds
+    everything its decoded dict would.  exchSeg and token are batch columns
+    already and precision comes from the segment.  Names used by several
+    keys (L1 "qty" and "no" of the best bid and ask) take the key that comes
+    last in the packet, like the dict does.
+    """
+    keys = {}
+    for key, spec in DEFAULT_PKT_INFO["PKT_SPEC"][pkt_type].items():
+        if spec["key"] not in ("exchSeg", "token", "precision"):
+            keys.setdefault(spec["key"], []).append(key)
+    return tuple((name, ks[0] if len(ks) == 1 else tuple(ks)) for name, ks in keys.items())
+
+
+# Batch columns the child decodes L1 and greeks packets into (NxtradStream batch_columns)
+RECORD_COLUMNS = {pkt_type: _record_columns(pkt_type) for pkt_type in (10, 17)}
+RECORD_DTYPES = {pkt_type: batch_dtype(pkt_type, cols) for pkt_type, cols in RECORD_COLUMNS.items()}
+
+# Fixed record of the shared tick ring: the union of the L1 and greeks
+# record columns, tagged with the ring sequence number and packet type.
+# "present" is the batch bitmask of the record's own packet type.
+_TICK_FIELDS = [("seq", "u8"), ("pktType", "u1"), ("exchSeg", "u1"), ("token", "i4"), ("present", "u4")]
+for _pkt_type in RECORD_COLUMNS:
+    _TICK_FIELDS += [(name, RECORD_DTYPES[_pkt_type][name].str) for name, _ in RECORD_COLUMNS[_pkt_type]]
+TICK_DTYPE = np.dtype(_TICK_FIELDS, align=True)
+
+# Header words: reserved seq, committed seq, capacity
+_HEADER = 3
+_RESERVED, _COMMITTED, _CAPACITY = range(_HEADER)
+_HEADER_BYTES = 64
+
+
+class TickRing:
+    """
+    Single-writer ring of TICK_DTYPE records in shared memory.
+
+    The writer bumps the reserved counter, writes its records into slots
+    seq % capacity, then publishes them by bumping the committed counter.
+    Readers (TickReader) track their own sequence number and detect both
+    records overwritten before they were read and records being rewritten
+    while they were copied, and count them as overruns.
+    """
+
+    def __init__(self, capacity=65536, name=None, create=True):
+        if create:
+            size = _HEADER_BYTES + capacity * TICK_DTYPE.itemsize
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((_HEADER,), dtype=np.uint64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = 0
+            self.header[_CAPACITY] = capacity
+        self.capacity = int(self.header[_CAPACITY])
+        self.records = np.ndarray((self.capacity,), dtype=TICK_DTYPE, buffer=self.shm.buf,
+                                  offset=_HEADER_BYTES)
+        self.owner = create
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name, create=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def committed(self):
+        return int(self.header[_COMMITTED])
+
+    def write(self, pkt_type, rows):
+        """Append a RECORD_DTYPES[pkt_type] array; returns the committed sequence number."""
+        start = int(self.header[_COMMITTED])
+        n = len(rows)
+        if n > self.capacity:  # only the newest rows can survive anyway
+            start += n - self.capacity
+            rows = rows[n - self.capacity:]
+            n = self.capacity
+        end = start + n
+        self.header[_RESERVED] = end
+        out = np.zeros(n, dtype=TICK_DTYPE)
+        out["seq"] = np.arange(start, end, dtype=np.uint64)
+        out["pktType"] = pkt_type
+        for name in rows.dtype.names:
+            out[name] = rows[name]
+        self.records[np.arange(start, end) % self.capacity] = out
+        self.header[_COMMITTED] = end
+        return end
+
+    def close(self):
+        # drop our views first so the mapping can be released
+        self.header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class TickReader:
+    """Sequenced reader of a TickRing; overruns counts records lost to the writer."""
+
+    def __init__(self, ring, from_start=False):
+        self.ring = ring
+        self.next_seq = 0 if from_start else ring.committed
+        self.overruns = 0
+        self.read_count = 0
+
+    def read(self, max_records=None):
+        """Copy of the records published since the last read, oldest first."""
+        ring = self.ring
+        head = int(ring.header[_COMMITTED])
+        start = self.next_seq
+        if head - start > ring.capacity:
+            self.overruns += head - ring.capacity - start
+            start = head - ring.capacity
+        end = head if max_records is None else min(head, start + max_records)
+        if end <= start:
+            return ring.records[:0].copy()
+
+        out = ring.records[np.arange(start, end) % ring.capacity]
+        # Slots the writer reserved meanwhile may have been rewritten under us
+        first_safe = int(ring.header[_RESERVED]) - ring.capacity
+        skip = max(0, min(first_safe - start, end - start))
+        out = out[skip:]
+        ok = out["seq"] == np.arange(start + skip, end, dtype=np.uint64)
+        if not ok.all():
+            skip += int(len(ok) - ok.sum())
+            out = out[ok]
+        self.overruns += skip
+        self.read_count += len(out)
+        self.next_seq = end
+        return out
+
+
+# (bit, column, record index) per packet type, for record_ticks
+_RECORD_COLUMNS = {pkt_type: [(1 << bit, name, TICK_DTYPE.names.index(name))
+                              for bit, (name, _) in enumerate(cols)]
+                   for pkt_type, cols in RECORD_COLUMNS.items()}
+
+
+def record_ticks(records, raw=False):
+    """Tick dicts for ring records, with only the fields present in each packet."""
+    ticks = []
+    for rec in records.tolist():
+        pkt_type, seg_id, token, present = rec[1], rec[2], rec[3], rec[4]
+        seg = SEG_INFO[seg_id]
+        tick = {name: rec[i] for bit, name, i in _RECORD_COLUMNS[pkt_type] if present & bit}
+        tick["exchSeg"] = seg["exchSeg"]
+        tick["token"] = token
+        tick["symbol"] = str(token) + "_" + seg["exchSeg"]
+        tick["precision"] = seg["precision"]
+        tick["divisor"] = seg["divisor"]
+        tick["msgType"] = PKT_TYPE[pkt_type]
+        ticks.append(tick if raw else format_tick(tick))
+    return ticks
+
+
+def _feed_main(url, token, ring_name, control, output, stream_options):
+    ring = TickRing.attach(ring_name)
+    ids = {name: pkt_type for pkt_type, name in PKT_TYPE.items()}
+
+    def on_batch(_stream, msgType, rows):
+        ring.write(ids[msgType], rows)
+
+    def on_packet(_stream, data):
+        output.put(("packet", data))
+
+    def on_connect(_stream, ev):
+        output.put(("connect", {k: v if isinstance(v, (str, int, float, type(None))) else str(v)
+                                for k, v in ev.items()}))
+
+    stream = NxtradStream(url, stream_cb=on_packet, connect_cb=on_connect, batch_cb=on_batch,
+                          batch_columns=RECORD_COLUMNS, raw=True, **stream_options)
+    stream.connect(token)
+    try:
+        while True:
+            req = control.get()
+            if req is None:
+                break
+            if isinstance(req, tuple) and req[0] == "fields":
+                stream.set_fields(req[1])
+                continue
+            stream.sendRequest(req)
+    finally:
+        if stream.ws is not None:
+            stream.disconnect()
+        ring.close()
+        output.close()
+        output.join_thread()
+        # the websocket-client thread is not a daemon and can outlive close()
+        os._exit(0)
+
+
+class ProcessNxtradStream:
+    """
+    NxtradStream running in a child process.
+
+    The child owns the websocket and does all decompression and decoding.
+    L1 and greeks packets go through a shared-memory TickRing as fixed
+    records, and the remaining packets (L5, OHLC, events, status) and
+    connection events go through a multiprocessing queue.  A consumer thread
+    in this process turns both back into stream_cb/connect_cb calls.  The
+    records carry every L1 and greeks field (RECORD_COLUMNS) and ticks are
+    merged per symbol, so stream_cb sees the same accumulated L1 state as
+    with NxtradStream.
+
+    The TickRing has a single writer, so the child's NxtradStream always
+    decodes with one worker: a workers option above 1 is lowered to 1.
+
+    Call poll() from your own loop instead by passing consumer=False.
+    Requests and set_fields() are forwarded to the child; subscriptions and
+    field projections therefore take effect asynchronously.
+    """
+
+    def __init__(self, url, stream_cb=None, connect_cb=None, capacity=65536, raw=False,
+                 consumer=True, poll_interval=0.001, **stream_options):
+        self.url = url
+        self.stream_cb = stream_cb
+        self.connect_cb = connect_cb
+        self.raw = raw
+        self.poll_interval = poll_interval
+        if stream_options.get("workers", 1) > 1:
+            logging.warning("ProcessNxtradStream: the child stream writes a single-writer TickRing, "
+                            "using workers=1 instead of %d" % stream_options["workers"])
+            stream_options["workers"] = 1
+        self.stream_options = stream_options
+        self.isConnected = False
+        self.frames = None
+        self.ws = None
+
+        self.ring = TickRing(capacity)
+        self.reader = TickReader(self.ring)
+        self._ctx = mp.get_context("spawn")
+        self._control = self._ctx.Queue()
+        self._output = self._ctx.Queue()
+        self._process = None
+        self._consumer = consumer
+        self._thread = None
+        self._running = False
+        self._state = {}
+
+    def connect(self, token):
+        self._process = self._ctx.Process(
+            target=_feed_main, name="nxtrad-feed", daemon=True,
+            args=(self.url, token, self.ring.name, self._control, self._output, self.stream_options))
+        self._process.start()
+        self._running = True
+        if self._consumer:
+            self._thread = threading.Thread(target=self.__consume, name="nxtrad-feed-consumer", daemon=True)
+            self._thread.start()
+
+    def disconnect(self):
+        self.isConnected = False
+        self._running = False
+        self._control.put(None)
+        if self._process is not None:
+            self._process.join(5)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(5)
+
+    def close(self):
+        self.disconnect()
+        self.ring.close()
+
+    def sendRequest(self, req):
+        if not self.isConnected:
+            return False
+        self._control.put(req)
+        return True
+
+    def set_fields(self, fields):
+        """Change the child's field projection (None: decode every field); also used on reconnect."""
+        self.stream_options["fields"] = fields
+        if self._running:
+            self._control.put(("fields", fields))
+
+    def subscribeEvents(self, type):
+        return self.sendRequest({"type": "event", "action": "sub", "events": type})
+
+    def pipeline_stats(self):
+        return {"ring_capacity": self.ring.capacity, "committed": self.ring.committed,
+                "read": self.reader.read_count, "overruns": self.reader.overruns}
+
+    def poll(self, max_records=None):
+        """Deliver whatever the child produced since the last call; returns the count."""
+        count = 0
+        while True:
+            try:
+                kind, data = self._output.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            if kind == "connect":
+                status = data.get("s")
+                if status == "connected":
+                    self.isConnected = True
+                elif status in ("closed", "error"):
+                    self.isConnected = False
+                self._callback(self.connect_cb, self, data)
+            else:
+                self._callback(self.stream_cb, self, data if self.raw else format_tick(data))
+
+        records = self.reader.read(max_records)
+        if len(records):
+            state = self._state
+            for tick in record_ticks(records, self.raw):
+                key = (tick["msgType"], tick["symbol"])
+                merged = state.get(key)
+                if merged is None:
+                    merged = state[key] = tick
+                else:
+                    merged.update(tick)
+                self._callback(self.stream_cb, self, dict(merged))
+            count += len(records)
+        return count
+
+    def __consume(self):
+        while self._running:
+            try:
+                if not self.poll():
+                    if not self._process.is_alive():
+                        break
+                    time.sleep(self.poll_interval)
+            except Exception:
+                traceback.print_exc()
+        self.poll()
+
+    def _callback(self, callback, *args):
+        if callback:
+            try:
+                callback(*args)
+            except Exception as e:
+                print("Error in Calling callback {}: {}".format(callback, e))
@@ -0,0 +1,250 @@
+import glob
+import gzip
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+
+# Capture files are a sequence of entries: 1 byte kind, 8 byte monotonic
+# receive time in ns, 4 byte payload length, then the payload.  A SESSION
+# entry (payload: 8 byte wall clock time in ns) starts every file opening,
+# so monotonic times can be mapped back to wall clock time per session.
+ENTRY_HEADER = struct.Struct("<BqI")
+SESSION = 1
+FRAME = 2
+_WALL = struct.Struct("<q")
+
+
+class FrameRecorder:
+    """
+    Append-only recorder of raw binary websocket frames.
+
+    Frames are written to <directory>/<prefix>-YYYYMMDD.cap (.cap.gz with
+    compress=True), switching to a new file at local midnight.  Reopening
+    an existing day's file appends to it, after cutting off a torn last
+    entry; a torn .gz file cannot be appended to, so the day continues in
+    <prefix>-YYYYMMDD~1.cap.gz (~2, ...) instead.
+
+    write() is thread safe and only queues the frame: a writer thread does
+    the file (and gzip) work, so the websocket receive thread never waits
+    on the disk.  When queue_size frames are waiting, new frames are dropped
+    and counted in dropped rather than blocking the receiver.  Once close()
+    has been called write() refuses frames.
+    """
+
+    def __init__(self, directory, prefix="nxtrad", compress=False, clock=time.monotonic_ns,
+                 wall_clock=time.time_ns, queue_size=65536):
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.queue_size = queue_size
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.closed = False
+        self.path = None
+        self._file = None
+        self._rotate_at = 0
+        self._queue = deque()
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame, ts=None):
+        """Queue a frame; False if it was dropped (full queue) or the recorder is closed."""
+        if ts is None:
+            ts = self.clock()
+        wall = self.wall_clock()
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.queue_size:
+                self.dropped += 1
+                return False
+            self._queue.append((ts, wall, frame))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__run, name="frame-recorder", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def __run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._thread is not None:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                entries = list(self._queue)
+                self._queue.clear()
+                self._busy = True
+            try:
+                for ts, wall, frame in entries:
+                    if self._file is None or wall >= self._rotate_at:
+                        self.__open(ts, wall)
+                    self._file.write(ENTRY_HEADER.pack(FRAME, ts, len(frame)))
+                    self._file.write(frame)
+                    self.frames += 1
+                    self.bytes += len(frame)
+            except Exception as e:
+                logging.error(f"Frame recorder write failed: {e}")
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until the queued frames are written, then flush the file; False on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._queue and not self._busy, timeout):
+                return False
+            if self._file is not None:
+                self._file.flush()
+        return True
+
+    def close(self, timeout=5.0):
+        """Write what is queued, stop the writer thread and close the file; later writes are refused."""
+        with self._cond:
+            self.closed = True
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def reopen(self):
+        """Accept frames again after close(); they go to the day's file, reopened for appending."""
+        with self._cond:
+            self.closed = False
+
+    def __open(self, ts, wall):
+        if self._file is not None:
+            self._file.close()
+        day = datetime.fromtimestamp(wall / 1e9)
+        midnight = datetime(day.year, day.month, day.day) + timedelta(days=1)
+        self._rotate_at = int(midnight.timestamp() * 1e9)
+
+        base = "%s-%s" % (self.prefix, day.strftime("%Y%m%d"))
+        if self.compress:
+            self.path = os.path.join(self.directory, base + ".cap.gz")
+            n = 0
+            while os.path.exists(self.path) and not _gzip_intact(self.path):
+                n += 1
+                self.path = os.path.join(self.directory, "%s~%d.cap.gz" % (base, n))
+            self._file = gzip.open(self.path, "ab")
+        else:
+            self.path = os.path.join(self.directory, base + ".cap")
+            self._file = open(self.path, "ab")
+            end = _complete_length(self.path)
+            if end < self._file.tell():
+                self._file.truncate(end)
+                self._file.seek(end)
+        self._file.write(ENTRY_HEADER.pack(SESSION, ts, _WALL.size) + _WALL.pack(wall))
+
+
+def _gzip_intact(path):
+    """True if a gzip capture file decompresses to its end (no torn member)."""
+    try:
+        with gzip.open(path, "rb") as f:
+            while f.read(1 << 20):
+                pass
+        return True
+    except (EOFError, OSError, zlib.error):
+        return False
+
+
+def _complete_length(path):
+    """Length of the complete entries at the start of a plain capture file."""
+    size = os.path.getsize(path)
+    end = 0
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(ENTRY_HEADER.size)
+            if len(head) < ENTRY_HEADER.size:
+                return end
+            length = ENTRY_HEADER.unpack(head)[2]
+            if end + ENTRY_HEADER.size + length > size:
+                return end
+            end += ENTRY_HEADER.size + length
+            f.seek(end)
+
+
+def read_capture(path):
+    """Yield (wall clock ns, frame) for every frame of a capture file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        offset = None
+        while True:
+            try:
+                head = f.read(ENTRY_HEADER.size)
+                if len(head) < ENTRY_HEADER.size:
+                    return  # end of file, or a torn last entry
+                kind, ts, length = ENTRY_HEADER.unpack(head)
+                payload = f.read(length)
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return  # a gzip file cut off mid-member
+            if len(payload) < length:
+                return
+            if kind == SESSION:
+                offset = _WALL.unpack(payload)[0] - ts
+            elif kind == FRAME:
+                yield (ts if offset is None else ts + offset), payload
+
+
+def capture_files(pattern):
+    """Capture files matching a path, directory or glob, in date order."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.cap*")
+    return sorted(glob.glob(pattern))
+
+
+class FrameReplayer:
+    """
+    Feeds captured frames back into a decoder, e.g. NxtradStream.process_frame.
+
+    speed=1 replays with the recorded gaps between frames, speed=N N times
+    faster, and speed=None (or 0) as fast as the decoder goes.  Gaps longer
+    than max_gap seconds (overnight, reconnects) are cut to max_gap.
+    """
+
+    def __init__(self, paths, speed=None, max_gap=None, sleep=time.sleep, clock=time.perf_counter):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.speed = speed
+        self.max_gap = max_gap
+        self.sleep = sleep
+        self.clock = clock
+        self.frames = 0
+        self.bytes = 0
+
+    def __iter__(self):
+        for path in self.paths:
+            yield from read_capture(path)
+
+    def replay(self, process_frame):
+        """Replay every frame; returns the number of frames replayed."""
+        start = self.clock()
+        elapsed = 0.0  # capture time replayed so far, in seconds
+        last_ts = None
+        for ts, frame in self:
+            if self.speed and last_ts is not None:
+                gap = (ts - last_ts) / 1e9
+                if self.max_gap is not None:
+                    gap = min(gap, self.max_gap)
+                elapsed += max(gap, 0.0)
+                delay = start + elapsed / self.speed - self.clock()
+                if delay > 0:
+                    self.sleep(delay)
+            last_ts = ts
+            process_frame(frame)
+            self.frames += 1
+            self.bytes += len(frame)
+        return self.frames
@@ -0,0 +1,21 @@
+"""Sample packets and frame builders shared by the stream tests."""
+
+from streaming.encoder import encode_packet, encode_frame
+
+# Older names of the encoder functions, used across the stream tests
+build_packet = encode_packet
+build_frame = encode_frame
+
+
+L1_FULL = [(26, 4), (27, 845112), (28, 2), (29, 24550), (30, 21000), (31, 26010), (32, 20500),
+           (33, 22000), (34, 2550), (35, 1159), (36, 23870), (37, 99000), (38, 1500), (39, 20),
+           (40, 1834560), (41, 4.37e9), (42, 98000), (43, 5), (44, 412300), (45, -312),
+           (46, 1760000000), (49, 24500), (50, 300), (51, 4), (52, 24600), (53, 120), (54, 2),
+           (58, 399000), (59, 420000), (60, 390000), (71, 22000), (74, 23870)]
+L5 = [(26, 4), (27, 845112), (28, 2), (47, 91230), (48, 80420), (55, 5)] + \
+    [kv for lvl in range(5) for kv in ((49, 24500 - lvl * 5), (50, 100 + lvl), (51, lvl + 1))] + \
+    [kv for lvl in range(5) for kv in ((52, 24600 + lvl * 5), (53, 200 + lvl), (54, lvl + 2))]
+OHLC_PKT = [(26, 2), (27, -51), (30, 8450010), (31, 8460020), (32, 8440030), (33, 8455040),
+            (40, 0), (46, 1760000000), (74, 8450000), (75, "1M"), (76, 0)]
+GREEKS_PKT = [(26, 4), (27, 845112), (63, 1.0), (64, 14.2), (65, 0.51), (66, 0.0021),
+              (67, -12.4), (68, 3.1), (69, 8.8), (72, 18.0), (73, 11.0)]
@@ -0,0 +1,60 @@
+import json
+import unittest
+
+from websockets.asyncio.server import serve
+
+from streaming.async_nxtradstream import AsyncNxtradStream, StreamBatch
+from tests.frames import build_frame, build_packet, L1_FULL, GREEKS_PKT
+
+
+class TestAsyncNxtradStream(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.paths = []
+        self.server = await serve(self._handler, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = "ws://127.0.0.1:%d" % port
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handler(self, ws):
+        self.paths.append(ws.request.path)
+        async for message in ws:
+            req = json.loads(message)
+            self.requests.append(req)
+            if req["type"] == "L1":
+                partial = [(26, 4), (27, 845112), (29, 24555)]
+                await ws.send(build_frame([build_packet(10, L1_FULL), build_packet(17, GREEKS_PKT)]))
+                await ws.send(build_frame([build_packet(10, partial)], compress=False))
+                await ws.close(4001, "Unauthorized Access")
+
+    async def test_subscribe_and_iterate(self):
+        stream = AsyncNxtradStream(self.url)
+        await stream.connect("key:token")
+        self.assertTrue(await stream.subscribeL1(["845112_BFO"]))
+        packets = [packet async for packet in stream]
+
+        self.assertEqual(self.paths, ["/v2.1/stream?token=key:token&version=3.1"])
+        self.assertEqual(self.requests, [{"type": "L1", "action": "sub", "tokens": [{"t": "845112_BFO"}]}])
+        self.assertEqual([p["msgType"] for p in packets], ["L1", "greeks", "L1"])
+        self.assertEqual(packets[2]["ltp"], 245.55)
+        self.assertEqual(packets[2]["open"], 210.0)
+        self.assertEqual(stream.close_code, 4001)
+        self.assertFalse(await stream.subscribeL1(["845112_BFO"]))
+
+    async def test_batches(self):
+        async with AsyncNxtradStream(self.url, batch=True) as stream:
+            await stream.connect("key:token")
+            await stream.subscribeOHLC(["-51_BSE"], "1M")
+            await stream.subscribeL1(["845112_BFO"])
+            items = [item async for item in stream]
+        self.assertEqual(self.requests[0]["chartInterval"], "1M")
+        self.assertIsInstance(items[0], StreamBatch)
+        self.assertEqual([(b.msgType, len(b.rows)) for b in items], [("L1", 1), ("greeks", 1), ("L1", 1)])
+        self.assertEqual(items[0].rows["ltp"][0], 24550)
+
+
+if __name__ == '__main__':
+    unittest.main()
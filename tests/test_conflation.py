@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from mono_engine.core.conflation import Conflator
+from mono_engine.core.events import EventDispatcher, EVENT_TICK
+
+
+class TestConflator(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.received = []
+        self.events.subscribe(EVENT_TICK, self.received.append)
+
+    def test_merges_per_symbol_until_drain(self):
+        conflator = Conflator(self.events)
+        conflator.push({"msgType": "L1", "symbol": "A", "ltp": 1.0, "vol": 10})
+        conflator.push({"msgType": "L1", "symbol": "B", "ltp": 5.0})
+        conflator.push({"msgType": "L1", "symbol": "A", "ltp": 1.5})
+        conflator.push({"msgType": "greeks", "symbol": "A", "iv": 14.2})
+        self.assertEqual(self.received, [])
+
+        self.assertEqual(conflator.drain(), 3)
+        self.assertEqual(self.received[0], {"msgType": "L1", "symbol": "A", "ltp": 1.5, "vol": 10})
+        self.assertEqual(self.received[1]["symbol"], "B")
+        self.assertEqual(self.received[2]["msgType"], "greeks")
+        self.assertEqual(conflator.stats()["conflated"], 1)
+        self.assertEqual(conflator.stats()["emitted"], 3)
+
+    def test_unkeyed_updates_pass_through(self):
+        conflator = Conflator(self.events)
+        conflator.push({"msgType": "EVENTS", "orders": []})
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(conflator.stats()["received"], 0)
+
+    def test_input_is_not_mutated(self):
+        conflator = Conflator(self.events)
+        first = {"msgType": "L1", "symbol": "A", "ltp": 1.0}
+        conflator.push(first)
+        conflator.push({"msgType": "L1", "symbol": "A", "ltp": 2.0})
+        conflator.drain()
+        self.assertEqual(first["ltp"], 1.0)
+
+    def test_slow_subscriber_gets_latest_state(self):
+        gate = threading.Event()
+        self.events.subscribe(EVENT_TICK, lambda _tick: gate.wait(1))
+        conflator = Conflator(self.events)
+        conflator.start()
+        try:
+            conflator.push({"msgType": "L1", "symbol": "A", "ltp": 0})
+            time.sleep(0.05)  # first cycle is now stuck in the slow subscriber
+            for i in range(1, 1000):
+                conflator.push({"msgType": "L1", "symbol": "A", "ltp": i})
+            gate.set()
+        finally:
+            conflator.stop()
+        self.assertEqual([t["ltp"] for t in self.received], [0, 999])
+        self.assertEqual(conflator.stats()["conflated"], 998)
+
+
+if __name__ == '__main__':
+    unittest.main()
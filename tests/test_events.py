@@ -0,0 +1,302 @@
+import threading
+import time
+import unittest
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, DELIVERY_THREADED, DELIVERY_CONFLATED
+
+
+class TestKeyedSubscriptions(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.calls = []
+
+    def recorder(self, name):
+        return lambda data: self.calls.append((name, data.get("symbol") if isinstance(data, dict) else data))
+
+    def test_keyed_callbacks_only_see_their_symbols(self):
+        self.events.subscribe(EVENT_TICK, self.recorder("all"))
+        self.events.subscribe(EVENT_TICK, self.recorder("a"), keys={"A"})
+        self.events.subscribe(EVENT_TICK, self.recorder("ab"), keys=["A", "B"])
+        for symbol in ("A", "B", "C"):
+            self.events.publish(EVENT_TICK, {"symbol": symbol})
+        self.events.publish(EVENT_TICK, {"msgType": "L1"})
+        self.events.publish(EVENT_TICK, None)
+        self.assertEqual(self.calls, [("all", "A"), ("a", "A"), ("ab", "A"), ("all", "B"), ("ab", "B"),
+                                      ("all", "C"), ("all", None), ("all", None)])
+
+    def test_subscription_order_is_kept_across_wildcard_and_keyed(self):
+        self.events.subscribe(EVENT_TICK, self.recorder("a"), keys={"A"})
+        self.events.subscribe(EVENT_TICK, self.recorder("all"))
+        self.events.publish(EVENT_TICK, {"symbol": "A"})
+        self.assertEqual([name for name, _ in self.calls], ["a", "all"])
+
+    def test_unsubscribe_keys_and_callbacks(self):
+        strategy = self.recorder("s")
+        self.events.subscribe(EVENT_TICK, strategy, keys={"A", "B"})
+        self.events.unsubscribe(EVENT_TICK, strategy, keys={"A"})
+        self.events.publish(EVENT_TICK, {"symbol": "A"})
+        self.events.publish(EVENT_TICK, {"symbol": "B"})
+        self.assertEqual(self.calls, [("s", "B")])
+
+        self.events.unsubscribe(EVENT_TICK, strategy)
+        self.events.publish(EVENT_TICK, {"symbol": "B"})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.events._routes, {})
+
+    def test_custom_key_field(self):
+        events = EventDispatcher(key_field="order_id")
+        events.subscribe("on_order_update", self.calls.append, keys={"1"})
+        events.publish("on_order_update", {"order_id": "1"})
+        events.publish("on_order_update", {"order_id": "2"})
+        self.assertEqual(self.calls, [{"order_id": "1"}])
+
+
+class TestBatchPublish(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.batches = []
+        self.items = []
+
+    def test_batch_and_plain_subscribers(self):
+        self.events.subscribe(EVENT_TICK, self.batches.append, batch=True)
+        self.events.subscribe(EVENT_TICK, self.items.append)
+        ticks = [{"symbol": s} for s in ("A", "B", "A")]
+        self.events.publish_batch(EVENT_TICK, ticks)
+        self.events.publish(EVENT_TICK, {"symbol": "C"})
+        self.events.publish_batch(EVENT_TICK, [])
+        self.assertEqual(self.batches, [ticks, [{"symbol": "C"}]])
+        self.assertEqual(self.items, ticks + [{"symbol": "C"}])
+
+    def test_keyed_batch_subscribers_get_their_items(self):
+        self.events.subscribe(EVENT_TICK, self.batches.append, keys={"A"}, batch=True)
+        self.events.subscribe(EVENT_TICK, self.items.append, keys={"B", "C", "D"})
+        self.events.publish_batch(EVENT_TICK, [{"symbol": "A", "n": 1}, {"symbol": "B"}, {"symbol": "A", "n": 2},
+                                               {"symbol": "E"}])
+        self.assertEqual(self.batches, [[{"symbol": "A", "n": 1}, {"symbol": "A", "n": 2}]])
+        self.assertEqual(self.items, [{"symbol": "B"}])
+
+    def test_failing_callback_does_not_stop_the_batch(self):
+        def fail(data):
+            raise RuntimeError("boom")
+
+        self.events.subscribe(EVENT_TICK, fail)
+        self.events.subscribe(EVENT_TICK, self.batches.append, batch=True)
+        self.events.publish_batch(EVENT_TICK, [{"symbol": "A"}, {"symbol": "B"}])
+        self.assertEqual(len(self.batches[0]), 2)
+
+    def test_threaded_batch_subscriber(self):
+        self.events.subscribe(EVENT_TICK, self.batches.append, delivery=DELIVERY_THREADED, batch=True)
+        self.events.publish_batch(EVENT_TICK, [{"symbol": "A"}, {"symbol": "B"}])
+        self.assertTrue(self.events.flush(5))
+        self.assertEqual(sum(len(b) for b in self.batches), 2)
+        self.assertEqual(self.events.subscriber_stats()[EVENT_TICK][0]["delivered"], 2)
+        self.events.clear()
+
+    def test_batches_through_lanes(self):
+        events = EventDispatcher(lane_options={})
+        events.subscribe(EVENT_TICK, self.batches.append, batch=True)
+        events.publish_batch(EVENT_TICK, [{"symbol": "A"}, {"symbol": "B"}])
+        self.assertTrue(events.flush(5))
+        events.close()
+        self.assertEqual(self.batches, [[{"symbol": "A"}, {"symbol": "B"}]])
+
+
+class Module:
+    def __init__(self):
+        self.ticks = []
+
+    def on_tick(self, tick):
+        self.ticks.append(tick)
+
+    def on_fill(self, data):
+        pass
+
+
+class TestRegistry(unittest.TestCase):
+    def test_unsubscribe_all_removes_an_owners_subscriptions(self):
+        events = EventDispatcher()
+        module, other = Module(), Module()
+        events.subscribe(EVENT_TICK, module.on_tick)
+        events.subscribe(EVENT_TICK, module.on_tick, keys={"A"}, batch=True)
+        events.subscribe("order_filled", module.on_fill)
+        events.subscribe(EVENT_TICK, other.on_tick)
+        events.subscribe(EVENT_TICK, print, owner=module)
+        self.assertEqual(events.unsubscribe_all(module), 4)
+        self.assertEqual(events.subscribers(EVENT_TICK), (other.on_tick,))
+        self.assertEqual(events.subscribers("order_filled"), ())
+        with self.assertRaises(ValueError):
+            events.unsubscribe_all(None)
+
+    def test_publish_during_subscriber_churn(self):
+        events = EventDispatcher()
+        steady = Module()
+        events.subscribe(EVENT_TICK, steady.on_tick, keys={"A", "B"})
+        events.subscribe(EVENT_TICK, steady.on_tick)
+        stop = threading.Event()
+        errors = []
+        churned = [0] * 4
+        running = [threading.Event() for _ in churned]
+
+        def churn(i):
+            try:
+                while not stop.is_set():
+                    module = Module()
+                    events.subscribe(EVENT_TICK, module.on_tick)
+                    events.subscribe(EVENT_TICK, module.on_tick, keys={"A"})
+                    events.subscribe("order_filled", module.on_fill)
+                    events.unsubscribe(EVENT_TICK, module.on_tick, keys={"A"})
+                    events.unsubscribe_all(module)
+                    churned[i] += 1
+                    running[i].set()
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+                running[i].set()
+
+        threads = [threading.Thread(target=churn, args=(i,)) for i in range(len(churned))]
+        for thread in threads:
+            thread.start()
+        published = 0
+        try:
+            for event in running:  # every churner is subscribing and unsubscribing by now
+                self.assertTrue(event.wait(5))
+            for _ in range(2000):
+                for symbol in ("A", "B", "C"):
+                    events.publish(EVENT_TICK, {"symbol": symbol})
+                events.publish_batch(EVENT_TICK, [{"symbol": "A"}, {"symbol": "C"}])
+                published += 5
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(all(churned))
+        # the steady subscriber saw every event: once as wildcard, again for A and B
+        self.assertEqual(len(steady.ticks), published + published // 5 * 3)
+        self.assertEqual(events.subscribers(EVENT_TICK), (steady.on_tick, steady.on_tick))
+        self.assertEqual(events.subscribers("order_filled"), ())
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.module = Module()
+
+    def slow(self, data):
+        time.sleep(0.002)
+
+    def fail(self, data):
+        raise RuntimeError("bad tick")
+
+    def test_callbacks_are_timed_and_failures_counted(self):
+        self.events.subscribe(EVENT_TICK, self.module.on_tick)
+        self.events.subscribe(EVENT_TICK, self.slow, keys={"A"})
+        self.events.subscribe(EVENT_TICK, self.fail)
+        self.events.subscribe(EVENT_TICK, self.module.on_tick, batch=True)
+        self.assertIsNone(self.events.profile_stats())
+
+        self.events.enable_profiling()
+        self.events.publish(EVENT_TICK, {"symbol": "A"})
+        self.events.publish(EVENT_TICK, {"symbol": "B"})
+        self.events.publish_batch(EVENT_TICK, [{"symbol": "A"}, {"symbol": "C"}])
+
+        stats = {entry["callback"]: entry for entry in self.events.profile_stats()}
+        self.assertEqual(next(iter(stats)), "TestProfiling.slow")  # slowest first
+        self.assertEqual((stats["TestProfiling.slow"]["calls"], stats["TestProfiling.slow"]["items"]), (2, 2))
+        self.assertGreaterEqual(stats["TestProfiling.slow"]["max_ns"], 2e6)
+        self.assertEqual(stats["TestProfiling.fail"]["errors"], 4)
+        # plain subscription 2 + 2 calls; batch subscription 2 one-item calls + 1 batch of 2
+        self.assertEqual((stats["Module.on_tick"]["calls"], stats["Module.on_tick"]["items"]), (7, 8))
+        self.assertIn("TestProfiling.slow", self.events.profile_summary())
+
+        self.events.disable_profiling()
+        self.events.publish(EVENT_TICK, {"symbol": "A"})
+        stats = {entry["callback"]: entry for entry in self.events.profile_stats()}
+        self.assertEqual(stats["TestProfiling.slow"]["calls"], 2)
+        errors = self.events.error_stats()
+        self.assertEqual((errors[0]["callback"], errors[0]["errors"]), ("TestProfiling.fail", 5))
+        self.assertIn("bad tick", errors[0]["last_error"])
+
+    def test_periodic_summary(self):
+        self.events.subscribe(EVENT_TICK, self.module.on_tick)
+        with self.assertLogs(level="INFO") as logs:
+            self.events.enable_profiling(log_interval=0.01)
+            self.events.publish(EVENT_TICK, {"symbol": "A"})
+            time.sleep(0.05)
+            self.events.close()
+        self.assertTrue(any("Module.on_tick" in line for line in logs.output))
+        self.assertIsNone(self.events.profiler)
+
+
+class TestQueuedDelivery(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.slow_calls = []
+
+    def tearDown(self):
+        self.release.set()
+        self.events.clear()
+
+    def slow(self, data):
+        self.entered.set()
+        self.release.wait(5)
+        self.slow_calls.append(data)
+
+    def test_slow_subscriber_does_not_delay_the_others(self):
+        fills = []
+        self.events.subscribe(EVENT_TICK, self.slow, delivery=DELIVERY_THREADED)
+        self.events.subscribe(EVENT_TICK, fills.append)
+        for i in range(3):
+            self.events.publish(EVENT_TICK, {"symbol": "A", "ltp": i})
+        self.assertEqual(len(fills), 3)
+        self.assertEqual(self.slow_calls, [])  # published while the slow one is still blocked
+
+        self.release.set()
+        self.assertTrue(self.events.flush(5))
+        self.assertEqual([d["ltp"] for d in self.slow_calls], [0, 1, 2])
+        stats = self.events.subscriber_stats()[EVENT_TICK][0]
+        self.assertEqual((stats["mode"], stats["delivered"], stats["dropped"], stats["queued"]),
+                         (DELIVERY_THREADED, 3, 0, 0))
+        self.assertIn("slow", stats["callback"])
+        self.assertGreater(stats["max_lag"], 0)
+
+    def test_full_queue_drops_the_oldest(self):
+        self.events.subscribe(EVENT_TICK, self.slow, delivery=DELIVERY_THREADED, queue_size=2)
+        for i in range(6):
+            self.events.publish(EVENT_TICK, {"symbol": "A", "ltp": i})
+        self.release.set()
+        self.events.flush(5)
+        stats = self.events.subscriber_stats()[EVENT_TICK][0]
+        self.assertEqual(stats["received"], 6)
+        self.assertEqual(stats["delivered"] + stats["dropped"], 6)
+        self.assertGreaterEqual(stats["dropped"], 3)
+        self.assertEqual(self.slow_calls[-1]["ltp"], 5)
+
+    def test_conflated_delivery_merges_per_symbol(self):
+        self.events.subscribe(EVENT_TICK, self.slow, delivery=DELIVERY_CONFLATED)
+        self.events.publish(EVENT_TICK, {"symbol": "A", "ltp": 0})
+        self.assertTrue(self.entered.wait(5))  # the worker is now blocked on the first tick
+        self.events.publish(EVENT_TICK, {"symbol": "A", "ltp": 1, "vol": 10})
+        self.events.publish(EVENT_TICK, {"symbol": "B", "ltp": 5})
+        self.events.publish(EVENT_TICK, {"symbol": "A", "ltp": 2})
+        self.release.set()
+        self.events.flush(5)
+        self.assertEqual(self.slow_calls, [{"symbol": "A", "ltp": 0}, {"symbol": "A", "ltp": 2, "vol": 10},
+                                           {"symbol": "B", "ltp": 5}])
+        self.assertEqual(self.events.subscriber_stats()[EVENT_TICK][0]["dropped"], 1)
+
+    def test_unsubscribe_stops_the_worker(self):
+        self.release.set()
+        self.events.subscribe(EVENT_TICK, self.slow, delivery=DELIVERY_THREADED)
+        worker = self.events._routes[EVENT_TICK].callbacks[0]._thread
+        self.events.unsubscribe(EVENT_TICK, self.slow)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(self.events.subscriber_stats(), {})
+        with self.assertRaises(ValueError):
+            self.events.subscribe(EVENT_TICK, self.slow, delivery="later")
+
+
+if __name__ == "__main__":
+    unittest.main()
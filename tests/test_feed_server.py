@@ -0,0 +1,50 @@
+import time
+import unittest
+
+from streaming.feed_server import FeedServer
+from streaming.nxtradstream import NxtradStream
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestFeedServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FeedServer(rate=2000, seed=1).start()
+        self.ticks, self.events = [], []
+        self.stream = NxtradStream(self.server.url, stream_cb=lambda _s, d: self.ticks.append(d),
+                                   connect_cb=lambda _s, ev: self.events.append(ev))
+
+    def tearDown(self):
+        if self.stream.ws is not None:
+            self.stream.disconnect()
+        self.server.stop()
+
+    def test_subscribed_symbols_stream(self):
+        self.stream.connect("key:token")
+        self.assertTrue(wait_for(lambda: self.stream.isConnected))
+        symbols = ["845112_BFO", "845113_BFO", "22_NSE"]
+        self.stream.subscribeL1SnapShot(symbols)
+        self.stream.subscribeL1(symbols)
+        self.stream.sendPing()
+        self.assertTrue(wait_for(lambda: sum(t.get("msgType") == "L1" for t in self.ticks) > 100))
+
+        l1 = [t for t in self.ticks if t["msgType"] == "L1"]
+        self.assertEqual({t["symbol"] for t in l1}, set(symbols))
+        self.assertIn("open", l1[0])  # merged from the snapshot
+        self.assertTrue(all(t["ltp"] > 0 for t in l1))
+        self.assertEqual(self.ticks[0]["msgType"], "marketStatus")
+        self.assertTrue(any(t["msgType"] == "PING" for t in self.ticks))
+
+    def test_empty_token_is_rejected(self):
+        self.stream.connect("")
+        self.assertTrue(wait_for(lambda: any(ev["s"] == "closed" for ev in self.events)))
+        self.assertEqual([ev["code"] for ev in self.events if ev["s"] == "closed"], [4001])
+
+
+if __name__ == '__main__':
+    unittest.main()
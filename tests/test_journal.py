@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher, EVENT_ORDER_UPDATE, EVENT_TICK
+from mono_engine.core.journal import EventJournal
+from mono_engine.modules.order import Order
+from mono_engine.modules.state import StateModule
+
+SCRIP = "NIFTY24FEB25000CE"
+
+
+class Engine:
+    """A real dispatcher with Order and StateModule, as after MonoEngine._load_modules."""
+
+    def __init__(self, directory, lane_options=None, **journal_options):
+        engine = MagicMock()
+        engine.events = self.events = EventDispatcher(lane_options=lane_options)
+        engine.config = {"scrip": SCRIP, "lot_size": 50, "retry_attempts": 1, "retry_delay": 0}
+        engine.session.is_logged_in.return_value = True
+        self.order_ids = iter(f"ORD{i}" for i in range(1, 10**6))
+        engine.session.rest.post.side_effect = lambda *_a, **_k: {"s": "ok", "d": {"order_id": next(self.order_ids)}}
+        engine.modules = {}
+        self.state = engine.modules["state"] = StateModule(engine)
+        self.order = engine.modules["execution"] = Order(engine)
+        self.journal = EventJournal(directory, **journal_options)
+        self.recovery = self.journal.recover(engine.modules)
+        self.events.journal = self.journal
+        self.order.start()
+        self.events.subscribe("order_filled", self.state._on_order_filled)
+
+    def fill(self, order_id, status, filled_qty):
+        self.events.publish(EVENT_ORDER_UPDATE, {"order_id": order_id, "status": status, "filled_qty": filled_qty,
+                                                 "price": 101.5, "fill_time": datetime(2026, 10, 16, 9, 20)})
+
+
+class TestEventJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_entries_survive_reopen_and_stop_at_a_torn_entry(self):
+        journal = EventJournal(self.dir, initial_size=256)
+        for i in range(20):
+            journal.record("order_placed", {"order_id": f"ORD{i}", "side": "buy"})
+            journal.delivered()
+        self.assertGreater(journal.stats()["map_bytes"], 256)  # grown by remapping
+        end = journal.stats()["log_bytes"]
+        journal.close()
+
+        reopened = EventJournal(self.dir)
+        entries = list(reopened.entries())
+        self.assertEqual([seq for seq, *_ in entries], list(range(1, 21)))
+        self.assertEqual(entries[-1][2:], ("order_placed", {"order_id": "ORD19", "side": "buy"}))
+        reopened.close()
+
+        with open(os.path.join(self.dir, "events.journal"), "r+b") as f:  # crash mid-write of the last entry
+            f.seek(end - 1)
+            f.write(b"\xff")
+        journal = EventJournal(self.dir)
+        self.assertEqual(journal.seq, 19)
+        journal.record("order_placed", {"order_id": "NEXT"})
+        journal.delivered()
+        self.assertEqual([(seq, data["order_id"]) for seq, _, _, data in journal.entries(after=18)],
+                         [(19, "ORD18"), (20, "NEXT")])
+        journal.close()
+
+    def test_only_journaled_types_are_recorded(self):
+        events = EventDispatcher()
+        events.journal = journal = EventJournal(self.dir)
+        events.publish(EVENT_TICK, {"symbol": "X", "ltp": 1.0})
+        events.publish("state_updated", {"in_trade": False, "entry_details": None})  # no subscribers
+        events.publish_batch("on_trade", [{"order_id": "A"}, {"order_id": "B"}])
+        self.assertEqual([event_type for _, _, event_type, _ in journal.entries()],
+                         ["state_updated", "on_trade", "on_trade"])
+        journal.close()
+
+    def test_crash_recovery_rebuilds_orders_and_trade_state(self):
+        engine = Engine(self.dir)
+        engine.events.publish("buy_signal", {"quantity": 2})
+        engine.fill("ORD1", "PARTIAL", 40)
+        engine.journal.snapshot()
+        engine.fill("ORD1", "PARTIAL", 60)          # ORD1 complete: in trade
+        engine.events.publish("sell_signal", {"quantity": 3})
+        engine.fill("ORD2", "PARTIAL", 100)
+        self.assertTrue(engine.state.is_in_trade())
+        self.assertEqual(engine.order.pending_orders, {"ORD2": {"side": "sell", "quantity": 150, "filled": 100}})
+
+        # the process dies without close(); a new one starts on the same directory
+        restarted = Engine(self.dir)
+        self.assertEqual(restarted.recovery["modules_restored"], 2)
+        self.assertEqual(restarted.recovery["replayed"], engine.journal.seq - engine.journal.snapshot_seq)
+        self.assertEqual(restarted.order.pending_orders, engine.order.pending_orders)
+        self.assertEqual(restarted.state.state.get_state(), engine.state.state.get_state())
+        self.assertTrue(restarted.state.restored)
+
+        restarted.fill("ORD2", "FILLED", 50)        # carries on where the old process stopped
+        self.assertFalse(restarted.state.is_in_trade())
+        self.assertEqual(restarted.order.pending_orders, {})
+        restarted.journal.close()
+        engine.journal.close(snapshot=False)
+
+    def test_snapshot_between_a_signal_and_its_order_placed(self):
+        # With lanes order_placed is queued by the buy_signal callback and
+        # delivered after it, so a snapshot can fall between the two
+        engine = Engine(self.dir, lane_options={}, snapshot_every=None, snapshot_interval=None)
+        engine.events.subscribe("buy_signal", lambda _data: engine.journal.snapshot())
+        engine.events.publish("buy_signal", {"quantity": 4})
+        self.assertTrue(engine.events.flush(5))
+        self.assertEqual(engine.order.pending_orders, {"ORD1": {"side": "buy", "quantity": 200, "filled": 0}})
+
+        restarted = Engine(self.dir)
+        self.assertEqual(restarted.recovery["replayed"], 1)  # the order_placed
+        self.assertEqual(restarted.order.pending_orders, engine.order.pending_orders)
+        restarted.journal.close()
+        engine.events.close()
+        engine.journal.close(snapshot=False)
+
+    def test_periodic_snapshots_rewind_the_log(self):
+        engine = Engine(self.dir, snapshot_every=50, snapshot_interval=None, initial_size=4096)
+        for i in range(120):
+            engine.events.publish("buy_signal", {"quantity": 1})
+            engine.fill(f"ORD{2 * i + 1}", "FILLED", 50)
+            engine.events.publish("sell_signal", {"quantity": 1})
+            engine.fill(f"ORD{2 * i + 2}", "FILLED", 50)
+        stats = engine.journal.stats()
+        self.assertGreaterEqual(stats["snapshots"], 10)
+        self.assertGreater(stats["written"], 1000)
+        self.assertLessEqual(stats["map_bytes"], 16384)  # bounded by snapshot_every, not the session
+        self.assertEqual(stats["errors"], 0)
+        engine.journal.close()
+
+        restarted = Engine(self.dir)
+        self.assertEqual(restarted.recovery["replayed"], 0)  # close() took a final snapshot
+        self.assertEqual(restarted.state.state.get_state(), engine.state.state.get_state())
+        restarted.journal.close()
+
+    def test_replay_of_a_long_log(self):
+        engine = Engine(self.dir, snapshot_interval=None, snapshot_every=None)
+        for i in range(2000):
+            engine.events.publish("buy_signal", {"quantity": 1})
+            engine.fill(f"ORD{2 * i + 1}", "FILLED", 50)
+            engine.events.publish("sell_signal", {"quantity": 1})
+            engine.fill(f"ORD{2 * i + 2}", "FILLED", 50)
+        restarted = Engine(self.dir)
+        self.assertEqual(restarted.recovery["replayed"], engine.journal.seq)
+        self.assertEqual(restarted.state.state.get_state(), engine.state.state.get_state())
+        self.assertEqual(restarted.order.pending_orders, {})
+        restarted.journal.close()
+        engine.journal.close(snapshot=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_ORDER_UPDATE
+from mono_engine.core.lanes import LaneScheduler, LANE_EXECUTION, LANE_MARKET_DATA
+from mono_engine.modules.state import StateModule
+
+SCRIP = "845000_BFO"
+TOKENS = [f"{token}_BFO" for token in range(845000, 845500)]
+
+
+class TestPriorityLanes(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher(lane_options={"max_wait": 1.0})
+        self.ticks = []
+
+    def tearDown(self):
+        self.events.close()
+
+    def slow_tick(self, tick):
+        time.sleep(0.0002)
+        self.ticks.append(tick["symbol"])
+
+    def test_fill_preempts_a_tick_burst(self):
+        engine = MagicMock()
+        engine.events = self.events
+        engine.config = {"scrip": SCRIP}
+        state = StateModule(engine)
+        self.events.subscribe("order_filled", state._on_order_filled)
+        seen = {}
+        in_trade = threading.Event()
+
+        def on_state(_data):
+            seen.setdefault("ticks", len(self.ticks))
+            in_trade.set()
+
+        self.events.subscribe("state_updated", on_state)
+        self.events.subscribe(EVENT_TICK, self.slow_tick)
+
+        for symbol in TOKENS:  # 500 tokens ticking, ~0.1 s of tick callbacks
+            self.events.publish(EVENT_TICK, {"symbol": symbol, "ltp": 100.0})
+        self.events.publish("order_filled", {"scrip": SCRIP, "order_type": "buy", "price": 101.0,
+                                             "quantity": 20, "fill_time": datetime.now()})
+        self.assertTrue(in_trade.wait(5))
+        self.assertTrue(state.state.get_state()["in_trade"])
+        self.assertTrue(self.events.flush(5))
+        self.assertEqual(len(self.ticks), len(TOKENS))
+        self.assertLess(seen["ticks"], len(TOKENS) // 2)  # delivered ahead of most of the backlog
+
+        stats = self.events.lane_stats()
+        self.assertEqual(stats["execution"]["delivered"], 1)
+        self.assertEqual(stats["market_data"]["delivered"], len(TOKENS))
+        self.assertGreater(stats["market_data"]["high_water"], 1)
+        self.assertLess(stats["execution"]["latency"]["max"], stats["market_data"]["latency"]["max"])
+
+    def test_order_of_events_within_a_lane(self):
+        received = []
+        self.events.subscribe(EVENT_ORDER_UPDATE, received.append)
+        for i in range(20):
+            self.events.publish(EVENT_ORDER_UPDATE, i)
+        self.events.flush(5)
+        self.assertEqual(received, list(range(20)))
+
+
+class TestStarvation(unittest.TestCase):
+    def test_market_data_is_served_during_an_execution_burst(self):
+        delivered = []
+        lanes = LaneScheduler(lambda event_type, data: delivered.append(event_type), max_burst=4, max_wait=10)
+        for _ in range(3):
+            lanes.put(EVENT_TICK, None)
+        for _ in range(20):
+            lanes.put(EVENT_ORDER_UPDATE, None)
+        lanes.start()
+        self.assertTrue(lanes.flush(5))
+        lanes.stop()
+        # one tick after every 4 order updates while ticks are waiting
+        self.assertEqual(delivered[:5], [EVENT_ORDER_UPDATE] * 4 + [EVENT_TICK])
+        self.assertEqual(delivered.count(EVENT_TICK), 3)
+        self.assertEqual(lanes.stats()["promoted"], 3)
+
+    def test_old_events_are_promoted(self):
+        lanes = LaneScheduler(lambda *_: None, max_burst=1000, max_wait=0)
+        lanes.put(EVENT_TICK, None)
+        lanes.put(EVENT_ORDER_UPDATE, None)
+        self.assertEqual(lanes._next(), LANE_MARKET_DATA)
+        lanes._queues[LANE_MARKET_DATA].clear()
+        self.assertEqual(lanes._next(), LANE_EXECUTION)
+        with self.assertRaises(ValueError):
+            lanes.set_lane("custom", 5)
+
+
+class TestQueueBounds(unittest.TestCase):
+    def test_full_market_data_lane_conflates_then_drops_oldest(self):
+        delivered = []
+        lanes = LaneScheduler(lambda event_type, data: delivered.append((event_type, data)),
+                              max_queue={LANE_MARKET_DATA: 3})
+        for ltp in (1.0, 2.0, 3.0):
+            lanes.put(EVENT_TICK, {"symbol": "A" if ltp < 3 else "B", "ltp": ltp})
+        lanes.put(EVENT_TICK, {"symbol": "B", "ltp": 4.0})  # full: replaces B's queued tick
+        lanes.put(EVENT_TICK, {"symbol": "C", "ltp": 5.0})  # full, nothing to merge: drops A 1.0
+        for i in range(10):
+            lanes.put(EVENT_ORDER_UPDATE, i)                 # never bounded
+        lanes.start()
+        self.assertTrue(lanes.flush(5))
+        lanes.stop()
+
+        self.assertEqual([data for event_type, data in delivered if event_type == EVENT_ORDER_UPDATE], list(range(10)))
+        self.assertEqual([(data["symbol"], data["ltp"]) for event_type, data in delivered if event_type == EVENT_TICK],
+                         [("A", 2.0), ("B", 4.0), ("C", 5.0)])
+        stats = lanes.stats()
+        self.assertEqual((stats["market_data"]["dropped"], stats["market_data"]["conflated"]), (1, 1))
+        self.assertEqual(stats["market_data"]["max_queue"], 3)
+        self.assertEqual((stats["execution"]["dropped"], stats["execution"]["max_queue"]), (0, None))
+
+    def test_batches_conflate_per_item_and_count_events(self):
+        delivered = []
+        lanes = LaneScheduler(None, deliver_batch=lambda event_type, batch: delivered.append(batch),
+                              max_queue={LANE_MARKET_DATA: 4})
+        second = [{"symbol": "C", "ltp": 1.0}, {"symbol": "D", "ltp": 1.0}]
+        lanes.put(EVENT_TICK, [{"symbol": "A", "ltp": 1.0}, {"symbol": "B", "ltp": 1.0}], batch=True)
+        lanes.put(EVENT_TICK, second, batch=True)  # 4 events queued: full
+        lanes.put(EVENT_TICK, [{"symbol": "A", "ltp": 3.0}, {"symbol": "C", "ltp": 3.0}], batch=True)
+        stats = lanes.stats()["market_data"]
+        self.assertEqual((stats["queued"], stats["conflated"], stats["dropped"]), (4, 2, 0))
+        self.assertEqual(second[0]["ltp"], 1.0)  # the publisher's list is not modified
+
+        lanes.put(EVENT_TICK, [{"symbol": "E", "ltp": 5.0}], batch=True)  # drops the oldest batch, 2 events
+        lanes.start()
+        self.assertTrue(lanes.flush(5))
+        lanes.stop()
+        self.assertEqual([[(t["symbol"], t["ltp"]) for t in batch] for batch in delivered],
+                         [[("C", 3.0), ("D", 1.0)], [("E", 5.0)]])
+        stats = lanes.stats()["market_data"]
+        self.assertEqual((stats["delivered"], stats["dropped"], stats["queued"], stats["high_water"]), (3, 2, 0, 4))
+
+    def test_execution_lane_cannot_be_bounded(self):
+        with self.assertRaises(ValueError):
+            LaneScheduler(lambda *_: None, max_queue={LANE_EXECUTION: 10})
+
+
+if __name__ == "__main__":
+    unittest.main()
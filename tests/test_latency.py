@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher
+from mono_engine.core.streamer import Streamer
+from streaming.encoder import encode_pong
+from streaming.latency import LatencyMonitor, RollingHistogram
+from streaming.nxtradstream import NxtradStream
+from tests.frames import build_frame, build_packet, L1_FULL, GREEKS_PKT
+
+
+class TestRollingHistogram(unittest.TestCase):
+    def test_percentiles_within_bucket_error(self):
+        hist = RollingHistogram()
+        for value in range(1, 100001):
+            hist.record(value)
+        stats = hist.snapshot()
+        self.assertEqual(stats["count"], 100000)
+        self.assertEqual((stats["min"], stats["max"]), (1, 100000))
+        for p, expected in ((50, 50000), (90, 90000), (99, 99000)):
+            self.assertAlmostEqual(stats["p%g" % p] / expected, 1.0, delta=0.07)
+        for value in range(32):  # exact below 2**(sub_bits+1)
+            self.assertEqual(hist._bucket_value(hist._bucket(value)), value)
+
+    def test_old_values_roll_out(self):
+        now = [100.0]
+        hist = RollingHistogram(window=6, slots=3, clock=lambda: now[0])
+        hist.record(1000)
+        now[0] += 4
+        hist.record(10)
+        self.assertEqual(hist.snapshot()["count"], 2)
+        now[0] += 3
+        stats = hist.snapshot()
+        self.assertEqual((stats["count"], stats["max"]), (1, 10))
+        now[0] += 100
+        self.assertEqual(hist.snapshot()["count"], 0)
+        self.assertIsNone(hist.snapshot()["p50"])
+
+
+class TestLatencyMonitor(unittest.TestCase):
+    def setUp(self):
+        self.monitor = LatencyMonitor(ping_interval=None, log_interval=None)
+        self.out = []
+        self.stream = NxtradStream("localhost", stream_cb=lambda _s, d: self.out.append(d), latency=self.monitor)
+
+    def test_frames_and_packets_are_timed(self):
+        ltt = int(time.time()) - 3
+        frame = build_frame([build_packet(10, L1_FULL[:-12] + [(46, ltt)]), build_packet(17, GREEKS_PKT)])
+        self.stream._NxtradStream__on_message(None, frame)
+
+        self.assertEqual(len(self.out), 2)
+        snap = self.monitor.snapshot()
+        self.assertEqual((snap["frames"], snap["packets"]), (1, 2))
+        self.assertEqual(snap["decode"]["count"], 2)
+        self.assertEqual(snap["dispatch"]["count"], 2)
+        self.assertEqual(snap["queue"]["count"], 0)
+        self.assertEqual(list(snap["lag"]), ["BFO"])
+        self.assertAlmostEqual(snap["lag"]["BFO"]["p50"] / 1e9, 3.0, delta=1.0)
+        self.assertIn("lag BFO", self.monitor.summary())
+
+    def test_counters_from_several_workers(self):
+        def work():
+            for _ in range(5000):
+                self.monitor.frame_done(time.perf_counter_ns())
+                self.monitor.packet(None, 100)
+
+        workers = [threading.Thread(target=work) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        snap = self.monitor.snapshot()
+        self.assertEqual((snap["frames"], snap["packets"]), (20000, 20000))
+        self.assertEqual(snap["decode"]["count"], 20000)
+
+    def test_conflated_frames_are_timed_at_flush(self):
+        frames = [build_frame([build_packet(10, L1_FULL[:3] + [(29, 24500 + i)])]) for i in range(3)]
+        self.stream.process_frames(frames)
+        self.assertEqual(len(self.out), 1)
+        snap = self.monitor.snapshot()
+        self.assertEqual((snap["decode"]["count"], snap["dispatch"]["count"]), (3, 1))
+
+    def test_ping_round_trip(self):
+        self.stream.ws = MagicMock()
+        self.stream.isConnected = True
+        self.assertTrue(self.stream.sendPing())
+        self.stream.process_frame(build_frame([encode_pong()]))
+        snap = self.monitor.snapshot()
+        self.assertEqual((snap["pings"], snap["pongs"], snap["rtt"]["count"]), (1, 1, 1))
+        # an unsolicited pong is not counted
+        self.stream.process_frame(build_frame([encode_pong()]))
+        self.assertEqual(self.monitor.snapshot()["rtt"]["count"], 1)
+
+    def test_streamer_exposes_stats(self):
+        streamer = Streamer(MagicMock(), EventDispatcher(), latency_options={"log_interval": None})
+        self.assertEqual(streamer.latency_stats()["frames"], 0)
+        self.assertIsNone(Streamer(MagicMock(), EventDispatcher()).latency_stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,503 @@
+import copy
+import pickle
+import threading
+import time
+import unittest
+
+from streaming.encoder import encode_packet, encode_frame, encode_fields, encode_depth, \
+    encode_market_status, encode_event, encode_pong
+from streaming.nxtradstream import (NxtradStream, PacketDecoder, DEFAULT_PKT_INFO, SEG_DIVISORS,
+                                    L1StateTable, FrameRing, OVERFLOW_CONFLATE, OVERFLOW_DROP_OLDEST,
+                                    OVERFLOW_BLOCK, DepthBook, LazyTick, format_tick, tick_price, tick_time)
+from tests.frames import build_frame, build_packet, L1_FULL, L5, OHLC_PKT, GREEKS_PKT
+
+PKT_SPEC = DEFAULT_PKT_INFO["PKT_SPEC"]
+
+
+class TestPacketDecoder(unittest.TestCase):
+    def _decode(self, frames, compiled_decode):
+        out = []
+        stream = NxtradStream("localhost", compiled_decode=compiled_decode,
+                              stream_cb=lambda _s, d: out.append(copy.deepcopy(d)))
+        for frame in frames:
+            stream.process_frame(frame)
+        return out
+
+    def assertSameAsWalker(self, frames):
+        compiled = self._decode(frames, True)
+        walker = self._decode(frames, False)
+        self.assertTrue(compiled)
+        self.assertEqual(compiled, walker)
+        return compiled
+
+    def test_l1_full_and_partial(self):
+        partial = [(26, 4), (27, 845112), (29, 24555), (40, 1834600)]
+        frames = [build_frame([build_packet(10, L1_FULL), build_packet(10, partial)])] * 3
+        ticks = self.assertSameAsWalker(frames)
+        self.assertEqual(ticks[0]["symbol"], "845112_BFO")
+        self.assertEqual(ticks[0]["ltp"], 245.5)
+        self.assertEqual(ticks[0]["chngPer"], 11.59)
+        self.assertEqual(ticks[1]["ltp"], 245.55)
+        self.assertEqual(ticks[1]["open"], 210.0)  # merged from the earlier full packet
+
+    def test_segment_divisor(self):
+        cds = [(26, 5), (27, 1), (29, 834512345), (35, 25)]
+        ticks = self.assertSameAsWalker([build_frame([build_packet(10, cds)], compress=False)])
+        self.assertEqual(ticks[0]["precision"], 4)
+
+    def test_depth_ohlc_greeks(self):
+        frames = [build_frame([build_packet(11, L5), build_packet(12, OHLC_PKT),
+                               build_packet(17, GREEKS_PKT)])] * 2
+        ticks = self.assertSameAsWalker(frames)
+        self.assertEqual(len(ticks[0]["bid"]), 5)
+        self.assertEqual(ticks[0]["ask"][0], {"price": 246.0, "qty": 200, "no": 2})
+        self.assertEqual(ticks[1]["type"], "1M")
+        self.assertEqual(ticks[2]["delta"], 0.51)
+
+    def test_same_length_different_keys(self):
+        a = [(26, 4), (27, 1), (29, 100)]
+        b = [(26, 4), (27, 1), (40, 100)]
+        decoder = PacketDecoder()
+        first = decoder.decode(10, build_packet(10, a), 0, 15)
+        second = decoder.decode(10, build_packet(10, b), 0, 15)
+        self.assertEqual(first["ltp"], 1.0)
+        self.assertEqual(second["vol"], 100)
+        self.assertNotIn("ltp", second)
+        self.assertEqual(decoder.compiled, 2)
+
+    def test_decode_in_place(self):
+        pkt = build_packet(10, L1_FULL)
+        buf = memoryview(b"\x00" * 5 + pkt + b"\x00" * 3)
+        self.assertEqual(PacketDecoder().decode(10, buf, 5, len(pkt)),
+                         PacketDecoder().decode(10, pkt, 0, len(pkt)))
+
+    def test_uncompiled_packets_fall_back(self):
+        status = encode_market_status([(1, 1)])
+        ticks = self.assertSameAsWalker([build_frame([status, build_packet(16, [(62, 1)])])])
+        self.assertEqual(ticks[1], {"pong": 1, "msgType": "PING"})
+        self.assertIsNone(PacketDecoder().decode(16, build_packet(16, [(62, 1)]), 0, 5))
+
+
+class TestEncoder(unittest.TestCase):
+    def _decode(self, packets, compress=True):
+        out = []
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: out.append(d))
+        stream.process_frame(encode_frame(packets, compress=compress))
+        return out
+
+    def test_named_fields(self):
+        tick, = self._decode([encode_fields(10, exchSeg=4, token=845112, ltp=24550, ltt=1760000000)])
+        self.assertEqual((tick["symbol"], tick["ltp"]), ("845112_BFO", 245.5))
+        self.assertEqual(encode_fields(10, exchSeg=4, token=845112),
+                         encode_packet(10, [(26, 4), (27, 845112)]))
+
+    def test_depth(self):
+        depth, = self._decode([encode_depth(4, 845112, bids=[(24500, 300, 4), (24495, 10, 1)],
+                                            asks=[(24600, 120, 2), (24605, 5, 1)], tot_buy_qty=310)],
+                              compress=False)
+        self.assertEqual(depth["bid"][1], {"price": 244.95, "qty": 10, "no": 1})
+        self.assertEqual(depth["ask"][0]["price"], 246.0)
+        self.assertEqual(depth["totBuyQty"], 310)
+
+    def test_status_event_and_pong(self):
+        status, event, pong = self._decode([encode_market_status([(1, 1), (4, 2)]),
+                                            encode_event('{"orders": []}'), encode_pong()])
+        self.assertEqual(status["status"], [{"exchSeg": "NSE", "marketStatus": 1},
+                                            {"exchSeg": "BFO", "marketStatus": 2}])
+        self.assertEqual(event["message"], '{"orders": []}')
+        self.assertEqual(pong["pong"], 1)
+
+
+class TestL1StateTable(unittest.TestCase):
+    def setUp(self):
+        self.ticks = []
+        self.stream = NxtradStream("localhost", max_tokens=2,
+                                   stream_cb=lambda _s, d: self.ticks.append(d))
+
+    def test_merge_and_snapshot(self):
+        partial = [(26, 4), (27, 845112), (29, 24555)]
+        self.stream.process_frame(build_frame([build_packet(10, L1_FULL), build_packet(10, partial)]))
+
+        first, second = self.ticks
+        self.assertIsNot(first, second)
+        self.assertEqual(first["ltp"], 245.5)  # not overwritten by the later packet
+        self.assertEqual(second["ltp"], 245.55)
+        self.assertEqual(second["vol"], 1834560)
+
+        table = self.stream.l1_state
+        snap = table.snapshot("845112_BFO")
+        self.assertEqual(snap, second)
+        with self.assertRaises(TypeError):
+            snap["ltp"] = 0
+        self.assertIsNone(table.snapshot("1_NSE"))
+        self.assertEqual(table.column("ltp").tolist(), [24555])
+
+    def test_bounded_rows(self):
+        packets = [build_packet(10, [(26, 1), (27, token), (29, 100)]) for token in (1, 2, 3)]
+        self.stream.process_frame(build_frame(packets))
+
+        table = self.stream.l1_state
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.overflow, 1)
+        self.assertEqual(self.ticks[2]["symbol"], "3_NSE")  # still delivered, unmerged
+        self.assertEqual(table.memory_usage(), 2 * table.bytes_per_token)
+
+    def test_growth(self):
+        table = L1StateTable(capacity=1)
+        decoder = PacketDecoder()
+        for token in range(5):
+            pkt = build_packet(10, [(26, 1), (27, token), (29, 100 + token)])
+            table.update(*decoder.values(10, pkt, 0, len(pkt)))
+        self.assertEqual(table.capacity, 8)
+        self.assertEqual(table.snapshot("4_NSE")["ltp"], 1.04)
+        self.stream.unsubscribeL1()
+        table.clear()
+        self.assertEqual(len(table), 0)
+
+
+class TestRawMode(unittest.TestCase):
+    def test_raw_ticks_format_lazily(self):
+        frame = build_frame([build_packet(10, L1_FULL), build_packet(11, L5),
+                             build_packet(12, OHLC_PKT), build_packet(17, GREEKS_PKT)])
+        raw, formatted = [], []
+        NxtradStream("localhost", raw=True,
+                     stream_cb=lambda _s, d: raw.append(copy.deepcopy(d))).process_frame(frame)
+        NxtradStream("localhost",
+                     stream_cb=lambda _s, d: formatted.append(d)).process_frame(frame)
+
+        self.assertEqual(raw[0]["ltp"], 24550)
+        self.assertEqual(raw[0]["ltt"], 1760000000)
+        self.assertEqual(raw[0]["divisor"], 100.0)
+        self.assertEqual(raw[1]["bid"][0]["price"], 24500)
+        self.assertEqual(tick_price(raw[0], "ltp"), 245.5)
+        self.assertEqual(tick_price(formatted[0], "ltp"), 245.5)
+        self.assertEqual(str(tick_time(raw[0])), formatted[0]["ltt"])
+        self.assertEqual([format_tick(t) for t in raw], formatted)
+
+
+class TestBatchMode(unittest.TestCase):
+    def test_l1_and_greeks_batches(self):
+        batches, ticks = [], []
+        stream = NxtradStream("localhost", batch_cb=lambda _s, t, arr: batches.append((t, arr)),
+                              stream_cb=lambda _s, d: ticks.append(d))
+        partial = [(26, 4), (27, 845113), (29, 24555), (40, 1834600)]
+        stream.process_frame(build_frame([build_packet(10, L1_FULL), build_packet(10, partial),
+                                          build_packet(17, GREEKS_PKT), build_packet(11, L5)]))
+
+        self.assertEqual([t["msgType"] for t in ticks], ["L5"])
+        self.assertEqual([t for t, _ in batches], ["L1", "greeks"])
+        l1 = batches[0][1]
+        self.assertEqual(l1["token"].tolist(), [845112, 845113])
+        self.assertEqual(l1["ltp"].tolist(), [24550, 24555])
+        self.assertEqual(l1["bidQty"][0], 300)
+        self.assertEqual(l1["askQty"][0], 120)
+        self.assertEqual(l1["open"][1], 0)
+        self.assertEqual(l1["present"][1], 0b100001)  # ltp and vol only
+        self.assertEqual((l1["ltp"] / SEG_DIVISORS[l1["exchSeg"]]).tolist(), [245.5, 245.55])
+        self.assertEqual(batches[1][1]["delta"][0], 0.51)
+
+    def test_batch_mode_keeps_the_state_table(self):
+        stream = NxtradStream("localhost", batch_cb=lambda *_: None)
+        stream.process_frame(build_frame([build_packet(10, L1_FULL)]))
+        stream.process_frame(build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24555)])]))
+        state = stream.l1_state.snapshot("845112_BFO")
+        self.assertEqual((state["ltp"], state["open"]), (245.55, 210.0))
+        self.assertEqual(stream.l1_state.column("ltp").tolist(), [24555])
+
+    def test_batch_requires_compiled_decode(self):
+        with self.assertRaises(ValueError):
+            NxtradStream("localhost", batch_cb=print, compiled_decode=False)
+
+    def test_frame_cb_gets_each_frame_as_one_list(self):
+        frames, ticks = [], []
+        stream = NxtradStream("localhost", frame_cb=lambda _s, packets: frames.append(packets),
+                              stream_cb=lambda _s, d: ticks.append(d))
+        stream.process_frame(build_frame([build_packet(10, L1_FULL), build_packet(11, L5),
+                                          build_packet(17, GREEKS_PKT)]))
+        stream.process_frame(build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24555)])]))
+        self.assertEqual(ticks, [])
+        self.assertEqual([[d["msgType"] for d in packets] for packets in frames], [["L1", "L5", "greeks"], ["L1"]])
+        self.assertEqual((frames[1][0]["ltp"], frames[1][0]["open"]), (245.55, 210.0))
+
+        stream.process_frames([build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24560 + i)])])
+                               for i in range(3)])
+        self.assertEqual(len(frames), 3)
+        self.assertEqual([d["ltp"] for d in frames[2]], [245.62])
+
+
+class TestFrameRing(unittest.TestCase):
+    def test_drop_oldest(self):
+        ring = FrameRing(2, OVERFLOW_DROP_OLDEST)
+        for frame in (b"a", b"b", b"c"):
+            self.assertTrue(ring.put(frame))
+        self.assertEqual(ring.get(), [b"b"])
+        self.assertEqual(ring.stats()["dropped"], 1)
+        self.assertEqual(ring.stats()["high_water"], 2)
+
+    def test_conflate_into_tail(self):
+        ring = FrameRing(2, OVERFLOW_CONFLATE)
+        for frame in (b"a", b"b", b"c", b"d"):
+            ring.put(frame)
+        self.assertEqual(len(ring), 2)
+        self.assertEqual(ring.get(), [b"a"])
+        self.assertEqual(ring.get(), [b"b", b"c", b"d"])
+        self.assertEqual(ring.conflated, 2)
+
+    def test_conflated_tail_is_bounded(self):
+        ring = FrameRing(2, OVERFLOW_CONFLATE, max_conflate=3)
+        for i in range(10):
+            ring.put(b"%d" % i)
+        # 0 | 1 2 3 full: 0 is dropped as a lost frame and 4 starts a new slot, and so on
+        self.assertEqual(ring.get(), [b"4", b"5", b"6"])
+        self.assertEqual(ring.get(), [b"7", b"8", b"9"])
+        self.assertEqual((ring.conflated, ring.dropped), (6, 4))
+        self.assertEqual(ring.enqueued - ring.dropped, 6)
+
+    def test_block_until_free(self):
+        ring = FrameRing(1, OVERFLOW_BLOCK)
+        ring.put(b"a")
+        t = threading.Thread(target=ring.put, args=(b"b",))
+        t.start()
+        deadline = time.monotonic() + 5
+        while ring.blocked < 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(ring.blocked, 1)
+        self.assertEqual(len(ring), 1)  # b is still waiting for a free slot
+        self.assertEqual(ring.get(), [b"a"])
+        t.join(1)
+        self.assertEqual(ring.get(), [b"b"])
+        self.assertEqual(ring.blocked, 1)
+
+    def test_close_drains_then_stops(self):
+        ring = FrameRing(4)
+        ring.put(b"a")
+        ring.close()
+        self.assertFalse(ring.put(b"b"))
+        self.assertEqual(ring.get(), [b"a"])
+        self.assertIsNone(ring.get())
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            FrameRing(4, "spill")
+
+
+class TestPipeline(unittest.TestCase):
+    def _run(self, frames, **kwargs):
+        out = []
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: out.append(d), pipeline=True, **kwargs)
+        for frame in frames:
+            stream.frames.put(frame)
+        stream.frames.close()
+        for t in stream._worker_threads:
+            t.join(2)
+        return stream, out
+
+    def test_workers_dispatch_in_order(self):
+        frames = [build_frame([build_packet(10, L1_FULL[:3] + [(29, 24500 + i)])]) for i in range(50)]
+        stream, out = self._run(frames)
+        self.assertEqual([d["ltp"] for d in out], [245.0 + i / 100.0 for i in range(50)])
+        self.assertEqual(stream.pipeline_stats()["enqueued"], 50)
+        self.assertEqual(stream.pipeline_stats()["workers"], 0)
+
+    def test_conflated_frames_keep_latest_per_symbol(self):
+        other = [(26, 4), (27, 845113), (29, 100)]
+        frames = [build_frame([build_packet(10, L1_FULL)]),
+                  build_frame([build_packet(10, other), build_packet(17, GREEKS_PKT)]),
+                  build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24555)])])]
+        out = []
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: out.append(d))
+        stream.process_frames(frames)
+        self.assertEqual([(d["msgType"], d["symbol"]) for d in out],
+                         [("L1", "845112_BFO"), ("L1", "845113_BFO"), ("greeks", "845112_BFO")])
+        self.assertEqual(out[0]["ltp"], 245.55)
+        self.assertEqual(out[0]["open"], 210.0)
+
+    def test_conflated_ticks_after_a_clear(self):
+        frames = [build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 100)]),
+                               build_packet(10, [(26, 4), (27, 845113), (29, 200)])])]
+        out = []
+
+        def on_tick(stream, tick):
+            out.append(tick)
+            if len(out) == 1:
+                stream.unsubscribeL1()  # clears the table while the conflated ticks are dispatched
+
+        stream = NxtradStream("localhost", stream_cb=on_tick)
+        stream.process_frames(frames)
+        self.assertEqual([d["symbol"] for d in out], ["845112_BFO"])  # 845113's row is gone, not misread
+        stream.process_frame(build_frame([build_packet(10, [(26, 4), (27, 845114), (29, 300)])]))
+        stream.process_frames(frames)
+        self.assertEqual([(d["symbol"], d["ltp"]) for d in out[1:]],
+                         [("845114_BFO", 3.0), ("845112_BFO", 1.0), ("845113_BFO", 2.0)])
+
+    def test_multiple_workers(self):
+        frames = [build_frame([build_packet(10, [(26, 4), (27, i % 7), (29, i)])]) for i in range(200)]
+        stream, out = self._run(frames, workers=3, queue_size=8)
+        self.assertEqual(len(out), 200)
+        self.assertEqual(len(stream.l1_state), 7)
+
+
+class TestDepthBook(unittest.TestCase):
+    def test_depth_updates_in_place(self):
+        frame = build_frame([build_packet(11, L5)])
+        decoded, booked = [], []
+        NxtradStream("localhost", stream_cb=lambda _s, d: decoded.append(d)).process_frame(frame)
+        stream = NxtradStream("localhost", depth_book=True, stream_cb=lambda _s, d: booked.append(d))
+        stream.process_frame(frame)
+
+        tick = booked[0]
+        view = tick["depth"]
+        self.assertEqual((tick["symbol"], tick["totBuyQty"], tick["totSellQty"]), ("845112_BFO", 91230, 80420))
+        self.assertNotIn("bid", tick)
+        self.assertEqual(view.as_dict(), decoded[0])
+        self.assertEqual(view.bids[0], (245.0, 100, 1))
+        self.assertEqual(view.asks[4], (246.2, 204, 6))
+        self.assertAlmostEqual(view.spread, 1.0)
+        self.assertAlmostEqual(view.mid, 245.5)
+        self.assertAlmostEqual(view.microprice, (245.0 * 200 + 246.0 * 100) / 300)
+        self.assertAlmostEqual(view.imbalance(), (510 - 1010) / 1520)
+        self.assertAlmostEqual(view.imbalance(1), -100 / 300)
+
+        # the next packet rewrites the same row and the same view shows it
+        stream.process_frame(build_frame([encode_depth(4, 845112, [(24510, 7, 1)], [(24520, 9, 2)])]))
+        self.assertIs(booked[1]["depth"], view)
+        self.assertEqual((view.bids, view.asks), ([(245.1, 7, 1)], [(245.2, 9, 2)]))
+        self.assertEqual(stream.depth_book.view("845112_BFO"), view)
+        self.assertEqual(len(stream.depth_book), 1)
+
+        derived = stream.depth_book.derived()
+        self.assertAlmostEqual(derived["spread"][0], 0.1)
+        self.assertAlmostEqual(derived["imbalance"][0], -2 / 16)
+        self.assertEqual(pickle.loads(pickle.dumps(view)), view.as_dict())
+
+    def test_raw_book_and_capacity(self):
+        book_stream = NxtradStream("localhost", depth_book=True, raw=True, max_tokens=2)
+        book_stream.process_frame(build_frame([encode_depth(4, token, [(100, 1, 1)], [(105, 2, 1)])
+                                               for token in range(3)]))
+        book = book_stream.depth_book
+        self.assertEqual((len(book), book.overflow), (2, 1))
+        self.assertEqual(book.view("0_BFO").bids, [(100, 1, 1)])
+        self.assertEqual(book.view("0_BFO").spread, 5)
+        self.assertIsNone(book.view("0_BFO").tot_buy_qty)
+        self.assertEqual(book.memory_usage(), 2 * book.bytes_per_token)
+        self.assertIsInstance(book, DepthBook)
+
+    def test_unsubscribe_freezes_views(self):
+        stream = NxtradStream("localhost", depth_book=True)
+        stream.process_frame(build_frame([build_packet(11, L5)]))
+        view = stream.depth_book.view("845112_BFO")
+        before = view.as_dict()
+        stream.unsubscribeL2()  # not connected: the request is not sent, the rows are still released
+
+        self.assertEqual(len(stream.depth_book), 0)
+        self.assertIsNone(stream.depth_book.view("845112_BFO"))
+        self.assertTrue(view.frozen)
+        self.assertEqual((view.symbol, view.as_dict()), ("845112_BFO", before))
+        self.assertAlmostEqual(view.spread, 1.0)
+
+        # a new packet takes a fresh row and view; the frozen one stays as it was
+        stream.process_frame(build_frame([encode_depth(4, 845112, [(24510, 7, 1)], [(24520, 9, 2)])]))
+        fresh = stream.depth_book.view("845112_BFO")
+        self.assertIsNot(fresh, view)
+        self.assertFalse(fresh.frozen)
+        self.assertEqual(fresh.bids, [(245.1, 7, 1)])
+        self.assertEqual(view.bids[0], (245.0, 100, 1))
+
+
+class TestFieldProjection(unittest.TestCase):
+    def test_projected_fields_only(self):
+        frame = build_frame([build_packet(10, L1_FULL), build_packet(17, GREEKS_PKT), build_packet(11, L5)])
+        full, out = [], []
+        NxtradStream("localhost", stream_cb=lambda _s, d: full.append(d)).process_frame(frame)
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: out.append(d),
+                              fields={"L1": ["ltp", "vol", "ltt"], "greeks": ["delta"]})
+        stream.process_frame(frame)
+
+        common = {"exchSeg", "token", "symbol", "precision", "msgType"}
+        self.assertEqual(set(out[0]), common | {"ltp", "vol", "ltt"})
+        self.assertEqual({k: full[0][k] for k in out[0]}, out[0])
+        self.assertEqual(out[1], {k: full[1][k] for k in common | {"delta"}})
+        self.assertEqual(out[2], full[2])  # L5 is never projected
+
+        stream.set_fields(None)
+        stream.process_frame(frame)
+        self.assertEqual(out[3], full[0])
+
+    def test_projected_batches_and_decoder(self):
+        decoder = PacketDecoder(fields={10: ["ltp"]})
+        pkt = build_packet(10, L1_FULL)
+        self.assertEqual(decoder.decode(10, pkt, 0, len(pkt))["ltp"], 245.5)
+        self.assertEqual(len(decoder.values(10, pkt, 0, len(pkt))[1]), 3)  # exchSeg, token, ltp
+
+        batches = []
+        stream = NxtradStream("localhost", batch_cb=lambda _s, t, arr: batches.append(arr),
+                              fields={"L1": ["ltp", "vol"]})
+        stream.process_frame(build_frame([build_packet(10, L1_FULL)]))
+        self.assertEqual(batches[0]["present"][0], 0b100001)
+        self.assertEqual((batches[0]["ltp"][0], batches[0]["open"][0]), (24550, 0))
+
+        with self.assertRaises(ValueError):
+            PacketDecoder(fields={"L5": ["price"]})
+
+
+class TestLazyTick(unittest.TestCase):
+    def _both(self, frames, **kwargs):
+        eager, lazy = [], []
+        for out, lazy_mode in ((eager, False), (lazy, True)):
+            stream = NxtradStream("localhost", stream_cb=lambda _s, d, out=out: out.append(d),
+                                  lazy=lazy_mode, **kwargs)
+            for frame in frames:
+                stream.process_frame(frame)
+        return eager, lazy
+
+    def test_matches_eager_decode(self):
+        partial = [(26, 4), (27, 845112), (29, 24555), (40, 1834600)]
+        frames = [build_frame([build_packet(10, L1_FULL), build_packet(12, OHLC_PKT), build_packet(17, GREEKS_PKT)]),
+                  build_frame([build_packet(10, partial)])]
+        for raw in (False, True):
+            eager, lazy = self._both(frames, raw=raw)
+            self.assertTrue(all(isinstance(t, LazyTick) for t in lazy))
+            self.assertEqual([t.to_dict() for t in lazy], eager)
+            self.assertEqual(lazy, eager)
+
+    def test_decodes_on_access(self):
+        partial = [(26, 4), (27, 845112), (29, 24555)]
+        out = []
+        stream = NxtradStream("localhost", lazy=True, stream_cb=lambda _s, d: out.append(d))
+        stream.process_frame(build_frame([build_packet(10, L1_FULL)]))
+        stream.process_frame(build_frame([build_packet(10, partial)]))
+
+        tick = out[1]
+        self.assertEqual(tick["symbol"], "845112_BFO")
+        self.assertEqual(set(tick._cache), {"msgType", "symbol", "token"})
+        self.assertIsNone(tick._merged)
+        self.assertEqual(tick["ltp"], 245.55)
+        self.assertIsNone(tick._merged)
+        self.assertEqual(tick["open"], 210.0)  # not in the packet: read from the merged state
+        self.assertIn("open", tick)
+        self.assertNotIn("missing", tick)
+        self.assertEqual(tick.get("missing", 1), 1)
+        self.assertEqual(pickle.loads(pickle.dumps(tick)), out[1].to_dict())
+
+    def test_kept_tick_after_unsubscribe(self):
+        out = []
+        stream = NxtradStream("localhost", lazy=True, stream_cb=lambda _s, d: out.append(d))
+        stream.process_frame(build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24555)])]))
+        stream.unsubscribeL1()  # not connected: nothing is sent, the state table is cleared
+        stream.process_frame(build_frame([build_packet(10, L1_FULL[:1] + [(27, 845113)] + L1_FULL[2:])]))
+        self.assertEqual(out[1]["symbol"], "845113_BFO")
+        self.assertEqual(stream.l1_state._by_symbol["845113_BFO"], 0)  # the old tick's row, reused
+
+        old = out[0]
+        self.assertEqual((old["symbol"], old["ltp"]), ("845112_BFO", 245.55))
+        self.assertNotIn("open", old)  # not the other token's merged state
+        self.assertIsNone(old.get("vol"))
+        self.assertEqual(out[1]["open"], 210.0)
+
+    def test_requires_compiled_decode(self):
+        with self.assertRaises(ValueError):
+            NxtradStream("localhost", lazy=True, compiled_decode=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -72,7 +72,8 @@ class TestOrderModule(unittest.TestCase):
         self.mock_engine.events.publish.assert_any_call('pre_order', {'action': 'buy', **signal_data, 'scrip': self.module.scrip})
         self.mock_session.rest.post.assert_called_once()  # place_order called
         self.assertIn('TEST123', self.module.pending_orders)
-        self.mock_engine.events.publish.assert_any_call('order_placed', {'order_id': 'TEST123', 'side': 'buy', 'scrip': self.module.scrip})
+        self.mock_engine.events.publish.assert_any_call('order_placed', {'order_id': 'TEST123', 'side': 'buy', 'scrip': self.module.scrip,
+                                                                          'quantity': 2 * 50, 'filled': 0})
 
     def test_handle_buy_signal_in_trade(self):
         self.mock_state.is_in_trade.return_value = True
@@ -112,6 +113,15 @@ class TestOrderModule(unittest.TestCase):
         self.assertNotIn('TEST123', self.module.pending_orders)
         self.mock_engine.events.publish.assert_called_with('order_rejected', {**update_data, 'scrip': self.module.scrip})
 
+    def test_replay_rebuilds_pending_orders(self):
+        self.module.replay_event('order_placed', {'order_id': 'TEST123', 'side': 'buy', 'scrip': self.module.scrip,
+                                                  'quantity': 200, 'filled': 0})
+        self.module.replay_event('on_order_update', {'order_id': 'TEST123', 'status': 'PARTIAL', 'filled_qty': 150})
+        self.assertEqual(self.module.pending_orders['TEST123'], {'side': 'buy', 'quantity': 200, 'filled': 150})
+        self.module.replay_event('on_order_update', {'order_id': 'TEST123', 'status': 'FILLED', 'filled_qty': 50})
+        self.assertEqual(self.module.pending_orders, {})
+        self.mock_engine.events.publish.assert_not_called()
+
     def test_modify_order(self):
         self.module.pending_orders['TEST123'] = {'quantity': 100}
         self.mock_session.rest.post.return_value = {'s': 'ok'}
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import numpy as np
+from websockets.asyncio.server import serve
+
+from streaming.nxtradstream import NxtradStream
+from streaming.process_stream import (TickRing, TickReader, ProcessNxtradStream, record_ticks, RECORD_COLUMNS,
+                                     RECORD_DTYPES, _RESERVED)
+from tests.frames import build_frame, build_packet, L1_FULL, GREEKS_PKT
+
+
+def l1_rows(n, token=845112):
+    rows = np.zeros(n, dtype=RECORD_DTYPES[10])
+    rows["token"] = token
+    rows["exchSeg"] = 4
+    rows["ltp"] = np.arange(n) + 24500
+    rows["present"] = 1
+    return rows
+
+
+class TestTickRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = TickRing(8)
+        self.reader = TickReader(self.ring)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_sequenced_read(self):
+        self.ring.write(10, l1_rows(3))
+        out = self.reader.read()
+        self.assertEqual(out["seq"].tolist(), [0, 1, 2])
+        self.assertEqual(out["ltp"].tolist(), [24500, 24501, 24502])
+        self.assertEqual(len(self.reader.read()), 0)
+
+    def test_overrun_is_detected(self):
+        self.ring.write(10, l1_rows(5))
+        self.ring.write(10, l1_rows(7))
+        out = self.reader.read()
+        self.assertEqual(out["seq"].tolist(), list(range(4, 12)))
+        self.assertEqual(self.reader.overruns, 4)
+
+    def test_slots_being_rewritten_are_skipped(self):
+        self.ring.write(10, l1_rows(8))
+        self.ring.header[_RESERVED] = 10  # a writer is busy with seqs 8 and 9
+        out = self.reader.read()
+        self.assertEqual(out["seq"].tolist(), list(range(2, 8)))
+        self.assertEqual(self.reader.overruns, 2)
+
+    def test_attach_from_another_handle(self):
+        other = TickRing.attach(self.ring.name)
+        other.write(10, l1_rows(2))
+        self.assertEqual(len(self.reader.read()), 2)
+        other.close()
+
+    def test_record_ticks(self):
+        greeks = np.zeros(1, dtype=RECORD_DTYPES[17])
+        greeks["token"], greeks["exchSeg"], greeks["iv"], greeks["present"] = 845112, 4, 14.2, 2
+        self.ring.write(10, l1_rows(1))
+        self.ring.write(17, greeks)
+        l1, greek = record_ticks(self.reader.read())
+        self.assertEqual(l1, {"ltp": 245.0, "exchSeg": "BFO", "token": 845112, "symbol": "845112_BFO",
+                              "precision": 2, "msgType": "L1"})
+        self.assertEqual(greek["iv"], 14.2)
+        self.assertNotIn("delta", greek)
+
+    def test_records_carry_every_l1_field(self):
+        ticks = []
+        NxtradStream("localhost", stream_cb=lambda _s, d: ticks.append(d)).process_frame(
+            build_frame([build_packet(10, L1_FULL), build_packet(17, GREEKS_PKT)]))
+        child = NxtradStream("localhost", raw=True, batch_columns=RECORD_COLUMNS,
+                             batch_cb=lambda _s, msg_type, rows: self.ring.write({"L1": 10, "greeks": 17}[msg_type],
+                                                                                  rows))
+        child.process_frame(build_frame([build_packet(10, L1_FULL), build_packet(17, GREEKS_PKT)]))
+        self.assertEqual(record_ticks(self.reader.read()), ticks)
+        self.assertEqual(ticks[0]["qty"], 120)  # the ask's, as in the decoded dict
+
+    def test_child_stream_uses_one_worker(self):
+        stream = ProcessNxtradStream("ws://127.0.0.1:1", pipeline=True, workers=4)
+        self.assertEqual(stream.stream_options["workers"], 1)
+        stream.ring.close()
+
+
+class TestProcessNxtradStream(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+        self.ready.wait(5)
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.stop.set_result, None)
+
+    def _serve(self):
+        async def handler(ws):
+            async for _message in ws:
+                partial = [(26, 4), (27, 845112), (29, 24555)]
+                await ws.send(build_frame([build_packet(10, L1_FULL), build_packet(17, GREEKS_PKT)]))
+                await ws.send(build_frame([build_packet(10, partial)]))
+
+        async def main():
+            self.stop = self.loop.create_future()
+            async with serve(handler, "127.0.0.1", 0) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                self.ready.set()
+                await self.stop
+
+        self.loop.run_until_complete(main())
+
+    def test_ticks_cross_the_process_boundary(self):
+        ticks, events = [], []
+        stream = ProcessNxtradStream("ws://127.0.0.1:%d" % self.port,
+                                     stream_cb=lambda _s, d: ticks.append(d),
+                                     connect_cb=lambda s, ev: events.append(ev) or
+                                     s.sendRequest({"type": "L1", "action": "sub", "tokens": [{"t": "x"}]}))
+        stream.connect("key:token")
+        try:
+            deadline = time.time() + 20
+            while len(ticks) < 3 and time.time() < deadline:
+                time.sleep(0.02)
+            stats = stream.pipeline_stats()
+        finally:
+            stream.close()
+        self.assertEqual(events[0], {"s": "connected"})
+        self.assertEqual([t["msgType"] for t in ticks], ["L1", "greeks", "L1"])
+        self.assertEqual(ticks[2]["ltp"], 245.55)
+        self.assertEqual(ticks[2]["open"], 210.0)
+        self.assertEqual(stats["overruns"], 0)
+
+    def test_field_projection_reaches_the_child(self):
+        ticks = []
+
+        def on_connect(s, _ev):
+            s.set_fields({"L1": ["ltp"]})  # queued ahead of the subscription
+            s.sendRequest({"type": "L1", "action": "sub", "tokens": [{"t": "x"}]})
+
+        stream = ProcessNxtradStream("ws://127.0.0.1:%d" % self.port,
+                                     stream_cb=lambda _s, d: ticks.append(d), connect_cb=on_connect)
+        stream.connect("key:token")
+        try:
+            deadline = time.time() + 20
+            while len(ticks) < 3 and time.time() < deadline:
+                time.sleep(0.02)
+        finally:
+            stream.close()
+        self.assertEqual([t["msgType"] for t in ticks], ["L1", "greeks", "L1"])
+        self.assertEqual(ticks[2]["ltp"], 245.55)
+        self.assertNotIn("open", ticks[2])
+        self.assertEqual(ticks[1]["delta"], 0.51)  # greeks are not projected
+        self.assertEqual(stream.stream_options["fields"], {"L1": ["ltp"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_GREEKS
+from mono_engine.core.streamer import Streamer
+from streaming.nxtradstream import NxtradStream
+from streaming.recorder import FrameRecorder, FrameReplayer, read_capture, capture_files
+from tests.frames import build_frame, build_packet, L1_FULL, GREEKS_PKT
+
+
+class FakeClock:
+    def __init__(self, wall):
+        self.wall = int(wall * 1e9)
+        self.mono = 5 * 10**9
+
+    def advance(self, seconds):
+        self.wall += int(seconds * 1e9)
+        self.mono += int(seconds * 1e9)
+
+
+class TestFrameRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = FakeClock(datetime(2026, 10, 16, 23, 59, 58).timestamp())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _recorder(self, **kwargs):
+        return FrameRecorder(self.dir, clock=lambda: self.clock.mono, wall_clock=lambda: self.clock.wall, **kwargs)
+
+    def test_rotates_daily_and_reads_back(self):
+        recorder = self._recorder()
+        for i in range(4):
+            recorder.write(b"frame%d" % i)
+            self.clock.advance(1)
+        recorder.close()
+
+        files = capture_files(self.dir)
+        self.assertEqual([os.path.basename(f) for f in files], ["nxtrad-20261016.cap", "nxtrad-20261017.cap"])
+        entries = [e for f in files for e in read_capture(f)]
+        self.assertEqual([frame for _, frame in entries], [b"frame0", b"frame1", b"frame2", b"frame3"])
+        start = datetime(2026, 10, 16, 23, 59, 58).timestamp() * 1e9
+        self.assertEqual([round((ts - start) / 1e9) for ts, _ in entries], [0, 1, 2, 3])
+
+    def test_compressed_append(self):
+        for frame in (b"a", b"b"):
+            recorder = self._recorder(compress=True)
+            recorder.write(frame)
+            recorder.close()
+        path, = capture_files(self.dir)
+        self.assertTrue(path.endswith(".cap.gz"))
+        with gzip.open(path) as f:
+            f.read()
+        self.assertEqual([frame for _, frame in read_capture(path)], [b"a", b"b"])
+
+    def test_torn_last_entry_is_ignored(self):
+        recorder = self._recorder()
+        recorder.write(b"complete")
+        recorder.write(b"torn-frame")
+        recorder.close()
+        with open(recorder.path, "r+b") as f:
+            f.truncate(os.path.getsize(recorder.path) - 3)
+        self.assertEqual([frame for _, frame in read_capture(recorder.path)], [b"complete"])
+
+    def test_append_after_a_torn_entry(self):
+        recorder = self._recorder()
+        recorder.write(b"complete")
+        recorder.write(b"torn-frame")
+        recorder.close()
+        with open(recorder.path, "r+b") as f:
+            f.truncate(os.path.getsize(recorder.path) - 3)
+        recorder = self._recorder()
+        recorder.write(b"after-restart")
+        recorder.close()
+        self.assertEqual([frame for _, frame in read_capture(recorder.path)], [b"complete", b"after-restart"])
+
+    def test_torn_gzip_file_is_not_appended_to(self):
+        recorder = self._recorder(compress=True)
+        for i in range(50):
+            recorder.write(os.urandom(64) + b"%d" % i)
+        recorder.close()
+        torn = recorder.path
+        with open(torn, "r+b") as f:
+            f.truncate(os.path.getsize(torn) - 100)
+        frames = [frame for _, frame in read_capture(torn)]  # stops at the tear instead of raising
+        self.assertLess(len(frames), 50)
+
+        recorder = self._recorder(compress=True)
+        recorder.write(b"after-restart")
+        recorder.close()
+        files = capture_files(self.dir)
+        self.assertEqual([os.path.basename(f) for f in files], ["nxtrad-20261016.cap.gz", "nxtrad-20261016~1.cap.gz"])
+        self.assertEqual([frame for _, frame in read_capture(files[1])], [b"after-restart"])
+
+    def test_writes_happen_on_the_writer_thread(self):
+        recorder = self._recorder(queue_size=2)
+        threads = []
+        recorder._FrameRecorder__open = lambda ts, wall, _open=recorder._FrameRecorder__open: (
+            threads.append(threading.current_thread().name), _open(ts, wall))
+        recorder.write(b"a")
+        self.assertTrue(recorder.flush(5))
+        recorder.close()
+        self.assertEqual(threads, ["frame-recorder"])
+        self.assertEqual([frame for _, frame in read_capture(recorder.path)], [b"a"])
+
+    def test_write_after_close_is_refused(self):
+        recorder = self._recorder()
+        self.assertTrue(recorder.write(b"a"))
+        recorder.close()
+        self.assertFalse(recorder.write(b"late"))
+        self.assertIsNone(recorder._thread)  # no writer thread started again
+        self.assertEqual([frame for _, frame in read_capture(recorder.path)], [b"a"])
+
+        recorder.reopen()
+        self.assertTrue(recorder.write(b"b"))
+        recorder.close()
+        self.assertEqual([frame for _, frame in read_capture(recorder.path)], [b"a", b"b"])
+
+
+class TestFrameReplayer(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.frames = [build_frame([build_packet(10, L1_FULL)]),
+                       build_frame([build_packet(17, GREEKS_PKT)]),
+                       build_frame([build_packet(10, [(26, 4), (27, 845112), (29, 24555)])], compress=False)]
+        clock = FakeClock(datetime(2026, 10, 16, 9, 15).timestamp())
+        recorder = FrameRecorder(self.dir, clock=lambda: clock.mono, wall_clock=lambda: clock.wall)
+        stream = NxtradStream("localhost", recorder=recorder)
+        for frame in self.frames:
+            stream._NxtradStream__on_message(None, frame)
+            clock.advance(2)
+        recorder.close()
+        self.path = recorder.path
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_replay_matches_live_decode(self):
+        live, replayed = [], []
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: live.append(d))
+        for frame in self.frames:
+            stream.process_frame(frame)
+        stream = NxtradStream("localhost", stream_cb=lambda _s, d: replayed.append(d))
+        self.assertEqual(FrameReplayer(self.path).replay(stream.process_frame), 3)
+        self.assertEqual(replayed, live)
+
+    def test_paced_replay(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(round(seconds, 6))
+            now[0] += seconds
+
+        replayer = FrameReplayer(self.path, speed=4, sleep=sleep, clock=lambda: now[0])
+        replayer.replay(lambda frame: None)
+        self.assertEqual(sleeps, [0.5, 0.5])
+
+        sleeps.clear()
+        now[0] = 0.0
+        FrameReplayer(self.path, speed=1, max_gap=0.25, sleep=sleep, clock=lambda: now[0]).replay(lambda f: None)
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+    def test_streamer_replay_publishes_ticks(self):
+        events = EventDispatcher()
+        ticks = []
+        events.subscribe(EVENT_TICK, ticks.append)
+        events.subscribe(EVENT_GREEKS, ticks.append)
+        streamer = Streamer(MagicMock(), events)
+        self.assertEqual(streamer.replay(self.dir), 3)
+        self.assertEqual([t["msgType"] for t in ticks], ["L1", "greeks", "L1"])
+        self.assertEqual(ticks[-1]["ltp"], 245.55)
+
+
+if __name__ == '__main__':
+    unittest.main()
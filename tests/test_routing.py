@@ -0,0 +1,75 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from mono_engine.core.conflation import Conflator
+from mono_engine.core.events import (EventDispatcher, EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS, EVENT_OHLC,
+                                     EVENT_MARKET_STATUS, EVENT_ORDER_UPDATE, EVENT_TRADE)
+from mono_engine.core.routing import normalize_account_event, normalize_market_status, stream_event
+from mono_engine.core.streamer import Streamer
+
+
+def account_event(**fields):
+    return {"msgType": "EVENTS", "message": json.dumps(fields)}
+
+
+class TestRouting(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.received = []
+        for event_type in (EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS, EVENT_OHLC, EVENT_MARKET_STATUS,
+                           EVENT_ORDER_UPDATE, EVENT_TRADE):
+            self.events.subscribe(event_type, lambda data, e=event_type: self.received.append((e, data)))
+        self.streamer = Streamer(MagicMock(), self.events)
+
+    def test_market_data_goes_to_its_own_event(self):
+        for msg_type in ("L1", "L5", "greeks", "OHLC"):
+            self.streamer._stream_callback(None, {"msgType": msg_type, "symbol": "A"})
+        self.assertEqual([e for e, _ in self.received], [EVENT_TICK, EVENT_DEPTH, EVENT_GREEKS, EVENT_OHLC])
+        self.assertEqual(stream_event({"symbol": "A"}), EVENT_TICK)
+
+    def test_market_status_is_normalized(self):
+        data = {"msgType": "marketStatus", "status": [{"exchSeg": "NSE", "marketStatus": 1},
+                                                      {"exchSeg": "BFO", "marketStatus": 2}]}
+        self.streamer._stream_callback(None, data)
+        self.assertEqual(self.received, [(EVENT_MARKET_STATUS, normalize_market_status(data))])
+        self.assertEqual(self.streamer.market_status, {"NSE": 1, "BFO": 2})
+
+    def test_order_and_trade_events_are_normalized(self):
+        self.streamer._stream_callback(None, account_event(evntType="orders", orderId="1", status="complete",
+                                                           trdSym="NIFTY", side="BUY", qty=75, price=101.5))
+        self.streamer._stream_callback(None, account_event(evntType="trades", orderId="1", trdSym="NIFTY",
+                                                           side="BUY", qty=75, price=101.5, fillTime="t"))
+        (order_event, order), (trade_event, trade) = self.received
+        self.assertEqual((order_event, trade_event), (EVENT_ORDER_UPDATE, EVENT_TRADE))
+        self.assertEqual((order["order_id"], order["status"], order["filled_qty"], order["side"]),
+                         ("1", "FILLED", 75, "buy"))
+        self.assertEqual((trade["fill_price"], trade["fill_time"], trade["quantity"]), (101.5, "t", 75))
+
+    def test_unknown_events_are_dropped(self):
+        self.streamer._stream_callback(None, account_event(evntType="alerts"))
+        self.streamer._stream_callback(None, {"msgType": "EVENTS", "message": "not json"})
+        self.streamer._stream_callback(None, {"msgType": "PING"})
+        self.assertEqual(self.received, [])
+        self.assertEqual(normalize_account_event(account_event(evntType="orders", status="Rejected",
+                                                               msg="margin"))[1]["reason"], "margin")
+
+    def test_frame_is_published_per_event_type(self):
+        batches = []
+        self.events.subscribe(EVENT_TICK, batches.append, batch=True)
+        self.streamer._frame_callback(None, [
+            {"msgType": "L1", "symbol": "A"}, {"msgType": "L5", "symbol": "A"}, {"msgType": "L1", "symbol": "B"},
+            account_event(evntType="trades", orderId="1", qty=1, price=1.0)])
+        self.assertEqual([[d["symbol"] for d in batch] for batch in batches], [["A", "B"]])
+        self.assertEqual([e for e, _ in self.received], [EVENT_TICK, EVENT_TICK, EVENT_DEPTH, EVENT_TRADE])
+
+    def test_conflator_routes_on_drain(self):
+        conflator = Conflator(self.events, route=stream_event)
+        conflator.push({"msgType": "L1", "symbol": "A", "ltp": 1.0})
+        conflator.push({"msgType": "L5", "symbol": "A", "bidPrice": [1.0]})
+        conflator.drain()
+        self.assertEqual(sorted(e for e, _ in self.received), sorted([EVENT_TICK, EVENT_DEPTH]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher, EVENT_TICK, EVENT_CONNECT
+from mono_engine.core.sharding import HashRing, ShardMetrics
+from mono_engine.core.streamer import Streamer
+
+SYMBOLS = [f"{token}_BFO" for token in range(840000, 842000)]
+
+
+class TestHashRing(unittest.TestCase):
+    def test_spread_and_stability(self):
+        ring = HashRing(4)
+        parts = ring.split(SYMBOLS)
+        self.assertEqual(sorted(parts), [0, 1, 2, 3])
+        for tokens in parts.values():
+            self.assertGreater(len(tokens), len(SYMBOLS) / 8)
+        self.assertEqual(HashRing(4).split(SYMBOLS), parts)
+
+    def test_adding_a_shard_moves_few_tokens(self):
+        before, after = HashRing(4), HashRing(5)
+        moved = sum(before.shard_for(s) != after.shard_for(s) for s in SYMBOLS)
+        self.assertLess(moved, len(SYMBOLS) * 0.35)
+
+    def test_single_shard(self):
+        self.assertEqual(HashRing(1).split(SYMBOLS[:3]), {0: SYMBOLS[:3]})
+
+
+class TestShardMetrics(unittest.TestCase):
+    def test_lag_and_rate(self):
+        metrics = ShardMetrics(0, lag_every=1)
+        ltt = str(datetime.fromtimestamp(int(time.time()) - 3))
+        metrics.record({"symbol": "A", "ltt": ltt})
+        metrics.record({"symbol": "A", "ltt": int(time.time()) - 1})
+        metrics.record({"msgType": "EVENTS"})
+        stats = metrics.snapshot()
+        self.assertEqual(stats["packets"], 3)
+        self.assertGreaterEqual(stats["max_lag"], 3)
+        self.assertLess(stats["lag"], 3)
+        self.assertGreater(stats["rate"], 0)
+
+    def test_lag_is_sampled(self):
+        metrics = ShardMetrics(0, lag_every=4)
+        ltt = str(datetime.fromtimestamp(int(time.time()) - 3))
+        for _ in range(9):
+            metrics.record({"symbol": "A", "ltt": ltt})
+        self.assertEqual((metrics.packets, metrics.lag_samples), (9, 3))  # packets 1, 5 and 9
+        self.assertEqual(metrics._ltt[0], ltt)  # parsed once, then reused
+        self.assertGreaterEqual(metrics.snapshot()["lag"], 3)
+
+
+class TestShardedStreamer(unittest.TestCase):
+    def setUp(self):
+        self.events = EventDispatcher()
+        self.streamer = Streamer(MagicMock(), self.events, shards=3)
+        self.streams = []
+        for shard in range(3):
+            stream = MagicMock()
+            stream.sendRequest.return_value = True
+            self.streamer.nx_streams[shard] = stream
+            self.streams.append(stream)
+
+    def test_tokens_split_across_shards(self):
+        self.streamer.subscribe_l1(SYMBOLS[:300])
+        for shard, stream in enumerate(self.streams):
+            self.streamer._connect_callback(stream, {"s": "connected"})
+
+        seen = []
+        for shard, stream in enumerate(self.streams):
+            reqs = [c.args[0] for c in stream.sendRequest.call_args_list if c.args[0]["type"] == "L1"]
+            self.assertEqual(len(reqs), 1)
+            tokens = [t["t"] for t in reqs[0]["tokens"]]
+            self.assertTrue(all(self.streamer.ring.shard_for(t) == shard for t in tokens))
+            seen += tokens
+        self.assertEqual(sorted(seen), sorted(SYMBOLS[:300]))
+        self.streams[0].subscribeEvents.assert_called_once()
+        self.streams[1].subscribeEvents.assert_not_called()
+
+    def test_shards_merge_into_one_dispatcher(self):
+        ticks, connects = [], []
+        self.events.subscribe(EVENT_TICK, ticks.append)
+        self.events.subscribe(EVENT_CONNECT, connects.append)
+        for shard, stream in enumerate(self.streams):
+            self.streamer._connect_callback(stream, {"s": "connected"})
+            self.streamer._stream_callback(stream, {"symbol": str(shard)}, shard=shard)
+        self.assertEqual([t["symbol"] for t in ticks], ["0", "1", "2"])
+        self.assertEqual(len(connects), 1)
+        stats = self.streamer.shard_stats()
+        self.assertEqual([s["packets"] for s in stats], [1, 1, 1])
+        self.assertTrue(all(s["connected"] for s in stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock
+
+from mono_engine.core.events import EventDispatcher
+from mono_engine.core.streamer import Streamer
+from mono_engine.core.subscriptions import SubscriptionManager, STREAM_L1, STREAM_GREEKS, STREAM_OHLC
+from streaming.nxtradstream import NxtradStream
+from streaming.process_stream import ProcessNxtradStream
+
+
+def tokens(req):
+    return [t["t"] for t in req.get("tokens", [])]
+
+
+class TestSubscriptionManager(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.connected = True
+        self.manager = SubscriptionManager(self._send, chunk_size=2)
+
+    def _send(self, req):
+        if self.connected:
+            self.sent.append(req)
+        return self.connected
+
+    def test_full_set_sent_on_change_only(self):
+        self.manager.set("md", STREAM_L1, ["A", "B"])
+        self.manager.set("md", STREAM_L1, ["B", "A"])
+        self.manager.set("md", STREAM_L1, ["B", "C"])
+        self.assertEqual([(r["type"], r["action"], tokens(r)) for r in self.sent], [
+            ("L1", "sub", ["A", "B"]), ("L1S", "sub", ["A", "B"]),
+            ("L1", "sub", ["B", "C"]), ("L1S", "sub", ["C"]),
+        ])
+
+    def test_reference_counts_across_owners(self):
+        self.manager.add("md", STREAM_L1, ["A", "B"])
+        self.manager.add("strategy", STREAM_L1, ["B"])
+        self.sent.clear()
+
+        self.assertEqual(self.manager.remove("md", STREAM_L1, ["B"]), ([], []))
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.manager.owners(STREAM_L1, "B"), ["strategy"])
+
+        self.manager.remove_owner("md")
+        self.manager.remove_owner("strategy")
+        self.assertEqual(self.manager.desired(STREAM_L1), set())
+        self.assertEqual(self.sent[-1], {"type": "L1", "action": "unsub"})
+
+    def test_incremental_diffs_are_chunked(self):
+        self.manager.incremental = True
+        self.manager.snapshots = False
+        self.manager.set("md", STREAM_GREEKS, ["A", "B", "C"])
+        self.manager.set("md", STREAM_GREEKS, ["C", "D"])
+        self.assertEqual([(r["action"], tokens(r)) for r in self.sent], [
+            ("sub", ["A", "B"]), ("sub", ["C"]), ("unsub", ["A", "B"]), ("sub", ["D"]),
+        ])
+
+    def test_replay_after_reconnect(self):
+        self.connected = False
+        self.manager.set("md", STREAM_L1, ["A"])
+        self.manager.set("chart", STREAM_OHLC, ["-51_BSE"], interval="1M")
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.manager.requests_failed, 3)
+
+        self.connected = True
+        self.assertEqual(self.manager.replay(), 3)
+        self.assertIn({"type": "OHLC", "action": "sub", "tokens": [{"t": "-51_BSE"}], "chartInterval": "1M"},
+                      self.sent)
+        self.assertIn({"type": "L1", "action": "sub", "tokens": [{"t": "A"}]}, self.sent)
+
+
+class TestStreamerSubscriptions(unittest.TestCase):
+    def test_connect_replays_desired_set(self):
+        streamer = Streamer(MagicMock(), EventDispatcher())
+        streamer.subscribe_l1(["845112_BFO"])
+        streamer.subscribe_l5(["845112_BFO"])
+
+        stream = MagicMock()
+        stream.sendRequest.return_value = True
+        streamer.nx_stream = stream
+        streamer._connect_callback(stream, {"s": "connected"})
+
+        sent = [call.args[0]["type"] for call in stream.sendRequest.call_args_list]
+        self.assertEqual(sorted(sent), ["L1", "L1S", "L5", "L5S"])
+
+    def test_module_owners_share_a_token(self):
+        streamer = Streamer(MagicMock(), EventDispatcher())
+        desired = streamer.subscriptions.desired
+        streamer.subscribe_l1(["1_BSE", "845112_BFO"], owner="market_data")
+        streamer.subscribe_l1(["1_BSE"], owner="sensex_options")
+        self.assertEqual(streamer.subscriptions.owners(STREAM_L1, "1_BSE"), ["market_data", "sensex_options"])
+
+        streamer.subscribe_l1(["845112_BFO"], owner="market_data")  # still wanted by sensex_options
+        self.assertEqual(desired(STREAM_L1), {"1_BSE", "845112_BFO"})
+        streamer.unsubscribe("sensex_options")
+        self.assertEqual(desired(STREAM_L1), {"845112_BFO"})
+        streamer.unsubscribe("market_data")
+        self.assertEqual(desired(STREAM_L1), set())
+
+    def test_field_requests_union_per_owner(self):
+        streamer = Streamer(MagicMock(), EventDispatcher(), stream_options={"fields": {"greeks": ["delta"]}})
+        stream = NxtradStream("localhost")
+        streamer.nx_stream = stream
+        streamer.request_fields("chain", "L1", ["ltp", "OI"])
+        streamer.request_fields("scanner", "L1", ["ltp", "vol"])
+        self.assertEqual(streamer.fields(), {"L1": {"ltp", "OI", "vol"}, "greeks": {"delta"}})
+        self.assertEqual(stream.decoder.projections[10], {"ltp", "OI", "vol"})
+
+        streamer.request_fields("ui", "L1", None)
+        self.assertIsNone(streamer.fields()["L1"])
+        self.assertNotIn(10, stream.decoder.projections)
+        streamer.release_fields("ui")
+        streamer.release_fields("scanner")
+        self.assertEqual(stream.decoder.projections[10], {"ltp", "OI"})
+    def test_field_requests_reach_feed_processes(self):
+        streamer = Streamer(MagicMock(), EventDispatcher(), shards=2)
+        child = ProcessNxtradStream("ws://127.0.0.1:1")
+        streamer.nx_streams[0], streamer.nx_streams[1] = child, MagicMock()
+        try:
+            with self.assertLogs(level="WARNING") as logs:
+                streamer.request_fields("chain", "L1", ["ltp"])
+        finally:
+            child.ring.close()
+        self.assertEqual(child.stream_options["fields"], {"L1": frozenset({"ltp"})})
+        self.assertTrue(any("Shard 1" in line for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()